@@ -3,9 +3,12 @@ eID - Meta Red Social
 Tarjeta de visita digital con agregación de redes sociales
 """
 
-from flask import Flask, g
+from flask import Flask
 from flask_login import LoginManager
 from app.database import db
+from app.logging_config import configure_logging, init_request_logging
+from app.query_stats import query_stats
+from app.metrics import init_metrics
 import os
 
 # Inicialización de extensiones
@@ -14,6 +17,7 @@ login_manager = LoginManager()
 def create_app():
     """Factory para crear la aplicación Flask"""
     app = Flask(__name__)
+    configure_logging()
     
     # Configuración
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
@@ -22,17 +26,26 @@ def create_app():
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
     
-    # Conectar a la base de datos al inicio de cada request
+    # Id de petición y log de acceso con la duración
+    init_request_logging(app)
+    
+    # Latencia, códigos de estado y tiempo de BD/plantillas por endpoint
+    init_metrics(app)
+    
+    # Reservar una conexión del pool al inicio de cada request
     @app.before_request
     def before_request():
-        if not db.connection or not db.connection.is_connected():
-            db.connect()
+        db.connect()
     
-    # Cerrar conexión al final de cada request
+    # Devolver la conexión al pool al final de cada request
     @app.teardown_request
     def teardown_request(exception=None):
-        if hasattr(g, 'db_connection'):
-            db.disconnect()
+        query_stats.finish_request()
+        db.disconnect()
+    
+    # Notificaciones en tiempo real (contador de no leídos)
+    from app.realtime import socketio
+    socketio.init_app(app)
     
     # Registrar blueprints
     from app.routes import main, auth, profile, contacts, chat, oauth, calendar
@@ -44,6 +57,21 @@ def create_app():
     app.register_blueprint(oauth.bp)
     app.register_blueprint(calendar.bp)
     
+    # Planificador de recordatorios del calendario (REMINDERS_ENABLED=0 lo desactiva)
+    if os.environ.get('REMINDERS_ENABLED', '1') == '1':
+        from app.reminders import init_reminders
+        init_reminders(app)
+    
+    # Métricas para Prometheus: solo con METRICS_ENABLED=1 (y METRICS_TOKEN)
+    if os.environ.get('METRICS_ENABLED', '0') == '1':
+        from app.routes import metrics
+        app.register_blueprint(metrics.bp)
+    
+    # Panel de queries y métricas de BD: nunca en producción
+    if os.environ.get('DEBUG_ENDPOINTS', '0') == '1':
+        from app.routes import debug
+        app.register_blueprint(debug.bp)
+    
     return app
 
 
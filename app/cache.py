@@ -0,0 +1,236 @@
+"""
+Cachés en memoria para eID
+
+- TTLCache: LRU acotada con caducidad por entrada, dentro del proceso.
+- LocalSharedCache: sustituto local de una caché compartida (memcached/Redis):
+  guarda los valores serializados, así que cada lectura devuelve una copia.
+- VersionedCache: claves por usuario (o por evento) con número de versión;
+  invalidar es subir la versión y las entradas antiguas caducan solas.
+"""
+
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Caché LRU acotada con caducidad por entrada, segura entre hilos"""
+    
+    def __init__(self, maxsize=10000, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key, default=None):
+        """Obtener un valor si existe y no ha caducado"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def set(self, key, value, ttl=None):
+        """Guardar un valor (ttl en segundos, por defecto el de la caché)"""
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        expires_at = time.monotonic() + ttl
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def incr(self, key, ttl=None, initial=1):
+        """Incrementar un contador (empieza en `initial`) y retornar el valor nuevo"""
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            item = self._data.get(key)
+            value = item[0] + 1 if item and item[1] >= time.monotonic() else initial
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            return value
+    
+    def delete(self, key):
+        """Invalidar una entrada"""
+        with self._lock:
+            self._data.pop(key, None)
+    
+    def clear(self):
+        """Vaciar la caché"""
+        with self._lock:
+            self._data.clear()
+    
+    def stats(self):
+        """Aciertos, fallos y tamaño"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data)}
+    
+    def __len__(self):
+        return len(self._data)
+
+
+class LocalSharedCache(TTLCache):
+    """
+    Sustituto en proceso de una caché compartida: los valores se guardan
+    serializados como en memcached/Redis, de modo que quien lee no puede
+    modificar lo que ven los demás y lo que no se puede serializar falla aquí
+    igual que fallaría en producción.
+    """
+    
+    def get(self, key, default=None):
+        data = super().get(key)
+        if data is None:
+            return default
+        return pickle.loads(data) if isinstance(data, bytes) else data
+    
+    def set(self, key, value, ttl=None):
+        super().set(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ttl)
+
+
+BACKENDS = {
+    'memory': TTLCache,
+    'shared': LocalSharedCache,
+}
+
+
+def make_backend(name='memory', maxsize=10000, ttl=60):
+    """Crear el backend de caché configurado ('memory' o 'shared')"""
+    try:
+        backend = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Backend de caché desconocido: {name}")
+    return backend(maxsize=maxsize, ttl=ttl)
+
+
+class VersionedCache:
+    """
+    Caché por usuario con claves versionadas: namespace:user_id:vN:parte.
+    invalidate(user_id) sube la versión, así que todas las partes cacheadas
+    de ese usuario dejan de leerse a la vez sin tener que enumerarlas.
+    """
+    
+    # Las versiones viven más que las entradas; si aun así caducan, invalidate()
+    # las reinicia a partir de la hora actual y no desde 1
+    VERSION_TTL_FACTOR = 10
+    
+    def __init__(self, backend, namespace, ttl=300):
+        self.backend = backend
+        self.namespace = namespace
+        self.ttl = ttl
+        self.invalidations = 0
+        self._stats = {}
+        self._lock = threading.Lock()
+    
+    def version(self, user_id):
+        """
+        Versión actual de las claves del usuario. Quien carga un valor para
+        guardarlo debe leerla antes de cargarlo y pasarla a set(): si se
+        invalida mientras tanto, el valor antiguo queda bajo la versión
+        antigua y nadie lo lee.
+        """
+        return self.backend.get(f"{self.namespace}:{user_id}:version") or 0
+    
+    def _key(self, user_id, part, version):
+        return f"{self.namespace}:{user_id}:v{version}:{part}"
+    
+    def _count(self, part, hit):
+        with self._lock:
+            stats = self._stats.setdefault(part, {'hits': 0, 'misses': 0})
+            stats['hits' if hit else 'misses'] += 1
+    
+    def get(self, user_id, part, version=None):
+        """Valor cacheado de una parte del usuario (en `version`, o la actual) o None"""
+        if version is None:
+            version = self.version(user_id)
+        value = self.backend.get(self._key(user_id, part, version))
+        self._count(part, value is not None)
+        return value
+    
+    def set(self, user_id, part, value, ttl=None, version=None):
+        """Guardar bajo `version` (la leída antes de cargar el valor) o la actual"""
+        if version is None:
+            version = self.version(user_id)
+        self.backend.set(self._key(user_id, part, version), value, self.ttl if ttl is None else ttl)
+    
+    def get_or_load(self, user_id, part, loader, ttl=None):
+        """Lectura a través de la caché: si no está, llamar a loader() y guardarlo"""
+        version = self.version(user_id)
+        value = self.get(user_id, part, version)
+        if value is None:
+            value = loader()
+            if value is not None:
+                self.set(user_id, part, value, ttl, version)
+        return value
+    
+    def invalidate(self, user_id):
+        """Descartar todo lo cacheado del usuario"""
+        # Si la versión había caducado no se vuelve a empezar en 1 (podrían
+        # quedar entradas vivas de aquel v1): se parte de la hora actual en ns,
+        # siempre mayor que cualquier versión anterior
+        self.backend.incr(f"{self.namespace}:{user_id}:version",
+                          ttl=max(self.ttl, 1) * self.VERSION_TTL_FACTOR,
+                          initial=time.time_ns())
+        with self._lock:
+            self.invalidations += 1
+    
+    def stats(self):
+        """Aciertos y fallos por parte y totales"""
+        with self._lock:
+            parts = {part: dict(stats) for part, stats in self._stats.items()}
+            invalidations = self.invalidations
+        hits = sum(stats['hits'] for stats in parts.values())
+        misses = sum(stats['misses'] for stats in parts.values())
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / (hits + misses) if hits + misses else 0.0,
+            'invalidations': invalidations,
+            'parts': parts,
+            'backend': self.backend.stats(),
+        }
+
+
+# Perfiles (fila de users y enlaces sociales) por id de usuario.
+# PROFILE_CACHE_BACKEND=shared usa el sustituto de caché compartida (valores serializados).
+profile_cache = VersionedCache(
+    make_backend(
+        os.environ.get('PROFILE_CACHE_BACKEND', 'memory'),
+        maxsize=int(os.environ.get('PROFILE_CACHE_SIZE', '20000'))
+    ),
+    namespace='profile',
+    ttl=int(os.environ.get('PROFILE_CACHE_TTL', '300'))
+)
+
+# Repeticiones de eventos recurrentes por id de evento y ventana pedida
+recurrence_cache = VersionedCache(
+    make_backend(
+        os.environ.get('RECURRENCE_CACHE_BACKEND', 'memory'),
+        maxsize=int(os.environ.get('RECURRENCE_CACHE_SIZE', '20000'))
+    ),
+    namespace='recurrence',
+    ttl=int(os.environ.get('RECURRENCE_CACHE_TTL', '300'))
+)
+
+# Bitmaps de ocupación por (usuario, versión 'busy', día) para /calendar/freebusy.
+# La versión va en la clave, así que el TTL solo acota la memoria.
+freebusy_cache = make_backend(
+    os.environ.get('FREEBUSY_CACHE_BACKEND', 'memory'),
+    maxsize=int(os.environ.get('FREEBUSY_CACHE_SIZE', '50000')),
+    ttl=int(os.environ.get('FREEBUSY_CACHE_TTL', '600'))
+)
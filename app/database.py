@@ -4,7 +4,157 @@ Gestor de conexiones MySQL para eID
 
 import mysql.connector
 from mysql.connector import Error
+import logging
 import os
+import queue
+import re
+import threading
+import time
+from contextlib import contextmanager
+from app.query_stats import query_stats
+
+logger = logging.getLogger(__name__)
+
+# Grupo de placeholders tras VALUES en un INSERT: "VALUES (%s, %s, NOW())"
+_VALUES_GROUP = re.compile(r'\bVALUES\s*(\((?:[^()]|\([^()]*\))*\))', re.I)
+
+
+def _hydrate(cls, columns, rows):
+    """Instancias de `cls` a partir de tuplas del cursor y sus columnas"""
+    columns = tuple(columns)
+    return [cls(**dict(zip(columns, row))) for row in rows]
+
+
+class PoolExhaustedError(Error):
+    """No hay conexiones libres en el pool tras esperar el timeout"""
+
+
+class ConnectionPool:
+    """
+    Pool acotado de conexiones MySQL, seguro entre hilos.
+    
+    Mantiene hasta `size` conexiones reutilizables y permite abrir hasta
+    `max_overflow` conexiones extra en picos, que se cierran al devolverlas.
+    """
+    
+    def __init__(self, connect_args, size=5, max_overflow=10, timeout=10,
+                 recycle=3600):
+        self.connect_args = connect_args
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self._opened = 0
+        # Métricas
+        self._in_use = 0
+        self._checkouts = 0
+        self._exhausted = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+    
+    def _open(self):
+        """Abrir una conexión física nueva"""
+        connection = mysql.connector.connect(**self.connect_args)
+        connection._eid_created = time.monotonic()
+        return connection
+    
+    def _is_healthy(self, connection):
+        """Comprobar que la conexión sigue viva y no ha caducado"""
+        if time.monotonic() - connection._eid_created > self.recycle:
+            return False
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except Error:
+            return False
+    
+    def _discard(self, connection):
+        """Cerrar una conexión y liberar su hueco en el pool"""
+        try:
+            connection.close()
+        except Error:
+            pass
+        with self._lock:
+            self._opened -= 1
+    
+    def checkout(self):
+        """Obtener una conexión del pool (espera hasta `timeout` segundos)"""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                connection = None
+                with self._lock:
+                    can_open = self._opened < self.size + self.max_overflow
+                    if can_open:
+                        self._opened += 1
+                if can_open:
+                    try:
+                        connection = self._open()
+                    except Error:
+                        with self._lock:
+                            self._opened -= 1
+                        raise
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        with self._lock:
+                            self._exhausted += 1
+                        raise PoolExhaustedError(
+                            msg=f"Pool agotado ({self.size}+{self.max_overflow} conexiones)")
+                    try:
+                        connection = self._idle.get(timeout=min(remaining, 0.5))
+                    except queue.Empty:
+                        continue
+            
+            if not self._is_healthy(connection):
+                self._discard(connection)
+                continue
+            
+            waited = time.monotonic() - started
+            with self._lock:
+                self._in_use += 1
+                self._checkouts += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+            return connection
+    
+    def checkin(self, connection):
+        """Devolver una conexión al pool"""
+        with self._lock:
+            self._in_use -= 1
+        try:
+            # No dejar transacciones abiertas a la siguiente petición
+            connection.rollback()
+        except Error:
+            self._discard(connection)
+            return
+        try:
+            self._idle.put_nowait(connection)
+        except queue.Full:
+            # Conexión de overflow: se cierra
+            self._discard(connection)
+    
+    def stats(self):
+        """Métricas del pool"""
+        with self._lock:
+            return {
+                'size': self.size,
+                'max_overflow': self.max_overflow,
+                'opened': self._opened,
+                'idle': self._idle.qsize(),
+                'in_use': self._in_use,
+                'checkouts': self._checkouts,
+                'exhausted': self._exhausted,
+                'wait_total_seconds': round(self._wait_total, 6),
+                'wait_max_seconds': round(self._wait_max, 6),
+                'wait_avg_seconds': round(self._wait_total / self._checkouts, 6) if self._checkouts else 0.0,
+            }
+
 
 class Database:
     """Clase para manejar la conexión a MySQL"""
@@ -15,79 +165,393 @@ class Database:
         self.user = os.environ.get('DB_USER', 'root')
         self.password = os.environ.get('DB_PASSWORD', '')
         self.database = os.environ.get('DB_NAME', 'eid')
-        self.connection = None
+        self.pool_size = int(os.environ.get('DB_POOL_SIZE', '5'))
+        self.pool_max_overflow = int(os.environ.get('DB_POOL_MAX_OVERFLOW', '10'))
+        self.pool_timeout = float(os.environ.get('DB_POOL_TIMEOUT', '10'))
+        self.pool_recycle = int(os.environ.get('DB_POOL_RECYCLE', '3600'))
+        self.batch_size = int(os.environ.get('DB_BATCH_SIZE', '500'))
+        self.stream_fetch_size = int(os.environ.get('DB_STREAM_FETCH_SIZE', '200'))
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        # Conexión asignada a cada hilo durante una petición
+        self._local = threading.local()
+        # Conexiones propias de db.stream abiertas ahora mismo
+        self._streams = 0
+    
+    @property
+    def pool(self):
+        """Pool de conexiones (se crea en el primer uso)"""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ConnectionPool(
+                        {
+                            'host': self.host,
+                            'port': self.port,
+                            'user': self.user,
+                            'password': self.password,
+                            'database': self.database,
+                            'charset': 'utf8mb4',
+                            'collation': 'utf8mb4_unicode_ci',
+                            'autocommit': False,
+                        },
+                        size=self.pool_size,
+                        max_overflow=self.pool_max_overflow,
+                        timeout=self.pool_timeout,
+                        recycle=self.pool_recycle,
+                    )
+        return self._pool
+    
+    @property
+    def connection(self):
+        """Conexión asignada al hilo actual (None si no hay ninguna)"""
+        return getattr(self._local, 'connection', None)
     
     def connect(self):
-        """Establecer conexión con MySQL usando pool de conexiones"""
+        """Reservar una conexión del pool para el hilo actual"""
+        if self.connection is not None:
+            return self.connection
         try:
-            self.connection = mysql.connector.connect(
-                host=self.host,
-                port=self.port,
-                user=self.user,
-                password=self.password,
-                database=self.database,
-                charset='utf8mb4',
-                collation='utf8mb4_unicode_ci',
-                autocommit=False
-            )
-            if self.connection.is_connected():
-                return self.connection
+            self._local.connection = self.pool.checkout()
+            return self._local.connection
         except Error as e:
-            print(f"Error conectando a MySQL: {e}")
+            logger.error("Error conectando a MySQL: %s", e)
             return None
     
     def disconnect(self):
-        """Cerrar conexión"""
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
+        """Devolver la conexión del hilo actual al pool"""
+        connection = self.connection
+        if connection is not None:
+            self._local.connection = None
+            self.pool.checkin(connection)
+    
+    def _acquire(self):
+        """
+        Conexión para una query: la de la transacción en curso, la del hilo
+        si existe, o una prestada del pool que se devuelve al terminar
+        (hilos fuera de una petición)
+        """
+        tx_connection = getattr(self._local, 'tx_connection', None)
+        if tx_connection is not None:
+            return tx_connection, False
+        if self.connection is not None:
+            return self.connection, False
+        return self.pool.checkout(), True
+    
+    def _release(self, connection, borrowed):
+        if borrowed:
+            self.pool.checkin(connection)
+    
+    @property
+    def in_transaction(self):
+        """True si el hilo actual está dentro de db.transaction()"""
+        return getattr(self._local, 'tx_depth', 0) > 0
+    
+    @contextmanager
+    def transaction(self):
+        """
+        Agrupar varias queries en una transacción que se confirma una sola vez.
+        
+        Dentro del bloque execute_query/execute_update no hacen commit y los
+        errores se propagan en vez de retornar None/0; si el bloque lanza una
+        excepción se deshace todo. Un transaction() anidado abre un SAVEPOINT:
+        si falla solo se deshace lo suyo y la excepción sigue hacia fuera.
+        
+            with db.transaction():
+                db.execute_query(...)
+                with db.transaction():
+                    db.execute_many(...)
+        """
+        depth = getattr(self._local, 'tx_depth', 0)
+        if depth:
+            connection = self._local.tx_connection
+            savepoint = f"eid_sp_{depth}"
+            self._run(connection, f"SAVEPOINT {savepoint}")
+            self._local.tx_depth = depth + 1
+            try:
+                yield connection
+                self._run(connection, f"RELEASE SAVEPOINT {savepoint}")
+            except BaseException:
+                try:
+                    self._run(connection, f"ROLLBACK TO SAVEPOINT {savepoint}")
+                except Error as e:
+                    logger.error("Error volviendo al savepoint %s: %s", savepoint, e)
+                raise
+            finally:
+                self._local.tx_depth = depth
+            return
+        
+        connection, borrowed = self._acquire()
+        self._local.tx_connection = connection
+        self._local.tx_depth = 1
+        try:
+            yield connection
+            connection.commit()
+        except BaseException:
+            try:
+                connection.rollback()
+            except Error as e:
+                logger.error("Error deshaciendo la transacción: %s", e)
+            raise
+        finally:
+            self._local.tx_depth = 0
+            self._local.tx_connection = None
+            self._release(connection, borrowed)
+    
+    @staticmethod
+    def _run(connection, statement):
+        """Ejecutar una sentencia de control (SAVEPOINT, RELEASE...)"""
+        cursor = connection.cursor()
+        try:
+            cursor.execute(statement)
+        finally:
+            cursor.close()
+    
+    def execute_many(self, query, rows, chunk_size=None):
+        """
+        Ejecutar la misma query para muchas filas y retornar las filas afectadas.
+        
+        En un INSERT ... VALUES (%s, ...) el grupo de VALUES se repite para
+        enviar `chunk_size` filas por sentencia (DB_BATCH_SIZE por defecto);
+        el resto de queries usan executemany. Todo va en una transacción (o en
+        un savepoint si ya hay una abierta) y los errores se propagan.
+        """
+        rows = [tuple(row) for row in rows]
+        if not rows:
+            return 0
+        chunk_size = max(1, chunk_size or self.batch_size)
+        match = _VALUES_GROUP.search(query)
+        affected = 0
+        with self.transaction() as connection:
+            cursor = connection.cursor()
+            try:
+                for start in range(0, len(rows), chunk_size):
+                    chunk = rows[start:start + chunk_size]
+                    if match:
+                        statement = (query[:match.start(1)]
+                                     + ', '.join([match.group(1)] * len(chunk))
+                                     + query[match.end(1):])
+                    else:
+                        statement = query
+                    started = time.perf_counter()
+                    count, error = 0, None
+                    try:
+                        if match:
+                            cursor.execute(statement, [value for row in chunk for value in row])
+                        else:
+                            cursor.executemany(statement, chunk)
+                        count = cursor.rowcount
+                        affected += max(count, 0)
+                    except Error as e:
+                        error = e
+                        logger.error("Error en execute_many: %s", e)
+                        raise
+                    finally:
+                        query_stats.record(statement, time.perf_counter() - started, count, error)
+            finally:
+                cursor.close()
+        return affected
     
     def execute_query(self, query, params=None):
         """Ejecutar query (INSERT, UPDATE, DELETE)"""
-        cursor = self.connection.cursor(buffered=True)
+        connection, borrowed = self._acquire()
+        cursor = connection.cursor(buffered=True)
+        started = time.perf_counter()
+        rows, error = 0, None
         try:
             if params:
                 cursor.execute(query, params)
             else:
                 cursor.execute(query)
-            self.connection.commit()
+            if not self.in_transaction:
+                connection.commit()
+            rows = cursor.rowcount
             return cursor.lastrowid
         except Error as e:
-            print(f"Error ejecutando query: {e}")
-            self.connection.rollback()
+            error = e
+            logger.error("Error ejecutando query: %s", e)
+            if self.in_transaction:
+                raise
+            connection.rollback()
             return None
         finally:
+            query_stats.record(query, time.perf_counter() - started, rows, error)
             cursor.close()
+            self._release(connection, borrowed)
+    
+    def execute_update(self, query, params=None):
+        """Ejecutar UPDATE/DELETE y retornar el número de filas afectadas"""
+        connection, borrowed = self._acquire()
+        cursor = connection.cursor(buffered=True)
+        started = time.perf_counter()
+        rows, error = 0, None
+        try:
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+            if not self.in_transaction:
+                connection.commit()
+            rows = cursor.rowcount
+            return rows
+        except Error as e:
+            error = e
+            logger.error("Error ejecutando query: %s", e)
+            if self.in_transaction:
+                raise
+            connection.rollback()
+            return 0
+        finally:
+            query_stats.record(query, time.perf_counter() - started, rows, error)
+            cursor.close()
+            self._release(connection, borrowed)
     
     def fetch_one(self, query, params=None):
         """Obtener un solo resultado"""
-        cursor = self.connection.cursor(dictionary=True, buffered=True)
+        connection, borrowed = self._acquire()
+        cursor = connection.cursor(dictionary=True, buffered=True)
+        started = time.perf_counter()
+        rows, error = 0, None
         try:
             if params:
                 cursor.execute(query, params)
             else:
                 cursor.execute(query)
             result = cursor.fetchone()
+            rows = 1 if result else 0
             return result
         except Error as e:
-            print(f"Error en fetch_one: {e}")
+            error = e
+            logger.error("Error en fetch_one: %s", e)
+            if self.in_transaction:
+                raise
             return None
         finally:
+            query_stats.record(query, time.perf_counter() - started, rows, error)
             cursor.close()
+            self._release(connection, borrowed)
     
     def fetch_all(self, query, params=None):
         """Obtener todos los resultados"""
-        cursor = self.connection.cursor(dictionary=True, buffered=True)
+        connection, borrowed = self._acquire()
+        cursor = connection.cursor(dictionary=True, buffered=True)
+        started = time.perf_counter()
+        rows, error = 0, None
         try:
             if params:
                 cursor.execute(query, params)
             else:
                 cursor.execute(query)
-            return cursor.fetchall()
+            result = cursor.fetchall()
+            rows = len(result)
+            return result
         except Error as e:
-            print(f"Error en fetch_all: {e}")
+            error = e
+            logger.error("Error en fetch_all: %s", e)
+            if self.in_transaction:
+                raise
             return []
         finally:
+            query_stats.record(query, time.perf_counter() - started, rows, error)
             cursor.close()
+            self._release(connection, borrowed)
+    
+    def fetch_all_as(self, cls, query, params=None):
+        """
+        Obtener todos los resultados como instancias de `cls`.
+        
+        Las filas llegan como tuplas (sin un diccionario por fila) y se pasan
+        a cls(**columnas); pensado para modelos con __slots__.
+        """
+        connection, borrowed = self._acquire()
+        cursor = connection.cursor(buffered=True)
+        started = time.perf_counter()
+        rows, error = 0, None
+        try:
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+            result = _hydrate(cls, cursor.column_names, cursor.fetchall())
+            rows = len(result)
+            return result
+        except Error as e:
+            error = e
+            logger.error("Error en fetch_all_as: %s", e)
+            if self.in_transaction:
+                raise
+            return []
+        finally:
+            query_stats.record(query, time.perf_counter() - started, rows, error)
+            cursor.close()
+            self._release(connection, borrowed)
+    
+    def stream(self, query, params=None, fetch_size=None, cls=None):
+        """
+        Iterar los resultados sin cargarlos todos en memoria.
+        
+        Usa un cursor sin buffer en una conexión propia del pool (la del hilo
+        queda libre para otras queries mientras se recorre el resultado) y
+        trae las filas de `fetch_size` en `fetch_size` (DB_STREAM_FETCH_SIZE
+        por defecto). Esa conexión se retiene hasta terminar de iterar: quien
+        responde por partes debe devolver antes la del hilo (db.disconnect())
+        para no ocupar dos por petición; las queries que haga mientras tanto
+        toman una prestada y la devuelven al acabar. Con `cls` genera instancias como fetch_all_as; si no,
+        diccionarios. A diferencia de fetch_all, un error se registra y se
+        relanza: quien consume no puede distinguir un resultado vacío o
+        cortado de uno completo. Si se deja de iterar antes del final, el
+        resto de filas se descarta al cerrar el generador.
+        """
+        fetch_size = max(1, fetch_size or self.stream_fetch_size)
+        started = time.perf_counter()
+        try:
+            connection = self.pool.checkout()
+        except Error as e:
+            logger.error("Error en stream: %s", e)
+            query_stats.record(query, time.perf_counter() - started, 0, e)
+            raise
+        with self._pool_lock:
+            self._streams += 1
+        cursor = connection.cursor(dictionary=cls is None)
+        # Solo cuenta el tiempo en MySQL, no el de quien consume las filas
+        seconds, rows, error = 0.0, 0, None
+        try:
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+            while True:
+                batch = cursor.fetchmany(fetch_size)
+                seconds += time.perf_counter() - started
+                if not batch:
+                    break
+                rows += len(batch)
+                yield from (_hydrate(cls, cursor.column_names, batch) if cls else batch)
+                started = time.perf_counter()
+        except Error as e:
+            error = e
+            seconds += time.perf_counter() - started
+            logger.error("Error en stream: %s", e)
+            raise
+        finally:
+            query_stats.record(query, seconds, rows, error)
+            try:
+                # Filas sin leer (iteración interrumpida)
+                if connection.unread_result:
+                    connection.consume_results()
+                cursor.close()
+            except Error as e:
+                logger.error("Error cerrando el cursor de stream: %s", e)
+            self.pool.checkin(connection)
+            with self._pool_lock:
+                self._streams -= 1
+    
+    def pool_stats(self):
+        """Métricas del pool de conexiones (in_use incluye las de stream)"""
+        stats = self.pool.stats()
+        with self._pool_lock:
+            stats['streaming'] = self._streams
+        return stats
 
 # Instancia global
 db = Database()
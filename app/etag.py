@@ -0,0 +1,36 @@
+"""
+Respuestas condicionales (ETag / If-None-Match) para las APIs JSON
+
+El ETag se calcula sin tocar los datos: versión del usuario para ese ámbito
+(DataVersion) más la URL pedida. Si el cliente ya tiene esa versión se
+responde 304 sin ejecutar las queries de la respuesta.
+"""
+
+import hashlib
+from flask import current_app, request
+from app.models.data_version import DataVersion
+
+
+def make_etag(user_id, scope, version):
+    """ETag de la versión `version` de los datos, para la URL de la petición"""
+    key = f"{user_id}:{scope}:{version}:{request.full_path}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+
+def conditional_response(user_id, scope, build):
+    """
+    Responder con build() y un ETag fuerte, o 304 si If-None-Match coincide.
+    
+    La versión se lee antes de generar la respuesta: una escritura concurrente
+    puede dejar datos nuevos con el ETag anterior (el siguiente GET los vuelve
+    a pedir), pero nunca un ETag nuevo con datos antiguos.
+    """
+    etag = make_etag(user_id, scope, DataVersion.get(user_id, scope))
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = build()
+    response.set_etag(etag)
+    # El navegador puede guardar la respuesta pero debe revalidarla siempre
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,126 @@
+"""
+Extracción de perfiles sociales en segundo plano
+
+El scraping de una red social puede tardar varios segundos, así que se hace
+fuera de la petición: un pool de hilos acotado, un límite de trabajos
+simultáneos por dominio y una caché por URL (también de fallos, con un TTL
+más corto) para no repetir descargas.
+"""
+
+import logging
+import os
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from app.cache import TTLCache
+from app.social_extractor import extract_social_info
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionQueue:
+    """Cola de trabajos de extracción con caché de resultados"""
+    
+    def __init__(self, max_workers=4, per_domain=2, cache_ttl=3600, negative_ttl=300,
+                 cache_size=5000):
+        self.per_domain = per_domain
+        self.cache_ttl = cache_ttl
+        self.negative_ttl = negative_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='social-extractor')
+        self._cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._lock = threading.Lock()
+        # clave -> callbacks pendientes (un solo trabajo por URL a la vez)
+        self._callbacks = {}
+        # dominio -> trabajos en curso / trabajos esperando turno
+        self._active = defaultdict(int)
+        self._waiting = defaultdict(deque)
+    
+    @staticmethod
+    def _key(url, platform):
+        return (platform or '', url.strip().lower())
+    
+    @staticmethod
+    def _domain(url):
+        if not url.startswith('http'):
+            url = 'https://' + url
+        return urlparse(url).netloc.lower()
+    
+    @staticmethod
+    def _is_failure(info):
+        """Sin datos útiles: se cachea como fallo (TTL corto)"""
+        return 'error' in info or not any(info.get(k) for k in ('profile_name', 'avatar', 'bio'))
+    
+    def get_cached(self, url, platform):
+        """Resultado cacheado para la URL, o None"""
+        return self._cache.get(self._key(url, platform))
+    
+    def submit(self, url, platform, callback):
+        """
+        Programar la extracción de `url`. `callback(info)` se llama en un hilo
+        del pool cuando termina (o inmediatamente si el resultado está cacheado).
+        Retorna True si se usó la caché.
+        """
+        key = self._key(url, platform)
+        cached = self._cache.get(key)
+        if cached is not None:
+            callback(cached)
+            return True
+        
+        domain = self._domain(url)
+        with self._lock:
+            if key in self._callbacks:
+                # Ya hay un trabajo para esta URL: esperar su resultado
+                self._callbacks[key].append(callback)
+                return False
+            self._callbacks[key] = [callback]
+            if self._active[domain] >= self.per_domain:
+                self._waiting[domain].append((key, url, platform))
+                return False
+            self._active[domain] += 1
+        self._executor.submit(self._run, key, url, platform, domain)
+        return False
+    
+    def _run(self, key, url, platform, domain):
+        try:
+            try:
+                info = extract_social_info(url, platform)
+            except Exception as e:
+                info = {'url': url, 'platform': platform, 'error': str(e)}
+            
+            ttl = self.negative_ttl if self._is_failure(info) else self.cache_ttl
+            self._cache.set(key, info, ttl=ttl)
+            
+            with self._lock:
+                callbacks = self._callbacks.pop(key, [])
+            for callback in callbacks:
+                try:
+                    callback(info)
+                except Exception as e:
+                    logger.exception("Error guardando perfil extraído de %s: %s", url, e)
+        finally:
+            self._next(domain)
+    
+    def _next(self, domain):
+        """Lanzar el siguiente trabajo en espera del dominio"""
+        with self._lock:
+            if self._waiting[domain]:
+                job = self._waiting[domain].popleft()
+            else:
+                job = None
+                self._active[domain] -= 1
+                if not self._active[domain]:
+                    del self._active[domain]
+                    del self._waiting[domain]
+        if job:
+            self._executor.submit(self._run, *job, domain)
+
+
+# Instancia global
+extraction_queue = ExtractionQueue(
+    max_workers=int(os.environ.get('SOCIAL_EXTRACTOR_WORKERS', '4')),
+    per_domain=int(os.environ.get('SOCIAL_EXTRACTOR_PER_DOMAIN', '2')),
+    cache_ttl=int(os.environ.get('SOCIAL_EXTRACTOR_CACHE_TTL', '3600')),
+    negative_ttl=int(os.environ.get('SOCIAL_EXTRACTOR_NEGATIVE_TTL', '300'))
+)
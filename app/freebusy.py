@@ -0,0 +1,160 @@
+"""
+Disponibilidad (free/busy) de varios usuarios
+
+La ocupación de cada usuario se guarda por días como un bitmap de franjas de
+FREEBUSY_SLOT_MINUTES: el bit i indica que la franja i del día se solapa con
+algún evento. Los bitmaps se cachean con la versión 'busy' del usuario
+(DataVersion), que suben los cambios en sus eventos y en los eventos en los
+que participa, así que una consulta repetida solo lee las versiones. Los días
+que faltan se calculan con una sola query para todos los usuarios: los
+intervalos de cada uno se ordenan y fusionan y se marcan sus franjas.
+
+La ocupación conjunta es el OR de los bitmaps; sus rachas de bits son los
+intervalos ocupados y los huecos entre ellos, los libres.
+
+Configuración (.env):
+    FREEBUSY_SLOT_MINUTES=15   tamaño de franja (divisor de 1440)
+    FREEBUSY_MAX_DAYS=31       ventana máxima por consulta
+    FREEBUSY_MAX_USERS=20      contactos máximos por consulta
+"""
+
+import os
+from datetime import datetime, timedelta
+from app.cache import freebusy_cache
+from app.models.calendar_event import CalendarEvent
+from app.models.data_version import DataVersion, FREEBUSY
+
+SLOT_MINUTES = int(os.environ.get('FREEBUSY_SLOT_MINUTES', '15'))
+MAX_DAYS = int(os.environ.get('FREEBUSY_MAX_DAYS', '31'))
+MAX_USERS = int(os.environ.get('FREEBUSY_MAX_USERS', '20'))
+
+if SLOT_MINUTES < 1 or 1440 % SLOT_MINUTES:
+    raise ValueError("FREEBUSY_SLOT_MINUTES debe dividir 1440")
+
+SLOT = timedelta(minutes=SLOT_MINUTES)
+SLOTS_PER_DAY = 1440 // SLOT_MINUTES
+DAY = timedelta(days=1)
+
+
+def merge_intervals(intervals):
+    """Ordenar y unir los intervalos (inicio, fin) que se solapan o se tocan"""
+    merged = []
+    for start, end in sorted(intervals):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def day_bitmap(day, intervals):
+    """Bitmap de las franjas del día que empieza en `day` tocadas por los intervalos"""
+    day_end = day + DAY
+    bits = 0
+    for start, end in intervals:
+        if end <= day or start >= day_end:
+            continue
+        first = max(0, (start - day) // SLOT)
+        last = min(SLOTS_PER_DAY, -((day - end) // SLOT))
+        bits |= ((1 << (last - first)) - 1) << first
+    return bits
+
+
+def bitmap_intervals(day, bits):
+    """Rachas de franjas ocupadas del bitmap como intervalos (inicio, fin)"""
+    intervals = []
+    while bits:
+        first = (bits & -bits).bit_length() - 1
+        shifted = bits >> first
+        # Posición del primer 0 tras la racha = longitud de la racha
+        length = ((shifted + 1) & ~shifted).bit_length() - 1
+        intervals.append((day + first * SLOT, day + (first + length) * SLOT))
+        bits &= ~(((1 << length) - 1) << first)
+    return intervals
+
+
+def free_slots(busy, start, end, duration, limit=None):
+    """Huecos de al menos `duration` entre los intervalos ocupados (ya fusionados)"""
+    free = []
+    cursor = start
+    for busy_start, busy_end in busy + [(end, end)]:
+        if busy_start - cursor >= duration:
+            free.append((cursor, min(busy_start, end)))
+            if limit and len(free) >= limit:
+                break
+        cursor = max(cursor, busy_end)
+        if cursor >= end:
+            break
+    return free
+
+
+def _clip(intervals, start, end):
+    return [(max(s, start), min(e, end)) for s, e in intervals if e > start and s < end]
+
+
+def _days(start, end):
+    day = datetime.combine(start.date(), datetime.min.time())
+    while day < end:
+        yield day
+        day += DAY
+
+
+def _key(user_id, version, day):
+    return f"freebusy:{user_id}:v{version}:{SLOT_MINUTES}:{day.date().isoformat()}"
+
+
+def busy_bitmaps(user_ids, start, end):
+    """{user_id: {día: bitmap}} de los días de [start, end), desde la caché o MySQL"""
+    days = list(_days(start, end))
+    # Versión leída antes que los datos: en el peor caso se cachean datos más
+    # nuevos que la versión, nunca al revés
+    versions = DataVersion.get_many(user_ids, FREEBUSY)
+    bitmaps = {user_id: {} for user_id in user_ids}
+    missing = {}
+    for user_id in user_ids:
+        for day in days:
+            bits = freebusy_cache.get(_key(user_id, versions[user_id], day))
+            if bits is None:
+                missing.setdefault(user_id, []).append(day)
+            else:
+                bitmaps[user_id][day] = bits
+    
+    if missing:
+        load_start = min(day for user_days in missing.values() for day in user_days)
+        load_end = max(day for user_days in missing.values() for day in user_days) + DAY
+        intervals = CalendarEvent.busy_intervals(list(missing), load_start, load_end)
+        for user_id, user_days in missing.items():
+            merged = merge_intervals(intervals.get(user_id, ()))
+            for day in user_days:
+                bits = day_bitmap(day, merged)
+                freebusy_cache.set(_key(user_id, versions[user_id], day), bits)
+                bitmaps[user_id][day] = bits
+    return bitmaps
+
+
+def freebusy(user_ids, start, end, duration=timedelta(minutes=30), limit=10):
+    """
+    Ocupación de cada usuario, ocupación conjunta y huecos libres en [start, end).
+    
+    Los intervalos se redondean a franjas: un evento de 10:05 a 10:20 ocupa
+    las franjas de 10:00 y 10:15.
+    Retorna (ocupado por usuario, ocupado conjunto, libres).
+    """
+    bitmaps = busy_bitmaps(user_ids, start, end)
+    combined = {}
+    busy = {}
+    for user_id, days in bitmaps.items():
+        runs = []
+        for day, bits in days.items():
+            runs += bitmap_intervals(day, bits)
+            combined[day] = combined.get(day, 0) | bits
+        busy[user_id] = _clip(merge_intervals(runs), start, end)
+    
+    runs = []
+    for day, bits in combined.items():
+        runs += bitmap_intervals(day, bits)
+    merged = _clip(merge_intervals(runs), start, end)
+    return busy, merged, free_slots(merged, start, end, duration, limit)
@@ -0,0 +1,89 @@
+"""
+Cliente HTTP compartido para las llamadas salientes (OAuth, scraping)
+
+Una única sesión de requests con pools keep-alive por host, timeouts de
+conexión/lectura por defecto, reintentos con backoff solo para métodos
+idempotentes y métricas de latencia y errores por host.
+"""
+
+import os
+import threading
+import time
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class HttpClient:
+    """Sesión HTTP compartida con timeouts, reintentos y métricas"""
+    
+    IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+    
+    def __init__(self, connect_timeout=3.05, read_timeout=10, retries=2, backoff=0.3,
+                 pool_connections=20, pool_maxsize=10):
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=self.IDEMPOTENT_METHODS,
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                              max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._lock = threading.Lock()
+        self._hosts = {}
+    
+    def request(self, method, url, **kwargs):
+        """Hacer una petición con el timeout por defecto si no se indica otro"""
+        kwargs.setdefault('timeout', self.timeout)
+        host = urlparse(url).netloc.lower()
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException:
+            self._record(host, time.perf_counter() - started, error=True)
+            raise
+        self._record(host, time.perf_counter() - started, error=response.status_code >= 500)
+        return response
+    
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+    
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+    
+    def _record(self, host, elapsed, error=False):
+        with self._lock:
+            stats = self._hosts.get(host)
+            if stats is None:
+                stats = self._hosts[host] = {'requests': 0, 'errors': 0,
+                                             'total_seconds': 0.0, 'max_seconds': 0.0}
+            stats['requests'] += 1
+            stats['errors'] += int(error)
+            stats['total_seconds'] += elapsed
+            stats['max_seconds'] = max(stats['max_seconds'], elapsed)
+    
+    def stats(self):
+        """Métricas por host: peticiones, errores y latencia"""
+        with self._lock:
+            return {
+                host: dict(stats, avg_seconds=stats['total_seconds'] / stats['requests'])
+                for host, stats in self._hosts.items()
+            }
+
+
+# Instancia global
+http = HttpClient(
+    connect_timeout=float(os.environ.get('HTTP_CONNECT_TIMEOUT', '3.05')),
+    read_timeout=float(os.environ.get('HTTP_READ_TIMEOUT', '10')),
+    retries=int(os.environ.get('HTTP_RETRIES', '2'))
+)
@@ -0,0 +1,168 @@
+"""
+Logging estructurado para eID
+
+Los registros se encolan en el hilo de la petición (QueueHandler) y un hilo
+aparte (QueueListener) los formatea y escribe, así que escribir un log no
+bloquea la petición con E/S. Cada registro lleva el id de la petición, el
+usuario, la ruta y, en el log de acceso, la duración.
+
+Configuración (.env):
+    LOG_LEVEL=INFO                         nivel del logger 'app'
+    LOG_LEVELS=app.database=DEBUG,...      niveles por logger
+    LOG_FORMAT=json|text
+    LOG_DEBUG_SAMPLE_RATE=1.0              fracción de registros DEBUG que se emiten
+    LOG_QUEUE_SIZE=10000                   registros en cola antes de descartar
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from flask import g, has_request_context, request
+
+APP_LOGGER = 'app'
+
+_listener = None
+
+
+class RequestContextFilter(logging.Filter):
+    """Añadir request_id, user_id y ruta al registro (en el hilo que lo emite)"""
+    
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = g.get('request_id', '-')
+            # Sin pasar por current_user: no debe cargar el usuario desde aquí
+            user = g.get('_login_user')
+            record.user_id = getattr(user, 'id', None) if getattr(user, 'is_authenticated', False) else None
+            record.route = request.endpoint or request.path
+        else:
+            record.request_id = '-'
+            record.user_id = None
+            record.route = None
+        if not hasattr(record, 'duration_ms'):
+            record.duration_ms = None
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Dejar pasar solo una fracción de los registros DEBUG"""
+    
+    def __init__(self, rate=1.0):
+        super().__init__()
+        self.rate = rate
+    
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.rate >= 1:
+            return True
+        return random.random() < self.rate
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler que descarta (y cuenta) registros si la cola está llena"""
+    
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro"""
+    
+    FIELDS = ('request_id', 'user_id', 'route', 'duration_ms', 'status', 'method')
+    
+    def format(self, record):
+        data = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for field in self.FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exc'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s %(name)s [%(request_id)s user=%(user_id)s %(route)s] %(message)s'
+
+
+def _parse_levels(value):
+    """'app.database=DEBUG,app.routes=WARNING' -> {nombre: nivel}"""
+    levels = {}
+    for item in (value or '').split(','):
+        name, sep, level = item.partition('=')
+        if sep and name.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging():
+    """Configurar el logger 'app' con cola, formato y niveles del entorno"""
+    global _listener
+    if _listener is not None:
+        return
+    
+    log_queue = queue.Queue(maxsize=int(os.environ.get('LOG_QUEUE_SIZE', '10000')))
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(float(os.environ.get('LOG_DEBUG_SAMPLE_RATE', '1.0'))))
+    queue_handler.addFilter(RequestContextFilter())
+    
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if os.environ.get('LOG_FORMAT', 'json') == 'text':
+        stream_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    else:
+        stream_handler.setFormatter(JsonFormatter())
+    
+    app_logger = logging.getLogger(APP_LOGGER)
+    app_logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+    app_logger.addHandler(queue_handler)
+    app_logger.propagate = False
+    for name, level in _parse_levels(os.environ.get('LOG_LEVELS')).items():
+        logging.getLogger(name).setLevel(level)
+    
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def init_request_logging(app):
+    """Asignar un id a cada petición y emitir una línea de acceso con su duración"""
+    access_logger = logging.getLogger('app.access')
+    
+    @app.before_request
+    def start_request_log():
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        g.request_started = time.perf_counter()
+    
+    @app.after_request
+    def finish_request_log(response):
+        started = g.get('request_started')
+        if started is not None:
+            access_logger.info(
+                '%s %s %s', request.method, request.path, response.status_code,
+                extra={
+                    'duration_ms': round((time.perf_counter() - started) * 1000, 2),
+                    'status': response.status_code,
+                    'method': request.method,
+                }
+            )
+        response.headers['X-Request-ID'] = g.get('request_id', '-')
+        return response
@@ -0,0 +1,211 @@
+"""
+Métricas de peticiones HTTP por endpoint
+
+Histograma de latencia, códigos de estado, peticiones en curso y reparto
+del tiempo entre base de datos y renderizado de plantillas, por blueprint y
+endpoint. Cada hilo escribe en su propio shard (sin locks en el camino de la
+petición) y /metrics los suma al leer. Los endpoints son los registrados en
+la app, así que la memoria no crece con el número de peticiones; el shard
+de un hilo que termina se suma a un acumulado y se libera.
+"""
+
+import threading
+import time
+import weakref
+from flask import g, request, template_rendered, before_render_template
+
+# Límites superiores de los buckets del histograma (segundos)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+UNMATCHED = '<sin ruta>'
+
+
+class _EndpointStats:
+    """Contadores de un endpoint dentro de un shard"""
+    
+    __slots__ = ('buckets', 'count', 'seconds', 'db_seconds', 'render_seconds', 'statuses')
+    
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.seconds = 0.0
+        self.db_seconds = 0.0
+        self.render_seconds = 0.0
+        self.statuses = {}
+    
+    def merge(self, other):
+        for i, value in enumerate(other.buckets):
+            self.buckets[i] += value
+        self.count += other.count
+        self.seconds += other.seconds
+        self.db_seconds += other.db_seconds
+        self.render_seconds += other.render_seconds
+        for status, value in list(other.statuses.items()):
+            self.statuses[status] = self.statuses.get(status, 0) + value
+
+
+class _Shard:
+    """Contadores de un hilo"""
+    
+    __slots__ = ('endpoints', 'started', 'finished', '__weakref__')
+    
+    def __init__(self):
+        self.endpoints = {}
+        self.started = 0
+        self.finished = 0
+
+
+def _bucket_index(seconds):
+    for i, bound in enumerate(BUCKETS):
+        if seconds <= bound:
+            return i
+    return len(BUCKETS)
+
+
+class RequestMetrics:
+    """Métricas de peticiones agregadas por (blueprint, endpoint)"""
+    
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = weakref.WeakSet()
+        self._retired = _Shard()
+    
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._shards.add(shard)
+            # Al terminar el hilo, sus contadores pasan al acumulado
+            weakref.finalize(threading.current_thread(), self._retire, shard)
+        return shard
+    
+    def _retire(self, shard):
+        with self._lock:
+            self._fold(self._retired, shard)
+            self._shards.discard(shard)
+    
+    @staticmethod
+    def _fold(target, shard):
+        target.started += shard.started
+        target.finished += shard.finished
+        for key, stats in list(shard.endpoints.items()):
+            merged = target.endpoints.get(key)
+            if merged is None:
+                merged = target.endpoints[key] = _EndpointStats()
+            merged.merge(stats)
+    
+    def request_started(self):
+        self._shard().started += 1
+    
+    def request_finished(self):
+        self._shard().finished += 1
+    
+    def observe(self, blueprint, endpoint, status, seconds, db_seconds=0.0, render_seconds=0.0):
+        """Registrar una petición terminada"""
+        shard = self._shard()
+        key = (blueprint or '', endpoint or UNMATCHED)
+        stats = shard.endpoints.get(key)
+        if stats is None:
+            stats = shard.endpoints[key] = _EndpointStats()
+        stats.buckets[_bucket_index(seconds)] += 1
+        stats.count += 1
+        stats.seconds += seconds
+        stats.db_seconds += db_seconds
+        stats.render_seconds += render_seconds
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+    
+    def collect(self):
+        """Sumar todos los shards en uno nuevo"""
+        total = _Shard()
+        with self._lock:
+            self._fold(total, self._retired)
+            shards = list(self._shards)
+        for shard in shards:
+            self._fold(total, shard)
+        return total
+    
+    def prometheus(self):
+        """Métricas en formato de texto de Prometheus"""
+        total = self.collect()
+        lines = [
+            '# HELP eid_http_requests_in_flight Peticiones en curso',
+            '# TYPE eid_http_requests_in_flight gauge',
+            f'eid_http_requests_in_flight {total.started - total.finished}',
+            '# HELP eid_http_requests_total Peticiones por endpoint y código de estado',
+            '# TYPE eid_http_requests_total counter',
+        ]
+        items = sorted(total.endpoints.items())
+        for (blueprint, endpoint), stats in items:
+            for status, value in sorted(stats.statuses.items()):
+                lines.append(f'eid_http_requests_total{{blueprint="{blueprint}",endpoint="{endpoint}",'
+                             f'status="{status}"}} {value}')
+        
+        lines += ['# HELP eid_http_request_duration_seconds Latencia de las peticiones',
+                  '# TYPE eid_http_request_duration_seconds histogram']
+        for (blueprint, endpoint), stats in items:
+            labels = f'blueprint="{blueprint}",endpoint="{endpoint}"'
+            cumulative = 0
+            for bound, value in zip(BUCKETS, stats.buckets):
+                cumulative += value
+                lines.append(f'eid_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'eid_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats.count}')
+            lines.append(f'eid_http_request_duration_seconds_sum{{{labels}}} {stats.seconds:.6f}')
+            lines.append(f'eid_http_request_duration_seconds_count{{{labels}}} {stats.count}')
+        
+        lines += ['# HELP eid_http_request_db_seconds_total Tiempo en la base de datos',
+                  '# TYPE eid_http_request_db_seconds_total counter']
+        for (blueprint, endpoint), stats in items:
+            lines.append(f'eid_http_request_db_seconds_total{{blueprint="{blueprint}",endpoint="{endpoint}"}} '
+                         f'{stats.db_seconds:.6f}')
+        lines += ['# HELP eid_http_request_render_seconds_total Tiempo renderizando plantillas',
+                  '# TYPE eid_http_request_render_seconds_total counter']
+        for (blueprint, endpoint), stats in items:
+            lines.append(f'eid_http_request_render_seconds_total{{blueprint="{blueprint}",endpoint="{endpoint}"}} '
+                         f'{stats.render_seconds:.6f}')
+        return '\n'.join(lines) + '\n'
+
+
+# Instancia global
+request_metrics = RequestMetrics()
+
+
+def _render_started(sender, template, context, **extra):
+    g.render_started = time.perf_counter()
+
+
+def _render_finished(sender, template, context, **extra):
+    started = g.pop('render_started', None)
+    if started is not None:
+        g.render_seconds = g.get('render_seconds', 0.0) + time.perf_counter() - started
+
+
+def init_metrics(app):
+    """Registrar los hooks que miden cada petición"""
+    before_render_template.connect(_render_started, app)
+    template_rendered.connect(_render_finished, app)
+    
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_started = time.perf_counter()
+        request_metrics.request_started()
+    
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.get('metrics_started')
+        if started is not None:
+            request_metrics.observe(
+                request.blueprint,
+                request.endpoint,
+                response.status_code,
+                time.perf_counter() - started,
+                db_seconds=g.get('db_time_ms', 0.0) / 1000,
+                render_seconds=g.get('render_seconds', 0.0)
+            )
+        return response
+    
+    @app.teardown_request
+    def finish_request_metrics(exception=None):
+        if g.pop('metrics_started', None) is not None:
+            request_metrics.request_finished()
@@ -0,0 +1,186 @@
+"""
+Gestor de migraciones de esquema para eID
+
+Aplica en orden los ficheros migrations/NNN_nombre.sql y registra cada
+versión aplicada en la tabla schema_migrations.
+"""
+
+import hashlib
+import os
+import re
+import time
+import mysql.connector
+from mysql.connector import Error
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+MIGRATION_FILE = re.compile(r'^(\d+)_([\w-]+)\.sql$')
+
+
+class MigrationError(Exception):
+    """Fallo al aplicar una migración"""
+
+
+def split_statements(sql):
+    """Separar un script SQL en sentencias (respeta comillas y comentarios --)"""
+    statements = []
+    current = []
+    quote = None
+    i = 0
+    while i < len(sql):
+        char = sql[i]
+        if quote:
+            current.append(char)
+            if char == '\\':
+                current.append(sql[i + 1:i + 2])
+                i += 1
+            elif char == quote:
+                quote = None
+        elif char in ('"', "'", '`'):
+            quote = char
+            current.append(char)
+        elif sql.startswith('--', i):
+            end = sql.find('\n', i)
+            i = len(sql) if end == -1 else end
+            continue
+        elif char == ';':
+            statement = ''.join(current).strip()
+            if statement:
+                statements.append(statement)
+            current = []
+        else:
+            current.append(char)
+        i += 1
+    statement = ''.join(current).strip()
+    if statement:
+        statements.append(statement)
+    return statements
+
+
+class Migrator:
+    """Aplica las migraciones pendientes y lleva el registro de versiones"""
+    
+    def __init__(self, connection, migrations_dir=MIGRATIONS_DIR, lock_wait_timeout=5):
+        self.connection = connection
+        self.migrations_dir = migrations_dir
+        self.lock_wait_timeout = lock_wait_timeout
+    
+    @staticmethod
+    def connect():
+        """Conexión con la configuración de .env"""
+        return mysql.connector.connect(
+            host=os.getenv('DB_HOST', 'localhost'),
+            port=os.getenv('DB_PORT', '3306'),
+            user=os.getenv('DB_USER', 'root'),
+            password=os.getenv('DB_PASSWORD', ''),
+            database=os.getenv('DB_NAME', 'eid'),
+            charset='utf8mb4',
+            collation='utf8mb4_unicode_ci'
+        )
+    
+    def _execute(self, query, params=None):
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(query, params)
+            rows = cursor.fetchall() if cursor.with_rows else []
+            self.connection.commit()
+            return rows
+        finally:
+            cursor.close()
+    
+    def ensure_table(self):
+        """Crear la tabla de control si no existe"""
+        self._execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version VARCHAR(20) PRIMARY KEY,
+                name VARCHAR(200) NOT NULL,
+                checksum CHAR(64) NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                duration_ms INT NOT NULL DEFAULT 0
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """)
+    
+    def available(self):
+        """Migraciones en disco: lista de (versión, nombre, ruta) en orden"""
+        migrations = []
+        for filename in os.listdir(self.migrations_dir):
+            match = MIGRATION_FILE.match(filename)
+            if match:
+                migrations.append((match.group(1), match.group(2),
+                                   os.path.join(self.migrations_dir, filename)))
+        return sorted(migrations, key=lambda m: int(m[0]))
+    
+    def applied(self):
+        """Migraciones ya aplicadas: {versión: checksum}"""
+        return dict(self._execute("SELECT version, checksum FROM schema_migrations"))
+    
+    @staticmethod
+    def checksum(path):
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    
+    def status(self):
+        """Lista de (versión, nombre, estado)"""
+        self.ensure_table()
+        applied = self.applied()
+        result = []
+        for version, name, path in self.available():
+            if version not in applied:
+                state = 'pendiente'
+            elif applied[version] != self.checksum(path):
+                state = 'modificada'
+            else:
+                state = 'aplicada'
+            result.append((version, name, state))
+        return result
+    
+    def _record(self, version, name, path, duration_ms=0):
+        self._execute(
+            "INSERT INTO schema_migrations (version, name, checksum, duration_ms) VALUES (%s, %s, %s, %s)",
+            (version, name, self.checksum(path), duration_ms)
+        )
+    
+    def baseline(self, up_to):
+        """Marcar como aplicadas (sin ejecutarlas) las migraciones hasta `up_to`"""
+        self.ensure_table()
+        applied = self.applied()
+        marked = []
+        for version, name, path in self.available():
+            if int(version) <= int(up_to) and version not in applied:
+                self._record(version, name, path)
+                marked.append(version)
+        return marked
+    
+    def migrate(self, target=None, dry_run=False, log=print):
+        """Aplicar en orden las migraciones pendientes (hasta `target` si se indica)"""
+        self.ensure_table()
+        applied = self.applied()
+        # Las ALTER en línea no deben quedarse esperando el bloqueo de metadatos
+        # detrás de transacciones largas bloqueando a su vez a todo el tráfico
+        self._execute("SET SESSION lock_wait_timeout = %s", (self.lock_wait_timeout,))
+        
+        done = []
+        for version, name, path in self.available():
+            if version in applied:
+                continue
+            if target is not None and int(version) > int(target):
+                break
+            with open(path, encoding='utf-8') as f:
+                statements = split_statements(f.read())
+            log(f"→ {version}_{name} ({len(statements)} sentencias)")
+            if dry_run:
+                done.append(version)
+                continue
+            
+            started = time.monotonic()
+            for statement in statements:
+                try:
+                    self._execute(statement)
+                except Error as e:
+                    self.connection.rollback()
+                    raise MigrationError(f"{version}_{name}: {e}\n{statement}") from e
+            duration_ms = int((time.monotonic() - started) * 1000)
+            self._record(version, name, path, duration_ms)
+            log(f"✓ {version}_{name} aplicada en {duration_ms} ms")
+            done.append(version)
+        return done
@@ -2,15 +2,35 @@
 Modelo para eventos de calendario
 """
 from app.database import db
+from app.cache import recurrence_cache
+from app.models.data_version import DataVersion, CALENDAR, FREEBUSY
+from app.recurrence import RecurrenceRule
 from datetime import datetime, timedelta
+import base64
+import os
+
+# Eventos por página cuando se piden sin rango de fechas, y máximo que se
+# puede pedir con ?limit= (la página se carga entera en memoria)
+EVENTS_PAGE_SIZE = int(os.environ.get('EVENTS_PAGE_SIZE', '500'))
+EVENTS_MAX_PAGE_SIZE = 2000
+
+# Filas de calendar_events que se expanden y serializan juntas al hacer stream
+EVENTS_STREAM_CHUNK = 200
 
 class CalendarEvent:
     """Modelo de evento de calendario"""
     
+    # Sin __dict__ por instancia: una vista de mes crea miles de eventos
+    __slots__ = ('id', 'user_id', 'title', 'description', 'start_datetime', 'end_datetime',
+                 'event_type', 'color', 'location', 'reminder_minutes', 'all_day', 'rrule',
+                 'recurrence_until', 'created_at', 'updated_at', '_participants',
+                 'occurrence_start')
+    
     def __init__(self, id=None, user_id=None, title=None, description=None,
                  start_datetime=None, end_datetime=None, event_type='other',
                  color='#3b82f6', location=None, reminder_minutes=15,
-                 all_day=False, created_at=None, updated_at=None):
+                 all_day=False, rrule=None, recurrence_until=None,
+                 created_at=None, updated_at=None):
         self.id = id
         self.user_id = user_id
         self.title = title
@@ -22,52 +42,326 @@ class CalendarEvent:
         self.location = location
         self.reminder_minutes = reminder_minutes
         self.all_day = all_day
+        self.rrule = rrule or None
+        self.recurrence_until = recurrence_until
         self.created_at = created_at
         self.updated_at = updated_at
-        
+        # Participantes precargados con load_participants()
+        self._participants = None
+        # Inicio original si es una repetición de una serie (ver expand())
+        self.occurrence_start = None
+    
     def save(self):
         """Guardar o actualizar evento"""
+        if self.rrule:
+            # Regla en forma canónica y fin de la serie para filtrar por rango
+            rule = RecurrenceRule.parse(self.rrule)
+            self.rrule = str(rule)
+            self.recurrence_until = rule.last_end(self.start_datetime, self.duration)
+        else:
+            self.rrule = None
+            self.recurrence_until = None
+        
         if self.id:
             # Actualizar evento existente
             query = """
                 UPDATE calendar_events 
                 SET title = %s, description = %s, start_datetime = %s, 
                     end_datetime = %s, event_type = %s, color = %s, 
-                    location = %s, reminder_minutes = %s, all_day = %s
+                    location = %s, reminder_minutes = %s, all_day = %s,
+                    rrule = %s, recurrence_until = %s
                 WHERE id = %s
             """
             db.execute_query(query, (
                 self.title, self.description, self.start_datetime,
                 self.end_datetime, self.event_type, self.color,
-                self.location, self.reminder_minutes, self.all_day, self.id
+                self.location, self.reminder_minutes, self.all_day,
+                self.rrule, self.recurrence_until, self.id
             ))
+            recurrence_cache.invalidate(self.id)
+            self._bump_busy()
         else:
             # Crear nuevo evento
             query = """
                 INSERT INTO calendar_events 
                 (user_id, title, description, start_datetime, end_datetime, 
-                 event_type, color, location, reminder_minutes, all_day)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                 event_type, color, location, reminder_minutes, all_day,
+                 rrule, recurrence_until)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
             """
             result = db.execute_query(query, (
                 self.user_id, self.title, self.description, self.start_datetime,
                 self.end_datetime, self.event_type, self.color, self.location,
-                self.reminder_minutes, self.all_day
+                self.reminder_minutes, self.all_day, self.rrule, self.recurrence_until
             ))
             self.id = result
+            # Aún no tiene participantes
+            self._bump_busy(())
+        if self.id:
+            self.schedule_reminder()
+            DataVersion.bump(self.user_id, CALENDAR)
         return self.id
     
     def delete(self):
-        """Eliminar evento"""
+        """Eliminar evento (con una serie se eliminan todas sus repeticiones)"""
+        # Los participantes se borran en cascada: se leen antes
+        participant_ids = self._participant_ids()
         db.execute_query("DELETE FROM calendar_events WHERE id = %s", (self.id,))
+        recurrence_cache.invalidate(self.id)
+        DataVersion.bump(self.user_id, CALENDAR)
+        self._bump_busy(participant_ids)
+    
+    def _participant_ids(self):
+        rows = db.fetch_all(
+            "SELECT contact_user_id FROM event_participants WHERE event_id = %s",
+            (self.id,)
+        )
+        return [row['contact_user_id'] for row in rows]
+    
+    def _bump_busy(self, participant_ids=None):
+        """Invalidar la ocupación (freebusy) del dueño y los participantes"""
+        if participant_ids is None:
+            participant_ids = self._participant_ids()
+        DataVersion.bump_many([self.user_id, *participant_ids], FREEBUSY)
+    
+    @property
+    def duration(self):
+        """Duración de cada repetición"""
+        if self.start_datetime and self.end_datetime:
+            return self.end_datetime - self.start_datetime
+        return timedelta(0)
+    
+    def override_occurrence(self, original_start, start_datetime=None, end_datetime=None,
+                            title=None, description=None, location=None):
+        """Modificar una sola repetición de la serie (por su inicio original)"""
+        self._save_exception(original_start, False, title, description,
+                             start_datetime, end_datetime, location)
+    
+    def cancel_occurrence(self, original_start):
+        """Quitar una sola repetición de la serie"""
+        self._save_exception(original_start, True)
+    
+    def _save_exception(self, original_start, cancelled, title=None, description=None,
+                        start_datetime=None, end_datetime=None, location=None):
+        if not self.rrule or not RecurrenceRule.parse(self.rrule).includes(self.start_datetime, original_start):
+            raise ValueError("La fecha no corresponde a una repetición de este evento")
+        query = """
+            INSERT INTO calendar_event_exceptions
+            (event_id, original_start, is_cancelled, title, description,
+             start_datetime, end_datetime, location)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                is_cancelled = VALUES(is_cancelled), title = VALUES(title),
+                description = VALUES(description), start_datetime = VALUES(start_datetime),
+                end_datetime = VALUES(end_datetime), location = VALUES(location)
+        """
+        db.execute_query(query, (self.id, original_start, cancelled, title, description,
+                                 start_datetime, end_datetime, location))
+        recurrence_cache.invalidate(self.id)
+        self.schedule_reminder()
+        DataVersion.bump(self.user_id, CALENDAR)
+        self._bump_busy()
+    
+    def next_occurrence(self, after):
+        """(inicio original, inicio) de la primera repetición que empieza después de `after`"""
+        if not self.rrule:
+            if self.start_datetime and self.start_datetime > after:
+                return self.start_datetime, self.start_datetime
+            return None
+        
+        rows = db.fetch_all("""
+            SELECT original_start, is_cancelled, start_datetime
+            FROM calendar_event_exceptions
+            WHERE event_id = %s AND (original_start > %s OR start_datetime > %s)
+        """, (self.id, after, after))
+        exceptions = {row['original_start']: row for row in rows}
+        candidates = []
+        # Repeticiones movidas a después de `after` desde antes
+        for original_start, row in exceptions.items():
+            if original_start <= after and not row['is_cancelled'] and row['start_datetime']:
+                candidates.append((row['start_datetime'], original_start))
+        
+        rule = RecurrenceRule.parse(self.rrule)
+        for original_start in rule.between(self.start_datetime, after + timedelta(microseconds=1),
+                                           datetime.max, limit=len(exceptions) + 1):
+            row = exceptions.get(original_start)
+            if row is None:
+                candidates.append((original_start, original_start))
+                break
+            if not row['is_cancelled']:
+                start = row['start_datetime'] or original_start
+                if start > after:
+                    candidates.append((start, original_start))
+        if not candidates:
+            return None
+        start, original_start = min(candidates)
+        return original_start, start
+    
+    def schedule_reminder(self, after=None):
+        """
+        Programar el recordatorio de la próxima repetición (o quitarlo si no hay).
+        `after`: buscar repeticiones que empiecen después de este momento.
+        """
+        from app.reminders import reminder_scheduler
+        
+        after = max(after or datetime.now(), datetime.now())
+        upcoming = self.next_occurrence(after) if self.reminder_minutes and int(self.reminder_minutes) > 0 else None
+        if upcoming is None:
+            db.execute_query(
+                "DELETE FROM calendar_reminders WHERE event_id = %s AND status = 'pending'", (self.id,)
+            )
+            return None
+        
+        start = upcoming[1]
+        fire_at = start - timedelta(minutes=int(self.reminder_minutes))
+        # Si la repetición y la hora no cambian, un recordatorio ya enviado no se repite
+        reminder_id = db.execute_query("""
+            INSERT INTO calendar_reminders (event_id, user_id, occurrence_start, fire_at)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                status = IF(status = 'sent' AND occurrence_start = VALUES(occurrence_start)
+                            AND fire_at = VALUES(fire_at), 'sent', 'pending'),
+                claim_token = IF(status = 'sent', claim_token, NULL),
+                attempts = 0,
+                id = LAST_INSERT_ID(id),
+                user_id = VALUES(user_id),
+                occurrence_start = VALUES(occurrence_start),
+                fire_at = VALUES(fire_at)
+        """, (self.id, self.user_id, start, fire_at))
+        if reminder_id:
+            reminder_scheduler.push(reminder_id, fire_at)
+        return fire_at
+    
+    def occurrence(self, original_start, start_datetime=None, end_datetime=None, override=None):
+        """Copia del evento para una repetición concreta"""
+        event = CalendarEvent(
+            id=self.id, user_id=self.user_id, title=self.title,
+            description=self.description,
+            start_datetime=start_datetime or original_start,
+            end_datetime=end_datetime or original_start + self.duration,
+            event_type=self.event_type, color=self.color, location=self.location,
+            reminder_minutes=self.reminder_minutes, all_day=self.all_day,
+            rrule=self.rrule, recurrence_until=self.recurrence_until,
+            created_at=self.created_at, updated_at=self.updated_at
+        )
+        event.occurrence_start = original_start
+        for field, value in (override or {}).items():
+            if value is not None:
+                setattr(event, field, value)
+        return event
+    
+    @staticmethod
+    def expand(events, start_date, end_date):
+        """
+        Sustituir cada serie por sus repeticiones dentro de [start_date, end_date].
+        
+        Solo se generan las repeticiones de la ventana. El resultado de cada
+        (serie, ventana) se cachea con la versión 'calendar' de su dueño, que
+        suben todos los cambios de la serie y de sus excepciones: la caché de
+        un proceso no sirve repeticiones que otro ya ha cambiado. Las
+        excepciones de las series que no están en caché se cargan con una
+        sola query.
+        """
+        start_date = start_date.replace(tzinfo=None)
+        end_date = end_date.replace(tzinfo=None)
+        series = [event for event in events if event.rrule]
+        if not series:
+            return events
+        
+        # Versión leída antes que las excepciones, como en freebusy
+        versions = DataVersion.get_many({event.user_id for event in series}, CALENDAR)
+        
+        def cache_part(event):
+            return (f"v{versions[event.user_id]}|{event.rrule}|{event.start_datetime.isoformat()}"
+                    f"|{event.end_datetime.isoformat()}|{start_date.isoformat()}|{end_date.isoformat()}")
+        
+        expanded = {}
+        missing = []
+        # Versión de la caché de cada serie, leída antes de cargar excepciones
+        cache_versions = {}
+        for event in series:
+            cache_versions[event.id] = recurrence_cache.version(event.id)
+            cached = recurrence_cache.get(event.id, cache_part(event), cache_versions[event.id])
+            if cached is None:
+                missing.append(event)
+            else:
+                expanded[event.id] = cached
+        
+        if missing:
+            exceptions = CalendarEvent._load_exceptions(missing, start_date, end_date)
+            for event in missing:
+                occurrences = CalendarEvent._expand_series(event, exceptions.get(event.id, {}),
+                                                           start_date, end_date)
+                recurrence_cache.set(event.id, cache_part(event), occurrences,
+                                     version=cache_versions[event.id])
+                expanded[event.id] = occurrences
+        
+        result = [event for event in events if not event.rrule]
+        for event in series:
+            for original_start, start, end, override in expanded[event.id]:
+                result.append(event.occurrence(original_start, start, end, override))
+        result.sort(key=lambda event: event.start_datetime)
+        return result
+    
+    @staticmethod
+    def _expand_series(event, exceptions, start_date, end_date):
+        """Lista de (inicio original, inicio, fin, cambios) de una serie en la ventana"""
+        rule = RecurrenceRule.parse(event.rrule)
+        duration = event.duration
+        occurrences = []
+        for original_start in rule.between(event.start_datetime, start_date, end_date, duration):
+            exception = exceptions.pop(original_start, None)
+            if exception is None:
+                occurrences.append((original_start, original_start, original_start + duration, None))
+            elif not exception['is_cancelled']:
+                occurrence = CalendarEvent._overridden(original_start, duration, exception)
+                if occurrence[1] <= end_date and occurrence[2] >= start_date:
+                    occurrences.append(occurrence)
+        # Repeticiones movidas a la ventana desde fuera de ella (las que ya no
+        # son de la serie, porque cambió su regla o su inicio, se ignoran)
+        for original_start, exception in exceptions.items():
+            if exception['is_cancelled'] or not rule.includes(event.start_datetime, original_start):
+                continue
+            occurrence = CalendarEvent._overridden(original_start, duration, exception)
+            if occurrence[1] <= end_date and occurrence[2] >= start_date:
+                occurrences.append(occurrence)
+        return occurrences
+    
+    @staticmethod
+    def _overridden(original_start, duration, exception):
+        start = exception['start_datetime'] or original_start
+        end = exception['end_datetime'] or start + duration
+        override = {field: exception[field] for field in ('title', 'description', 'location')
+                    if exception[field] is not None}
+        return original_start, start, end, override
+    
+    @staticmethod
+    def _load_exceptions(series, start_date, end_date):
+        """Excepciones que afectan a la ventana: {event_id: {inicio original: fila}}"""
+        longest = max(event.duration for event in series)
+        placeholders = ', '.join(['%s'] * len(series))
+        query = f"""
+            SELECT * FROM calendar_event_exceptions
+            WHERE event_id IN ({placeholders})
+            AND ((original_start >= %s AND original_start <= %s)
+                 OR (start_datetime <= %s AND end_datetime >= %s))
+        """
+        params = tuple(event.id for event in series) + (start_date - longest, end_date, end_date, start_date)
+        exceptions = {}
+        for row in db.fetch_all(query, params):
+            exceptions.setdefault(row['event_id'], {})[row['original_start']] = row
+        return exceptions
     
     def add_participant(self, contact_user_id):
         """Agregar un contacto como participante del evento"""
+        self._participants = None
         try:
             db.execute_query(
                 "INSERT INTO event_participants (event_id, contact_user_id) VALUES (%s, %s)",
                 (self.id, contact_user_id)
             )
+            DataVersion.bump(self.user_id, CALENDAR)
+            DataVersion.bump(contact_user_id, FREEBUSY)
             return True
         except:
             # Ya existe o error
@@ -75,20 +369,94 @@ class CalendarEvent:
     
     def remove_participant(self, contact_user_id):
         """Eliminar un participante del evento"""
+        self._participants = None
         db.execute_query(
             "DELETE FROM event_participants WHERE event_id = %s AND contact_user_id = %s",
             (self.id, contact_user_id)
         )
+        DataVersion.bump(self.user_id, CALENDAR)
+        DataVersion.bump(contact_user_id, FREEBUSY)
+    
+    def set_participants(self, contact_user_ids):
+        """
+        Dejar como participantes exactamente contact_user_ids.
+        
+        Se calcula la diferencia con los actuales y se aplica con un DELETE ... IN
+        y un INSERT de varias filas en una sola transacción.
+        Retorna (añadidos, eliminados).
+        """
+        wanted = {int(user_id) for user_id in contact_user_ids if user_id}
+        with db.transaction():
+            current = set(self._participant_ids())
+            to_add = sorted(wanted - current)
+            to_remove = sorted(current - wanted)
+            
+            if to_remove:
+                placeholders = ', '.join(['%s'] * len(to_remove))
+                db.execute_query(
+                    f"DELETE FROM event_participants WHERE event_id = %s AND contact_user_id IN ({placeholders})",
+                    (self.id, *to_remove)
+                )
+            db.execute_many(
+                "INSERT IGNORE INTO event_participants (event_id, contact_user_id) VALUES (%s, %s)",
+                [(self.id, user_id) for user_id in to_add]
+            )
+            if to_add or to_remove:
+                DataVersion.bump(self.user_id, CALENDAR)
+                DataVersion.bump_many(to_add + to_remove, FREEBUSY)
+        self._participants = None
+        return to_add, to_remove
     
     def get_participants(self):
         """Obtener lista de participantes del evento"""
+        if self._participants is not None:
+            return self._participants
         query = """
-            SELECT u.id, u.username, u.full_name, u.profile_image
+            SELECT u.id, u.username, u.full_name, u.avatar
             FROM event_participants ep
             JOIN users u ON ep.contact_user_id = u.id
             WHERE ep.event_id = %s
         """
-        return db.fetch_all(query, (self.id,))
+        self._participants = db.fetch_all(query, (self.id,))
+        return self._participants
+    
+    @staticmethod
+    def load_participants(events, profiles=True):
+        """
+        Cargar los participantes de varios eventos con una sola query.
+        Con profiles=False solo se cargan los ids (sin leer users): es lo que
+        va en respuestas cacheadas por la versión del calendario, que no
+        cambia cuando un participante edita su perfil.
+        """
+        # Las repeticiones de una serie comparten id (y participantes)
+        by_id = {}
+        for event in events:
+            if event.id:
+                by_id.setdefault(event.id, []).append(event)
+        if not by_id:
+            return events
+        placeholders = ', '.join(['%s'] * len(by_id))
+        if profiles:
+            query = f"""
+                SELECT ep.event_id, u.id, u.username, u.full_name, u.avatar
+                FROM event_participants ep
+                JOIN users u ON ep.contact_user_id = u.id
+                WHERE ep.event_id IN ({placeholders})
+            """
+        else:
+            query = f"""
+                SELECT event_id, contact_user_id AS id
+                FROM event_participants
+                WHERE event_id IN ({placeholders})
+            """
+        participants = {event_id: [] for event_id in by_id}
+        for row in db.fetch_all(query, tuple(by_id)):
+            event_id = row.pop('event_id')
+            participants[event_id].append(row)
+        for event_id, same_id in by_id.items():
+            for event in same_id:
+                event._participants = participants[event_id]
+        return events
     
     def to_dict(self):
         """Convertir a diccionario para JSON"""
@@ -105,6 +473,8 @@ class CalendarEvent:
                 'type': self.event_type,
                 'location': self.location,
                 'reminder': self.reminder_minutes,
+                'rrule': self.rrule,
+                'occurrenceStart': self.occurrence_start.isoformat() if self.occurrence_start else None,
                 'participants': self.get_participants() if self.id else []
             }
         }
@@ -118,39 +488,142 @@ class CalendarEvent:
         return None
     
     @staticmethod
-    def get_by_user(user_id):
-        """Obtener todos los eventos de un usuario"""
-        query = "SELECT * FROM calendar_events WHERE user_id = %s ORDER BY start_datetime ASC"
-        events_data = db.fetch_all(query, (user_id,))
-        return [CalendarEvent(**data) for data in events_data]
+    def encode_page_cursor(event):
+        """Cursor opaco (inicio, fin, id) del último evento de una página"""
+        raw = f"{event.start_datetime.isoformat()}|{event.end_datetime.isoformat()}|{event.id}"
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
     
     @staticmethod
-    def get_by_date_range(user_id, start_date, end_date):
-        """Obtener eventos en un rango de fechas"""
+    def decode_page_cursor(cursor):
+        """Retorna (inicio, fin, id) o None si el cursor no es válido"""
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+            start, end, event_id = raw.split('|')
+            return datetime.fromisoformat(start), datetime.fromisoformat(end), int(event_id)
+        except (ValueError, AttributeError, TypeError):
+            return None
+    
+    @staticmethod
+    def get_by_user(user_id, after=None, limit=EVENTS_PAGE_SIZE):
+        """
+        Obtener los eventos de un usuario por páginas (series sin expandir).
+        Retorna (eventos, cursor para la página siguiente o None)
+        """
+        limit = max(1, min(limit or EVENTS_PAGE_SIZE, EVENTS_MAX_PAGE_SIZE))
+        params = [user_id]
+        keyset = ''
+        position = CalendarEvent.decode_page_cursor(after) if after else None
+        if position:
+            keyset = "AND (start_datetime, end_datetime, id) > (%s, %s, %s)"
+            params += list(position)
+        # Mismo orden que idx_user_dates (más el id): cada página es un rango
+        # del índice, sin ordenar las anteriores
+        query = f"""
+            SELECT * FROM calendar_events
+            WHERE user_id = %s {keyset}
+            ORDER BY start_datetime ASC, end_datetime ASC, id ASC
+            LIMIT %s
+        """
+        events = db.fetch_all_as(CalendarEvent, query, tuple(params + [limit + 1]))
+        has_more = len(events) > limit
+        events = events[:limit]
+        cursor = CalendarEvent.encode_page_cursor(events[-1]) if has_more else None
+        return events, cursor
+    
+    @staticmethod
+    def _date_range_query(user_id, start_date, end_date):
         query = """
             SELECT * FROM calendar_events 
             WHERE user_id = %s 
             AND start_datetime <= %s 
-            AND end_datetime >= %s
+            AND (end_datetime >= %s
+                 OR (rrule IS NOT NULL AND (recurrence_until IS NULL OR recurrence_until >= %s)))
             ORDER BY start_datetime ASC
         """
-        events_data = db.fetch_all(query, (user_id, end_date, start_date))
-        return [CalendarEvent(**data) for data in events_data]
+        return query, (user_id, end_date, start_date, start_date)
+    
+    @staticmethod
+    def get_by_date_range(user_id, start_date, end_date):
+        """Obtener eventos en un rango de fechas (las series, ya expandidas)"""
+        query, params = CalendarEvent._date_range_query(user_id, start_date, end_date)
+        events = db.fetch_all_as(CalendarEvent, query, params)
+        return CalendarEvent.expand(events, start_date, end_date)
+    
+    @staticmethod
+    def stream_by_date_range(user_id, start_date, end_date, chunk_size=EVENTS_STREAM_CHUNK,
+                             profiles=True):
+        """
+        Como get_by_date_range pero generando los eventos según llegan de MySQL.
+        
+        Las filas se leen con db.stream y se procesan en bloques de
+        `chunk_size`: cada bloque se expande y carga sus participantes (una
+        query por bloque) antes de pasar al siguiente, así que la memoria no
+        depende del número de eventos. El orden es por inicio dentro de cada
+        bloque, no en todo el resultado. `profiles` como en load_participants.
+        """
+        query, params = CalendarEvent._date_range_query(user_id, start_date, end_date)
+        chunk = []
+        for event in db.stream(query, params, fetch_size=chunk_size, cls=CalendarEvent):
+            chunk.append(event)
+            if len(chunk) >= chunk_size:
+                yield from CalendarEvent.load_participants(
+                    CalendarEvent.expand(chunk, start_date, end_date), profiles)
+                chunk = []
+        if chunk:
+            yield from CalendarEvent.load_participants(
+                CalendarEvent.expand(chunk, start_date, end_date), profiles)
+    
+    @staticmethod
+    def busy_intervals(user_ids, start_date, end_date):
+        """
+        Intervalos (inicio, fin) ocupados de varios usuarios en [start_date, end_date):
+        sus eventos y los eventos en los que participan, con las series ya
+        expandidas. Una sola query para todos; los cumpleaños no ocupan.
+        """
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+        placeholders = ', '.join(['%s'] * len(user_ids))
+        columns = "e.id, e.user_id, e.start_datetime, e.end_datetime, e.rrule, e.recurrence_until"
+        overlaps = """
+            e.start_datetime < %s AND e.event_type <> 'birthday'
+            AND (e.end_datetime > %s
+                 OR (e.rrule IS NOT NULL AND (e.recurrence_until IS NULL OR e.recurrence_until > %s)))
+        """
+        query = f"""
+            SELECT e.user_id AS busy_user_id, {columns}
+            FROM calendar_events e
+            WHERE e.user_id IN ({placeholders}) AND {overlaps}
+            UNION ALL
+            SELECT ep.contact_user_id AS busy_user_id, {columns}
+            FROM event_participants ep
+            JOIN calendar_events e ON e.id = ep.event_id
+            WHERE ep.contact_user_id IN ({placeholders}) AND {overlaps}
+        """
+        window = (end_date, start_date, start_date)
+        rows = db.fetch_all(query, (*user_ids, *window, *user_ids, *window))
+        
+        # Un evento compartido llega una vez por usuario: se expande una sola vez
+        events = {}
+        owners = {}
+        for row in rows:
+            owners.setdefault(row['id'], set()).add(row.pop('busy_user_id'))
+            if row['id'] not in events:
+                events[row['id']] = CalendarEvent(**row)
+        
+        busy = {user_id: [] for user_id in user_ids}
+        for event in CalendarEvent.expand(list(events.values()), start_date, end_date):
+            for user_id in owners[event.id]:
+                busy[user_id].append((event.start_datetime, event.end_datetime))
+        return busy
     
     @staticmethod
     def get_upcoming(user_id, days=7):
         """Obtener eventos próximos"""
         start = datetime.now()
         end = start + timedelta(days=days)
-        query = """
-            SELECT * FROM calendar_events 
-            WHERE user_id = %s 
-            AND start_datetime >= %s 
-            AND start_datetime <= %s
-            ORDER BY start_datetime ASC
-        """
-        events_data = db.fetch_all(query, (user_id, start, end))
-        return [CalendarEvent(**data) for data in events_data]
+        events = CalendarEvent.get_by_date_range(user_id, start, end)
+        return [event for event in events if start <= event.start_datetime <= end]
     
     @staticmethod
     def get_event_types():
@@ -1,6 +1,7 @@
 """Modelo de Contactos/Agenda - MySQL directo"""
 
-from app.database import db
+from app.database import db, Error
+from app.models.contact_folder import ContactFolder
 
 class Contact:
     """Relación de contactos entre usuarios"""
@@ -25,21 +26,21 @@ class Contact:
         return db.fetch_one(query, (user_id, contact_id, contact_id, user_id))
     
     @staticmethod
-    def get_accepted(user_id):
-        """Obtener contactos aceptados"""
-        query = """
-            SELECT c.*, u.username, u.full_name, u.avatar
-            FROM contacts c
-            JOIN users u ON (
-                CASE 
-                    WHEN c.user_id = %s THEN u.id = c.contact_id
-                    ELSE u.id = c.user_id
-                END
-            )
-            WHERE (c.user_id = %s OR c.contact_id = %s) 
-              AND c.status = 'accepted'
+    def get_accepted(user_id, folder_id=None):
+        """
+        Obtener contactos aceptados (opcionalmente solo los de una carpeta).
+        `id` es el id de usuario del contacto y `contact_id` el de la relación
         """
-        return db.fetch_all(query, (user_id, user_id, user_id))
+        folder_filter = "AND e.folder_id = %s" if folder_id else ""
+        params = (user_id, folder_id) if folder_id else (user_id,)
+        query = f"""
+            SELECT e.peer_id AS id, e.contact_id, e.owner_id AS user_id, e.status,
+                   e.folder_id, e.created_at, u.username, u.full_name, u.avatar
+            FROM contact_edges e
+            JOIN users u ON u.id = e.peer_id
+            WHERE e.owner_id = %s AND e.status = 'accepted' {folder_filter}
+        """
+        return db.fetch_all(query, params)
     
     @staticmethod
     def get_pending_sent(user_id):
@@ -69,23 +70,103 @@ class Contact:
         query = """
             UPDATE contacts 
             SET status = 'accepted', accepted_at = CURRENT_TIMESTAMP
-            WHERE id = %s AND contact_id = %s
+            WHERE id = %s AND contact_id = %s AND status <> 'accepted'
         """
-        return db.execute_query(query, (contact_id, user_id))
+        # Relación, aristas y contador de carpeta se confirman juntos. Solo
+        # quien cambia el estado crea las aristas y suma al contador: dos
+        # aceptaciones a la vez no cuentan dos veces
+        try:
+            with db.transaction():
+                accepted = db.execute_update(query, (contact_id, user_id))
+                if accepted:
+                    row = db.fetch_one(
+                        "SELECT user_id, folder_id FROM contacts WHERE id = %s", (contact_id,)
+                    )
+                    # Una arista por cada lado; el solicitante conserva su carpeta
+                    db.execute_query("""
+                        INSERT INTO contact_edges (owner_id, peer_id, contact_id, status, folder_id)
+                        VALUES (%s, %s, %s, 'accepted', %s), (%s, %s, %s, 'accepted', NULL)
+                        ON DUPLICATE KEY UPDATE status = 'accepted', contact_id = VALUES(contact_id)
+                    """, (row['user_id'], user_id, contact_id, row['folder_id'],
+                          user_id, row['user_id'], contact_id))
+                    ContactFolder.adjust_count(row['folder_id'], row['user_id'], 1)
+        except Error:
+            return None
+        return accepted
     
     @staticmethod
     def reject(contact_id, user_id):
         """Rechazar/eliminar solicitud"""
         query = "DELETE FROM contacts WHERE id = %s AND contact_id = %s"
-        return db.execute_query(query, (contact_id, user_id))
+        try:
+            with db.transaction():
+                # Bloquear la relación: una aceptación concurrente no puede
+                # crear aristas entre la lectura y el borrado
+                if not db.fetch_one(
+                    "SELECT id FROM contacts WHERE id = %s AND contact_id = %s FOR UPDATE",
+                    (contact_id, user_id)
+                ):
+                    return 0
+                edges = db.fetch_all(
+                    "SELECT owner_id, folder_id FROM contact_edges WHERE contact_id = %s AND status = 'accepted'",
+                    (contact_id,)
+                )
+                deleted = db.execute_update(query, (contact_id, user_id))
+                # Las aristas se borran en cascada con la relación
+                if deleted:
+                    for edge in edges:
+                        ContactFolder.adjust_count(edge['folder_id'], edge['owner_id'], -1)
+        except Error:
+            return 0
+        return deleted
+    
+    @staticmethod
+    def move_to_folder(peer_id, user_id, folder_id):
+        """Mover un contacto (por id de usuario) a una carpeta (None para quitarlo)"""
+        folder_id = folder_id or None
+        if folder_id and not ContactFolder.get_by_id(folder_id, user_id):
+            return False
+        query = """
+            UPDATE contact_edges 
+            SET folder_id = %s 
+            WHERE owner_id = %s AND peer_id = %s
+        """
+        try:
+            with db.transaction():
+                # Carpeta actual bloqueada hasta el commit: dos movimientos a la
+                # vez no restan los dos de la misma carpeta
+                edge = db.fetch_one(
+                    "SELECT status, folder_id FROM contact_edges WHERE owner_id = %s AND peer_id = %s FOR UPDATE",
+                    (user_id, peer_id)
+                )
+                if not edge:
+                    return False
+                db.execute_query(query, (folder_id, user_id, peer_id))
+                if edge['status'] == 'accepted' and str(edge['folder_id']) != str(folder_id):
+                    ContactFolder.adjust_count(edge['folder_id'], user_id, -1)
+                    ContactFolder.adjust_count(folder_id, user_id, 1)
+        except Error:
+            return False
+        return True
+    
+    @staticmethod
+    def filter_accepted(user_id, peer_ids):
+        """Subconjunto de peer_ids que son contactos aceptados de user_id"""
+        peer_ids = list(peer_ids)
+        if not peer_ids:
+            return set()
+        placeholders = ', '.join(['%s'] * len(peer_ids))
+        query = f"""
+            SELECT peer_id FROM contact_edges
+            WHERE owner_id = %s AND status = 'accepted' AND peer_id IN ({placeholders})
+        """
+        return {row['peer_id'] for row in db.fetch_all(query, (user_id, *peer_ids))}
     
     @staticmethod
     def are_contacts(user1_id, user2_id):
         """Verificar si dos usuarios son contactos"""
         query = """
-            SELECT id FROM contacts 
-            WHERE ((user_id = %s AND contact_id = %s) 
-               OR (user_id = %s AND contact_id = %s))
-              AND status = 'accepted'
+            SELECT contact_id AS id FROM contact_edges 
+            WHERE owner_id = %s AND peer_id = %s AND status = 'accepted'
         """
-        return db.fetch_one(query, (user1_id, user2_id, user2_id, user1_id))
+        return db.fetch_one(query, (user1_id, user2_id))
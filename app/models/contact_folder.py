@@ -3,18 +3,24 @@ Modelo para carpetas de contactos
 """
 
 from app.database import db
+from app.models.data_version import DataVersion, FOLDERS
 
 class ContactFolder:
     """Modelo de carpeta de contactos"""
     
+    __slots__ = ('id', 'user_id', 'name', 'color', 'icon', 'position', 'contacts_count',
+                 'created_at', 'updated_at')
+    
     def __init__(self, id=None, user_id=None, name=None, color='#6366f1', 
-                 icon='folder', position=0, created_at=None, updated_at=None):
+                 icon='folder', position=0, contacts_count=0,
+                 created_at=None, updated_at=None):
         self.id = id
         self.user_id = user_id
         self.name = name
         self.color = color
         self.icon = icon
         self.position = position
+        self.contacts_count = contacts_count
         self.created_at = created_at
         self.updated_at = updated_at
     
@@ -29,6 +35,7 @@ class ContactFolder:
             """
             db.execute_query(query, (self.name, self.color, self.icon, 
                                     self.position, self.id, self.user_id))
+            DataVersion.bump(self.user_id, FOLDERS)
             return self.id
         else:
             # Crear nueva
@@ -39,19 +46,21 @@ class ContactFolder:
             folder_id = db.execute_query(query, (self.user_id, self.name, 
                                                 self.color, self.icon, self.position))
             self.id = folder_id
+            DataVersion.bump(self.user_id, FOLDERS)
             return folder_id
     
     def delete(self):
         """Eliminar carpeta (los contactos quedan sin carpeta)"""
         query = "DELETE FROM contact_folders WHERE id = %s AND user_id = %s"
         db.execute_query(query, (self.id, self.user_id))
+        DataVersion.bump(self.user_id, FOLDERS)
     
     def get_contacts_count(self):
         """Obtener número de contactos en esta carpeta"""
         query = """
             SELECT COUNT(*) as count
-            FROM contacts
-            WHERE user_id = %s AND folder_id = %s AND status = 'accepted'
+            FROM contact_edges
+            WHERE owner_id = %s AND status = 'accepted' AND folder_id = %s
         """
         result = db.fetch_one(query, (self.user_id, self.id))
         return result['count'] if result else 0
@@ -67,20 +76,45 @@ class ContactFolder:
     
     @staticmethod
     def get_all_by_user(user_id):
-        """Obtener todas las carpetas de un usuario"""
+        """Obtener todas las carpetas de un usuario con su número de contactos"""
+        # contacts_count se mantiene al mover, aceptar o rechazar contactos,
+        # así que el listado es una sola lectura por idx_user_folders
         query = """
             SELECT * FROM contact_folders 
             WHERE user_id = %s 
             ORDER BY position ASC, name ASC
         """
-        rows = db.fetch_all(query, (user_id,))
-        folders = [ContactFolder(**row) for row in rows]
-        
-        # Añadir conteo de contactos a cada carpeta
-        for folder in folders:
-            folder.contacts_count = folder.get_contacts_count()
-        
-        return folders
+        return db.fetch_all_as(ContactFolder, query, (user_id,))
+    
+    @staticmethod
+    def adjust_count(folder_id, user_id, delta):
+        """Sumar (o restar) contactos al contador de una carpeta"""
+        if not folder_id or not delta:
+            return
+        query = """
+            UPDATE contact_folders
+            SET contacts_count = GREATEST(contacts_count + %s, 0)
+            WHERE id = %s AND user_id = %s
+        """
+        db.execute_query(query, (delta, folder_id, user_id))
+        DataVersion.bump(user_id, FOLDERS)
+    
+    @staticmethod
+    def recalculate_counts(user_id):
+        """Reconstruir los contadores de un usuario con una sola query agregada"""
+        query = """
+            UPDATE contact_folders f
+            LEFT JOIN (
+                SELECT folder_id, COUNT(*) AS total
+                FROM contact_edges
+                WHERE owner_id = %s AND status = 'accepted' AND folder_id IS NOT NULL
+                GROUP BY folder_id
+            ) c ON c.folder_id = f.id
+            SET f.contacts_count = COALESCE(c.total, 0)
+            WHERE f.user_id = %s
+        """
+        db.execute_query(query, (user_id, user_id))
+        DataVersion.bump(user_id, FOLDERS)
     
     @staticmethod
     def create_default_folder(user_id):
@@ -103,7 +137,7 @@ class ContactFolder:
             'color': self.color,
             'icon': self.icon,
             'position': self.position,
-            'contacts_count': getattr(self, 'contacts_count', 0),
+            'contacts_count': self.contacts_count,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
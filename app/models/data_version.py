@@ -0,0 +1,67 @@
+"""
+Versiones por usuario de los datos que sirven las APIs JSON
+"""
+
+from app.database import db, Error
+
+# Ámbitos versionados
+CALENDAR = 'calendar'
+FOLDERS = 'folders'
+# Ocupación (eventos propios y eventos en los que participa), para /calendar/freebusy
+FREEBUSY = 'busy'
+
+
+class DataVersion:
+    """Contador de cambios por (usuario, ámbito) para ETags"""
+    
+    @staticmethod
+    def bump(user_id, scope):
+        """Marcar que los datos del usuario en `scope` han cambiado"""
+        if not user_id:
+            return
+        db.execute_query("""
+            INSERT INTO user_data_versions (user_id, scope, version)
+            VALUES (%s, %s, 1)
+            ON DUPLICATE KEY UPDATE version = version + 1
+        """, (user_id, scope))
+    
+    @staticmethod
+    def bump_many(user_ids, scope):
+        """bump() de varios usuarios con una sola sentencia"""
+        user_ids = sorted({user_id for user_id in user_ids if user_id})
+        if not user_ids:
+            return
+        try:
+            db.execute_many("""
+                INSERT INTO user_data_versions (user_id, scope, version)
+                VALUES (%s, %s, 1)
+                ON DUPLICATE KEY UPDATE version = version + 1
+            """, [(user_id, scope) for user_id in user_ids])
+        except Error:
+            # Fuera de una transacción, igual que bump(): ya está registrado
+            if db.in_transaction:
+                raise
+    
+    @staticmethod
+    def get(user_id, scope):
+        """Versión actual (0 si nunca ha cambiado)"""
+        row = db.fetch_one(
+            "SELECT version FROM user_data_versions WHERE user_id = %s AND scope = %s",
+            (user_id, scope)
+        )
+        return row['version'] if row else 0
+    
+    @staticmethod
+    def get_many(user_ids, scope):
+        """{user_id: versión} de varios usuarios con una sola query"""
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+        placeholders = ', '.join(['%s'] * len(user_ids))
+        rows = db.fetch_all(f"""
+            SELECT user_id, version FROM user_data_versions
+            WHERE scope = %s AND user_id IN ({placeholders})
+        """, (scope, *user_ids))
+        versions = {user_id: 0 for user_id in user_ids}
+        versions.update((row['user_id'], row['version']) for row in rows)
+        return versions
@@ -1,6 +1,14 @@
 """Modelo de Mensajes/Chat - MySQL directo"""
 
-from app.database import db
+from datetime import datetime
+from app.database import db, Error
+from app.realtime import unread_notifier
+
+# peer_id reservado para el contador total de cada usuario en unread_counters
+TOTAL_PEER_ID = 0
+
+# Mensajes por página del historial de una conversación
+CONVERSATION_PAGE_SIZE = 50
 
 class Message:
     """Mensajes entre usuarios"""
@@ -9,38 +17,147 @@ class Message:
     def create(sender_id, receiver_id, content):
         """Crear nuevo mensaje"""
         query = """
-            INSERT INTO messages (sender_id, receiver_id, content)
-            VALUES (%s, %s, %s)
+            INSERT INTO messages (sender_id, receiver_id, user_low_id, user_high_id, content)
+            VALUES (%s, %s, %s, %s, %s)
         """
-        return db.execute_query(query, (sender_id, receiver_id, content))
+        low_id, high_id = Message.conversation_key(sender_id, receiver_id)
+        # Mensaje y contadores se confirman juntos
+        try:
+            with db.transaction():
+                message_id = db.execute_query(query, (sender_id, receiver_id, low_id, high_id, content))
+                # Contador de la conversación y total en una sola sentencia
+                db.execute_query("""
+                    INSERT INTO unread_counters (user_id, peer_id, unread_count)
+                    VALUES (%s, %s, 1), (%s, %s, 1)
+                    ON DUPLICATE KEY UPDATE unread_count = unread_count + 1
+                """, (receiver_id, sender_id, receiver_id, TOTAL_PEER_ID))
+        except Error:
+            # Ya registrado por Database; no se guarda nada
+            return None
+        if message_id:
+            unread_notifier.publish(receiver_id, 1)
+        return message_id
     
     @staticmethod
-    def get_conversation(user1_id, user2_id):
-        """Obtener conversación entre dos usuarios"""
-        query = """
+    def conversation_key(user1_id, user2_id):
+        """Clave canónica (low_id, high_id) de la conversación entre dos usuarios"""
+        return min(user1_id, user2_id), max(user1_id, user2_id)
+    
+    @staticmethod
+    def encode_cursor(message):
+        """Cursor opaco (created_at, id) para paginar hacia mensajes anteriores"""
+        return f"{message['created_at'].strftime('%Y%m%d%H%M%S%f')}-{message['id']}"
+    
+    @staticmethod
+    def decode_cursor(cursor):
+        """Retorna (created_at, id) o None si el cursor no es válido"""
+        try:
+            created_at, message_id = cursor.split('-')
+            return datetime.strptime(created_at, '%Y%m%d%H%M%S%f'), int(message_id)
+        except (ValueError, AttributeError):
+            return None
+    
+    @staticmethod
+    def get_conversation(user1_id, user2_id, before=None, limit=CONVERSATION_PAGE_SIZE):
+        """
+        Obtener una página de la conversación entre dos usuarios.
+        Retorna (mensajes en orden cronológico, cursor para la página anterior o None)
+        """
+        low_id, high_id = Message.conversation_key(user1_id, user2_id)
+        params = [low_id, high_id]
+        keyset = ""
+        position = Message.decode_cursor(before) if before else None
+        if position:
+            keyset = "AND (created_at < %s OR (created_at = %s AND id < %s))"
+            params += [position[0], position[0], position[1]]
+        query = f"""
             SELECT * FROM messages
-            WHERE (sender_id = %s AND receiver_id = %s)
-               OR (sender_id = %s AND receiver_id = %s)
-            ORDER BY created_at ASC
+            WHERE user_low_id = %s AND user_high_id = %s {keyset}
+            ORDER BY created_at DESC, id DESC
+            LIMIT %s
         """
-        return db.fetch_all(query, (user1_id, user2_id, user2_id, user1_id))
+        rows = db.fetch_all(query, tuple(params + [limit + 1]))
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        rows.reverse()
+        cursor = Message.encode_cursor(rows[0]) if has_more else None
+        return rows, cursor
     
     @staticmethod
     def mark_as_read(sender_id, receiver_id):
         """Marcar mensajes como leídos"""
         query = """
-            UPDATE messages 
+            UPDATE messages
             SET is_read = TRUE, read_at = CURRENT_TIMESTAMP
             WHERE sender_id = %s AND receiver_id = %s AND is_read = FALSE
         """
-        return db.execute_query(query, (sender_id, receiver_id))
+        try:
+            with db.transaction():
+                updated = db.execute_update(query, (sender_id, receiver_id))
+                if updated:
+                    # La conversación queda a 0 y el total baja lo mismo
+                    db.execute_query("""
+                        UPDATE unread_counters
+                        SET unread_count = IF(peer_id = %s, GREATEST(unread_count - %s, 0), 0)
+                        WHERE user_id = %s AND peer_id IN (%s, %s)
+                    """, (TOTAL_PEER_ID, updated, receiver_id, TOTAL_PEER_ID, sender_id))
+        except Error:
+            # Ya registrado por Database; los mensajes siguen sin leer
+            return 0
+        if updated:
+            unread_notifier.publish(receiver_id, -updated)
+        return updated
     
     @staticmethod
     def count_unread(user_id):
         """Contar mensajes no leídos"""
         query = """
-            SELECT COUNT(*) as count FROM messages
-            WHERE receiver_id = %s AND is_read = FALSE
+            SELECT unread_count FROM unread_counters
+            WHERE user_id = %s AND peer_id = %s
+        """
+        result = db.fetch_one(query, (user_id, TOTAL_PEER_ID))
+        return result['unread_count'] if result else 0
+    
+    @staticmethod
+    def count_unread_by_conversation(user_id):
+        """Mensajes no leídos por remitente: {peer_id: count}"""
+        query = """
+            SELECT peer_id, unread_count FROM unread_counters
+            WHERE user_id = %s AND peer_id <> %s AND unread_count > 0
+        """
+        rows = db.fetch_all(query, (user_id, TOTAL_PEER_ID))
+        return {row['peer_id']: row['unread_count'] for row in rows}
+    
+    @staticmethod
+    def rebuild_unread_counters(user_id=None):
+        """
+        Reconstruir los contadores desde la tabla messages (tras una deriva).
+        Sin user_id se reconstruyen los de todos los usuarios.
         """
-        result = db.fetch_one(query, (user_id,))
-        return result['count'] if result else 0
+        user_filter = "AND receiver_id = %s" if user_id else ""
+        params = (user_id,) if user_id else None
+        
+        # Los lectores no ven los contadores a 0 a medio reconstruir
+        with db.transaction():
+            if user_id:
+                db.execute_query("UPDATE unread_counters SET unread_count = 0 WHERE user_id = %s", (user_id,))
+            else:
+                db.execute_query("UPDATE unread_counters SET unread_count = 0")
+            
+            db.execute_query(f"""
+                INSERT INTO unread_counters (user_id, peer_id, unread_count)
+                SELECT receiver_id, sender_id, COUNT(*)
+                FROM messages
+                WHERE is_read = FALSE {user_filter}
+                GROUP BY receiver_id, sender_id
+                ON DUPLICATE KEY UPDATE unread_count = VALUES(unread_count)
+            """, params)
+            db.execute_query(f"""
+                INSERT INTO unread_counters (user_id, peer_id, unread_count)
+                SELECT receiver_id, {TOTAL_PEER_ID}, COUNT(*)
+                FROM messages
+                WHERE is_read = FALSE {user_filter}
+                GROUP BY receiver_id
+                ON DUPLICATE KEY UPDATE unread_count = VALUES(unread_count)
+            """, params)
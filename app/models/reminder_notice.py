@@ -0,0 +1,45 @@
+"""
+Avisos de recordatorios pendientes de ver en la aplicación
+"""
+
+from datetime import datetime, timedelta
+from app.database import db
+
+# Avisos de repeticiones que empezaron hace más de esto ya no se muestran
+NOTICE_MAX_AGE = timedelta(days=1)
+
+
+class ReminderNotice:
+    """Aviso de un recordatorio para un usuario, hasta que lo ve"""
+    
+    @staticmethod
+    def create_many(notices):
+        """
+        Guardar avisos (user_id, event_id, occurrence_start, title, location)
+        con una sola sentencia por lote. Los errores se propagan: el
+        recordatorio no cuenta como entregado.
+        """
+        return db.execute_many("""
+            INSERT INTO reminder_notices (user_id, event_id, occurrence_start, title, location)
+            VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE title = VALUES(title), location = VALUES(location)
+        """, notices)
+    
+    @staticmethod
+    def get_unseen(user_id, limit=20):
+        """Avisos sin ver de repeticiones recientes, del más antiguo al más nuevo"""
+        return db.fetch_all("""
+            SELECT event_id, occurrence_start, title, location
+            FROM reminder_notices
+            WHERE user_id = %s AND seen_at IS NULL AND occurrence_start >= %s
+            ORDER BY occurrence_start
+            LIMIT %s
+        """, (user_id, datetime.now() - NOTICE_MAX_AGE, limit))
+    
+    @staticmethod
+    def mark_seen(user_id, event_id, occurrence_start):
+        """Marcar un aviso como visto"""
+        return db.execute_update("""
+            UPDATE reminder_notices SET seen_at = %s
+            WHERE user_id = %s AND event_id = %s AND occurrence_start = %s AND seen_at IS NULL
+        """, (datetime.now(), user_id, event_id, occurrence_start))
@@ -2,6 +2,7 @@
 
 import json
 from app.database import db
+from app.cache import profile_cache
 
 class SocialLink:
     """Enlaces a redes sociales del usuario"""
@@ -14,7 +15,9 @@ class SocialLink:
             VALUES (%s, %s, %s, %s, %s, %s)
         """
         profile_json = json.dumps(profile_data) if profile_data else None
-        return db.execute_query(query, (user_id, platform, username, url, is_visible, profile_json))
+        link_id = db.execute_query(query, (user_id, platform, username, url, is_visible, profile_json))
+        profile_cache.invalidate(user_id)
+        return link_id
     
     @staticmethod
     def update(link_id, user_id, username, url, is_visible=True, profile_data=None):
@@ -25,7 +28,22 @@ class SocialLink:
             WHERE id = %s AND user_id = %s
         """
         profile_json = json.dumps(profile_data) if profile_data else None
-        return db.execute_query(query, (username, url, is_visible, profile_json, link_id, user_id))
+        result = db.execute_query(query, (username, url, is_visible, profile_json, link_id, user_id))
+        profile_cache.invalidate(user_id)
+        return result
+    
+    @staticmethod
+    def update_profile_data(link_id, user_id, url, profile_data):
+        """Guardar los datos extraídos del perfil (si el enlace no ha cambiado de URL)"""
+        query = """
+            UPDATE social_links 
+            SET profile_data = %s
+            WHERE id = %s AND user_id = %s AND url = %s
+        """
+        profile_json = json.dumps(profile_data) if profile_data else None
+        result = db.execute_query(query, (profile_json, link_id, user_id, url))
+        profile_cache.invalidate(user_id)
+        return result
     
     @staticmethod
     def get_by_platform(user_id, platform):
@@ -60,4 +78,36 @@ class SocialLink:
     def delete(link_id, user_id):
         """Eliminar enlace (solo si pertenece al usuario)"""
         query = "DELETE FROM social_links WHERE id = %s AND user_id = %s"
-        return db.execute_query(query, (link_id, user_id))
+        result = db.execute_query(query, (link_id, user_id))
+        profile_cache.invalidate(user_id)
+        return result
+    
+    @staticmethod
+    def parse_profile_data(link):
+        """Añadir profile_data_parsed (dict o None) a partir de la columna JSON"""
+        data = link.get('profile_data')
+        if isinstance(data, (bytes, bytearray)):
+            data = data.decode('utf-8')
+        if isinstance(data, str):
+            try:
+                data = json.loads(data)
+            except ValueError:
+                data = None
+        link['profile_data_parsed'] = data if isinstance(data, dict) else None
+        return link
+    
+    @staticmethod
+    def get_profile_links(user_id, visible_only=False):
+        """
+        Enlaces del perfil con profile_data ya parseado, a través de la caché
+        de perfiles. La lista es compartida: no modificarla.
+        """
+        if visible_only:
+            return profile_cache.get_or_load(
+                user_id, 'links:visible',
+                lambda: [SocialLink.parse_profile_data(link) for link in SocialLink.get_visible_by_user(user_id)]
+            )
+        return profile_cache.get_or_load(
+            user_id, 'links',
+            lambda: [SocialLink.parse_profile_data(link) for link in SocialLink.get_by_user(user_id)]
+        )
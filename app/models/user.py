@@ -1,12 +1,40 @@
 """Modelo de Usuario - MySQL directo"""
 
+from flask import g, has_app_context
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
-from app.database import db
+from app.database import db, Error
+from app.cache import TTLCache, profile_cache
 from app import login_manager
+import base64
+import os
 import secrets
 import string
 
+# Las filas de users se cachean entre peticiones como parte 'user' del perfil
+# (ver app.cache.profile_cache; USER_CACHE_TTL=0 la desactiva)
+USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', '30'))
+
+# Resultados recientes de búsqueda: absorbe las peticiones repetidas del
+# type-ahead (USER_SEARCH_CACHE_TTL=0 la desactiva)
+_search_cache = TTLCache(
+    maxsize=int(os.environ.get('USER_SEARCH_CACHE_SIZE', '5000')),
+    ttl=int(os.environ.get('USER_SEARCH_CACHE_TTL', '10'))
+)
+
+SEARCH_MIN_LENGTH = 2
+SEARCH_PAGE_SIZE = 20
+SEARCH_TERM_LENGTH = 100
+FRIEND_CODE_LENGTH = 8
+
+def _identity_map():
+    """Usuarios ya cargados en la petición actual (None fuera de Flask)"""
+    if not has_app_context():
+        return None
+    if 'user_identity_map' not in g:
+        g.user_identity_map = {}
+    return g.user_identity_map
+
 class User(UserMixin):
     """Usuario del sistema eID"""
     
@@ -34,7 +62,7 @@ class User(UserMixin):
         """Generar código de amigo único (8 caracteres)"""
         while True:
             chars = string.ascii_uppercase + string.digits
-            code = ''.join(secrets.choice(chars) for _ in range(8))
+            code = ''.join(secrets.choice(chars) for _ in range(FRIEND_CODE_LENGTH))
             # Verificar que sea único
             if not User.find_by_friend_code(code):
                 return code
@@ -48,8 +76,8 @@ class User(UserMixin):
             INSERT INTO users (username, email, password_hash, friend_code, full_name)
             VALUES (%s, %s, %s, %s, %s)
         """
-        user_id = db.execute_query(query, (username, email, password_hash, friend_code, full_name))
-        return user_id
+        return User._insert_indexed(query, (username, email, password_hash, friend_code, full_name),
+                                    username, full_name)
     
     @staticmethod
     def create_with_google(google_id, email, full_name=None):
@@ -68,53 +96,86 @@ class User(UserMixin):
             INSERT INTO users (username, email, friend_code, full_name, google_id, oauth_provider)
             VALUES (%s, %s, %s, %s, %s, 'google')
         """
-        user_id = db.execute_query(query, (username, email, friend_code, full_name, google_id))
+        return User._insert_indexed(query, (username, email, friend_code, full_name, google_id),
+                                    username, full_name)
+    
+    @staticmethod
+    def _insert_indexed(query, params, username, full_name):
+        """Insertar el usuario y sus términos de búsqueda juntos (None si falla)"""
+        try:
+            with db.transaction():
+                user_id = db.execute_query(query, params)
+                User.index_search_terms(user_id, username, full_name)
+        except Error:
+            return None
         return user_id
     
+    @staticmethod
+    def _from_row(row, version=None):
+        """
+        Construir un User registrándolo en el identity map y, con la versión
+        de profile_cache leída antes de la query (`version`), en la caché
+        """
+        if not row:
+            return None
+        identity_map = _identity_map()
+        if identity_map is not None and row['id'] in identity_map:
+            return identity_map[row['id']]
+        if version is not None:
+            profile_cache.set(row['id'], 'user', dict(row), ttl=USER_CACHE_TTL, version=version)
+        user = User(**row)
+        if identity_map is not None:
+            identity_map[user.id] = user
+        return user
+    
+    @staticmethod
+    def invalidate_cache(user_id):
+        """Olvidar un usuario (y su perfil cacheado) y sacarlo del identity map tras modificarlo"""
+        profile_cache.invalidate(user_id)
+        identity_map = _identity_map()
+        if identity_map is not None:
+            identity_map.pop(user_id, None)
+    
     @staticmethod
     def find_by_id(user_id):
         """Buscar usuario por ID"""
-        query = "SELECT * FROM users WHERE id = %s"
-        row = db.fetch_one(query, (user_id,))
-        if row:
-            return User(**row)
-        return None
+        identity_map = _identity_map()
+        if identity_map is not None and user_id in identity_map:
+            return identity_map[user_id]
+        
+        # Versión leída antes que la fila: una invalidación a mitad deja la
+        # fila antigua bajo la versión antigua
+        version = profile_cache.version(user_id)
+        row = profile_cache.get(user_id, 'user', version)
+        if row is None:
+            query = "SELECT * FROM users WHERE id = %s"
+            row = db.fetch_one(query, (user_id,))
+            return User._from_row(row, version)
+        return User._from_row(row)
     
     @staticmethod
     def find_by_username(username):
         """Buscar usuario por username"""
         query = "SELECT * FROM users WHERE username = %s"
-        row = db.fetch_one(query, (username,))
-        if row:
-            return User(**row)
-        return None
+        return User._from_row(db.fetch_one(query, (username,)))
     
     @staticmethod
     def find_by_email(email):
         """Buscar usuario por email"""
         query = "SELECT * FROM users WHERE email = %s"
-        row = db.fetch_one(query, (email,))
-        if row:
-            return User(**row)
-        return None
+        return User._from_row(db.fetch_one(query, (email,)))
     
     @staticmethod
     def find_by_friend_code(friend_code):
         """Buscar usuario por código de amigo"""
         query = "SELECT * FROM users WHERE friend_code = %s"
-        row = db.fetch_one(query, (friend_code,))
-        if row:
-            return User(**row)
-        return None
+        return User._from_row(db.fetch_one(query, (friend_code,)))
     
     @staticmethod
     def find_by_google_id(google_id):
         """Buscar usuario por Google ID"""
         query = "SELECT * FROM users WHERE google_id = %s"
-        row = db.fetch_one(query, (google_id,))
-        if row:
-            return User(**row)
-        return None
+        return User._from_row(db.fetch_one(query, (google_id,)))
     
     def check_password(self, password):
         """Verificar contraseña"""
@@ -130,7 +191,14 @@ class User(UserMixin):
             SET full_name = %s, bio = %s, website = %s, updated_at = CURRENT_TIMESTAMP
             WHERE id = %s
         """
-        db.execute_query(query, (full_name, bio, website, self.id))
+        try:
+            with db.transaction():
+                db.execute_query(query, (full_name, bio, website, self.id))
+                if full_name != self.full_name:
+                    User.index_search_terms(self.id, self.username, full_name)
+        except Error:
+            return
+        User.invalidate_cache(self.id)
         self.full_name = full_name
         self.bio = bio
         self.website = website
@@ -143,9 +211,111 @@ class User(UserMixin):
             WHERE id = %s
         """
         db.execute_query(query, (google_id, self.id))
+        User.invalidate_cache(self.id)
         self.google_id = google_id
         self.oauth_provider = 'google'
     
+    @staticmethod
+    def search_terms(username, full_name):
+        """Términos buscables por prefijo: username, nombre y apellidos"""
+        # El friend_code no: buscarlo por prefijo permitiría enumerar los
+        # códigos de todos (ver search(), que solo lo acepta completo)
+        terms = [username]
+        words = (full_name or '').split()
+        if words:
+            terms.append(' '.join(words))
+            terms.extend(words[1:])
+        unique = {}
+        for term in terms:
+            if term:
+                unique.setdefault(term.lower(), term[:SEARCH_TERM_LENGTH])
+        return list(unique.values())
+    
+    @staticmethod
+    def index_search_terms(user_id, username, full_name):
+        """Reemplazar los términos de búsqueda de un usuario"""
+        terms = User.search_terms(username, full_name)
+        with db.transaction():
+            db.execute_query("DELETE FROM user_search_terms WHERE user_id = %s", (user_id,))
+            db.execute_many(
+                "INSERT IGNORE INTO user_search_terms (term, user_id) VALUES (%s, %s)",
+                [(term, user_id) for term in terms]
+            )
+    
+    @staticmethod
+    def encode_search_cursor(term, user_id):
+        """Cursor opaco (term, user_id) para pedir la página siguiente"""
+        raw = f"{user_id}:{term}".encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+    
+    @staticmethod
+    def decode_search_cursor(cursor):
+        """Retorna (term, user_id) o None si el cursor no es válido"""
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+            user_id, term = raw.split(':', 1)
+            return term, int(user_id)
+        except (ValueError, AttributeError, TypeError):
+            return None
+    
+    @staticmethod
+    def search(text, after=None, limit=SEARCH_PAGE_SIZE):
+        """
+        Buscar usuarios por prefijo de username, nombre o apellido, o por su
+        friend_code completo (nunca por prefijo, y el código no se devuelve).
+        Retorna (usuarios, cursor para la página siguiente o None)
+        """
+        text = ' '.join((text or '').split())[:SEARCH_TERM_LENGTH]
+        if len(text) < SEARCH_MIN_LENGTH:
+            return [], None
+        
+        cache_key = (text.lower(), after, limit)
+        cached = _search_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        pattern = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        params = [pattern]
+        keyset = ''
+        position = User.decode_search_cursor(after) if after else None
+        if position:
+            keyset = "AND (t.term > %s OR (t.term = %s AND t.user_id > %s))"
+            params += [position[0], position[0], position[1]]
+        # Rango de la PK (term, user_id): el coste depende de la página, no del
+        # número de usuarios
+        query = f"""
+            SELECT t.term, u.id, u.username, u.full_name, u.avatar
+            FROM user_search_terms t
+            JOIN users u ON u.id = t.user_id
+            WHERE t.term LIKE %s {keyset}
+            ORDER BY t.term, t.user_id
+            LIMIT %s
+        """
+        rows = db.fetch_all(query, tuple(params + [limit + 1]))
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        cursor = User.encode_search_cursor(rows[-1]['term'], rows[-1]['id']) if has_more else None
+        
+        # Un usuario puede coincidir por varios términos (p. ej. username y nombre)
+        users = []
+        seen = set()
+        if not after and len(text) == FRIEND_CODE_LENGTH:
+            # Coincidencia exacta de código, al principio de la primera página
+            user = User.find_by_friend_code(text.upper())
+            if user:
+                seen.add(user.id)
+                users.append({'id': user.id, 'username': user.username,
+                              'full_name': user.full_name, 'avatar': user.avatar})
+        for row in rows:
+            if row['id'] not in seen:
+                seen.add(row['id'])
+                users.append({k: v for k, v in row.items() if k != 'term'})
+        
+        result = (users, cursor)
+        _search_cache.set(cache_key, result)
+        return result
+    
     def get_social_links(self):
         """Obtener enlaces a redes sociales"""
         query = """
@@ -0,0 +1,153 @@
+"""
+Comprobación de planes de ejecución de las queries más frecuentes
+
+Las queries no se copian aquí: cada entrada llama al método del modelo con
+parámetros de ejemplo y se graba la sentencia que envía a Database (sin
+ejecutarla). Se ejecuta EXPLAIN y se marca como problema cualquier tabla
+recorrida entera (type=ALL), salvo las aceptadas en ALLOWED_FULL_SCANS.
+"""
+
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timedelta
+from app.database import db
+from app.models.user import User
+from app.models.social_link import SocialLink
+from app.models.contact import Contact
+from app.models.contact_folder import ContactFolder
+from app.models.message import Message
+from app.models.calendar_event import CalendarEvent
+from app.models.data_version import DataVersion, FREEBUSY
+from app.models.reminder_notice import ReminderNotice
+from app.reminders import ReminderScheduler
+
+_NOW = datetime(2025, 11, 16, 12, 0, 0)
+
+
+def _event(event_id):
+    return CalendarEvent(id=event_id, user_id=1, start_datetime=_NOW,
+                         end_datetime=_NOW + timedelta(hours=1))
+
+
+# (nombre, llamada al modelo, texto que identifica la sentencia a comprobar)
+HOT_QUERIES = [
+    ('User.find_by_username', lambda: User.find_by_username('dario'), 'SELECT'),
+    ('User.find_by_friend_code', lambda: User.find_by_friend_code('ABCD1234'), 'SELECT'),
+    ('User.find_by_google_id', lambda: User.find_by_google_id('1234567890'), 'SELECT'),
+    ('User.search', lambda: User.search('dar', after=User.encode_search_cursor('dar', 1)), 'SELECT'),
+    ('SocialLink.get_by_user', lambda: SocialLink.get_by_user(1), 'SELECT'),
+    ('SocialLink.get_visible_by_user', lambda: SocialLink.get_visible_by_user(1), 'SELECT'),
+    ('SocialLink.get_by_platform', lambda: SocialLink.get_by_platform(1, 'instagram'), 'SELECT'),
+    ('Contact.get_accepted', lambda: Contact.get_accepted(1, 1), 'SELECT'),
+    ('Contact.get_pending_sent', lambda: Contact.get_pending_sent(1), 'SELECT'),
+    ('Contact.get_pending_received', lambda: Contact.get_pending_received(1), 'SELECT'),
+    ('Contact.are_contacts', lambda: Contact.are_contacts(1, 2), 'SELECT'),
+    ('ContactFolder.get_contacts_count',
+     lambda: ContactFolder(id=1, user_id=1).get_contacts_count(), 'SELECT'),
+    ('ContactFolder.get_all_by_user', lambda: ContactFolder.get_all_by_user(1), 'SELECT'),
+    ('Message.get_conversation', lambda: Message.get_conversation(1, 2), 'SELECT'),
+    ('Message.mark_as_read', lambda: Message.mark_as_read(2, 1), 'UPDATE messages'),
+    ('Message.rebuild_unread_counters', lambda: Message.rebuild_unread_counters(1), 'GROUP BY'),
+    ('Message.count_unread_by_conversation',
+     lambda: Message.count_unread_by_conversation(1), 'SELECT'),
+    ('CalendarEvent.get_by_user',
+     lambda: CalendarEvent.get_by_user(1, after=CalendarEvent.encode_page_cursor(_event(10))),
+     'SELECT'),
+    ('CalendarEvent.get_by_date_range',
+     lambda: CalendarEvent.get_by_date_range(1, _NOW, _NOW + timedelta(days=31)), 'SELECT'),
+    ('CalendarEvent._load_exceptions',
+     lambda: CalendarEvent._load_exceptions([_event(1), _event(2), _event(3)],
+                                            _NOW, _NOW + timedelta(days=31)), 'SELECT'),
+    ('CalendarEvent.load_participants',
+     lambda: CalendarEvent.load_participants([_event(1), _event(2), _event(3)]), 'SELECT'),
+    ('CalendarEvent.load_participants (solo ids)',
+     lambda: CalendarEvent.load_participants([_event(1), _event(2), _event(3)], profiles=False),
+     'SELECT'),
+    ('CalendarEvent._participant_ids', lambda: _event(1)._participant_ids(), 'SELECT'),
+    ('CalendarEvent.busy_intervals',
+     lambda: CalendarEvent.busy_intervals([1, 2], _NOW, _NOW + timedelta(days=7)), 'SELECT'),
+    ('DataVersion.get_many', lambda: DataVersion.get_many([1, 2], FREEBUSY), 'SELECT'),
+    ('ReminderScheduler._refill',
+     lambda: ReminderScheduler()._refill(_NOW), 'SELECT'),
+    ('ReminderNotice.get_unseen', lambda: ReminderNotice.get_unseen(1), 'SELECT'),
+]
+
+# Full scans aceptados: (nombre de la query, tabla)
+ALLOWED_FULL_SCANS = set()
+
+
+@contextmanager
+def recording():
+    """
+    Grabar las sentencias (query, params) que se envían a `db` sin ejecutarlas.
+    Las lecturas devuelven vacío y las escrituras 0 filas.
+    """
+    statements = []
+    
+    def record(result):
+        def method(*args, **kwargs):
+            # fetch_all_as y stream reciben la clase del modelo delante
+            args = [arg for arg in args if not isinstance(arg, type)]
+            kwargs.pop('cls', None)
+            query = args[0] if args else kwargs.get('query')
+            params = args[1] if len(args) > 1 else kwargs.get('params')
+            statements.append((query, params))
+            return result()
+        return method
+    
+    fakes = {
+        'fetch_one': record(lambda: None),
+        'fetch_all': record(list),
+        'fetch_all_as': record(list),
+        'stream': record(lambda: iter(())),
+        'execute_query': record(lambda: None),
+        'execute_update': record(lambda: 0),
+        'execute_many': record(lambda: 0),
+        'transaction': lambda: nullcontext(),
+    }
+    # Atributos de instancia: tapan los métodos de la clase solo en `db`
+    vars(db).update(fakes)
+    try:
+        yield statements
+    finally:
+        for name in fakes:
+            vars(db).pop(name, None)
+
+
+def capture(call, marker='SELECT'):
+    """(query, params) de la primera sentencia de call() que contiene `marker`"""
+    with recording() as statements:
+        call()
+    for query, params in statements:
+        if marker in ' '.join(query.split()):
+            return query, params
+    raise LookupError(f"Ninguna sentencia con {marker!r}: {statements}")
+
+
+def explain(connection, query, params):
+    """Filas de EXPLAIN como diccionarios"""
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute('EXPLAIN ' + query, params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def full_scans(plan):
+    """Tablas del plan recorridas enteras (sin las temporales de UNION/subconsultas)"""
+    return [
+        row['table'] for row in plan
+        if row.get('type') == 'ALL' and not str(row.get('table') or '').startswith('<')
+    ]
+
+
+def check(connection, queries=HOT_QUERIES):
+    """Retorna lista de (nombre, tablas con full scan, plan)"""
+    problems = []
+    for name, call, marker in queries:
+        query, params = capture(call, marker)
+        plan = explain(connection, query, params)
+        tables = [table for table in full_scans(plan) if (name, table) not in ALLOWED_FULL_SCANS]
+        if tables:
+            problems.append((name, tables, plan))
+    return problems
@@ -0,0 +1,189 @@
+"""
+Instrumentación de queries de la capa Database
+
+Por cada query normalizada (literales y placeholders sustituidos por ?) se
+acumulan ejecuciones, errores, latencia y filas. Dentro de una petición se
+cuentan también las queries por ruta y se marca como N+1 la misma query
+repetida muchas veces en una sola petición.
+
+Configuración (.env):
+    DB_SLOW_QUERY_MS=200      umbral de query lenta (se registra en el log)
+    DB_N_PLUS_ONE_THRESHOLD=5 repeticiones de una query por petición para marcar N+1
+"""
+
+import logging
+import os
+import re
+import threading
+from functools import lru_cache
+from flask import g, has_request_context, request
+
+logger = logging.getLogger(__name__)
+
+# Límite de queries distintas que se agregan (el resto va a OTHER_QUERY)
+MAX_TRACKED_QUERIES = 1000
+OTHER_QUERY = '<otras>'
+
+_COMMENT = re.compile(r'--[^\n]*|/\*.*?\*/', re.S)
+_STRING = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|%\(\w+\)s')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_VALUES_LIST = re.compile(r'(\(\?\.\.\.\))(?:\s*,\s*\(\?\.\.\.\))+')
+_SPACES = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=2048)
+def normalize_sql(query):
+    """Texto de la query sin literales ni espacios redundantes"""
+    text = _COMMENT.sub(' ', query)
+    text = _STRING.sub('?', text)
+    text = _PLACEHOLDER.sub('?', text)
+    text = _NUMBER.sub('?', text)
+    text = _IN_LIST.sub('(?...)', text)
+    text = _VALUES_LIST.sub(r'\1...', text)
+    return _SPACES.sub(' ', text).strip()
+
+
+class QueryStats:
+    """Agregados de queries por texto normalizado y por ruta"""
+    
+    def __init__(self, slow_ms=200, n_plus_one_threshold=5):
+        self.slow_ms = slow_ms
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        with self._lock:
+            self._queries = {}
+            self._routes = {}
+            self._n_plus_one = {}
+            self.slow_queries = 0
+    
+    def record(self, query, seconds, rows=0, error=None):
+        """Registrar una ejecución (lo llama Database en cada query)"""
+        normalized = normalize_sql(query)
+        ms = seconds * 1000
+        with self._lock:
+            stats = self._queries.get(normalized)
+            if stats is None:
+                if len(self._queries) >= MAX_TRACKED_QUERIES:
+                    normalized = OTHER_QUERY
+                    stats = self._queries.get(normalized)
+                if stats is None:
+                    stats = self._queries[normalized] = {
+                        'count': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0, 'slow': 0
+                    }
+            stats['count'] += 1
+            stats['total_ms'] += ms
+            stats['max_ms'] = max(stats['max_ms'], ms)
+            stats['rows'] += rows or 0
+            if error is not None:
+                stats['errors'] += 1
+            slow = ms >= self.slow_ms
+            if slow:
+                stats['slow'] += 1
+                self.slow_queries += 1
+        
+        if slow:
+            logger.warning("Query lenta (%.1f ms): %s", ms, normalized, extra={'duration_ms': round(ms, 2)})
+        if has_request_context():
+            if 'db_queries' not in g:
+                g.db_queries = {}
+                g.db_time_ms = 0.0
+            g.db_queries[normalized] = g.db_queries.get(normalized, 0) + 1
+            g.db_time_ms += ms
+    
+    def finish_request(self):
+        """Acumular las queries de la petición en su ruta y detectar N+1"""
+        queries = g.pop('db_queries', None)
+        if not queries:
+            return
+        route = request.endpoint or request.path
+        total = sum(queries.values())
+        repeated = {
+            query: count for query, count in queries.items()
+            if count >= self.n_plus_one_threshold
+        }
+        new_patterns = []
+        with self._lock:
+            stats = self._routes.setdefault(route, {'requests': 0, 'queries': 0, 'max_queries': 0,
+                                                    'db_ms': 0.0, 'n_plus_one': 0})
+            stats['requests'] += 1
+            stats['queries'] += total
+            stats['max_queries'] = max(stats['max_queries'], total)
+            stats['db_ms'] += g.get('db_time_ms', 0.0)
+            for query, count in repeated.items():
+                stats['n_plus_one'] += 1
+                key = (route, query)
+                if key not in self._n_plus_one:
+                    new_patterns.append((query, count))
+                self._n_plus_one[key] = max(self._n_plus_one.get(key, 0), count)
+        for query, count in new_patterns:
+            logger.warning("Posible N+1 en %s: %d ejecuciones de %s", route, count, query)
+    
+    def snapshot(self):
+        """Copia de los agregados: queries, rutas y patrones N+1"""
+        with self._lock:
+            queries = {query: dict(stats) for query, stats in self._queries.items()}
+            routes = {route: dict(stats) for route, stats in self._routes.items()}
+            n_plus_one = [
+                {'route': route, 'query': query, 'max_count': count}
+                for (route, query), count in self._n_plus_one.items()
+            ]
+            slow_queries = self.slow_queries
+        for stats in queries.values():
+            stats['avg_ms'] = stats['total_ms'] / stats['count'] if stats['count'] else 0.0
+        return {
+            'queries': queries,
+            'routes': routes,
+            'n_plus_one': n_plus_one,
+            'slow_queries': slow_queries,
+            'slow_ms': self.slow_ms,
+        }
+    
+    def prometheus(self):
+        """Agregados en formato de texto de Prometheus"""
+        data = self.snapshot()
+        lines = [
+            '# HELP eid_db_queries_total Queries ejecutadas por texto normalizado',
+            '# TYPE eid_db_queries_total counter',
+        ]
+        for query, stats in data['queries'].items():
+            lines.append(f'eid_db_queries_total{{query="{_label(query)}"}} {stats["count"]}')
+        lines += ['# HELP eid_db_query_errors_total Queries con error', '# TYPE eid_db_query_errors_total counter']
+        for query, stats in data['queries'].items():
+            lines.append(f'eid_db_query_errors_total{{query="{_label(query)}"}} {stats["errors"]}')
+        lines += ['# HELP eid_db_query_seconds_total Tiempo acumulado en la query',
+                  '# TYPE eid_db_query_seconds_total counter']
+        for query, stats in data['queries'].items():
+            lines.append(f'eid_db_query_seconds_total{{query="{_label(query)}"}} {stats["total_ms"] / 1000:.6f}')
+        lines += ['# HELP eid_db_query_rows_total Filas devueltas o afectadas',
+                  '# TYPE eid_db_query_rows_total counter']
+        for query, stats in data['queries'].items():
+            lines.append(f'eid_db_query_rows_total{{query="{_label(query)}"}} {stats["rows"]}')
+        lines += ['# HELP eid_db_slow_queries_total Queries por encima de DB_SLOW_QUERY_MS',
+                  '# TYPE eid_db_slow_queries_total counter',
+                  f'eid_db_slow_queries_total {data["slow_queries"]}',
+                  '# HELP eid_db_route_queries_total Queries ejecutadas por ruta',
+                  '# TYPE eid_db_route_queries_total counter']
+        for route, stats in data['routes'].items():
+            lines.append(f'eid_db_route_queries_total{{route="{_label(route)}"}} {stats["queries"]}')
+        lines += ['# HELP eid_db_route_n_plus_one_total Peticiones con una query repetida (N+1)',
+                  '# TYPE eid_db_route_n_plus_one_total counter']
+        for route, stats in data['routes'].items():
+            lines.append(f'eid_db_route_n_plus_one_total{{route="{_label(route)}"}} {stats["n_plus_one"]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _label(value):
+    """Escapar un valor de etiqueta de Prometheus"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Instancia global
+query_stats = QueryStats(
+    slow_ms=float(os.environ.get('DB_SLOW_QUERY_MS', '200')),
+    n_plus_one_threshold=int(os.environ.get('DB_N_PLUS_ONE_THRESHOLD', '5'))
+)
@@ -0,0 +1,122 @@
+"""
+Notificaciones en tiempo real para eID
+
+Los contadores de mensajes no leídos se envían por Socket.IO cuando cambian
+(Message.create / Message.mark_as_read). Para navegadores sin WebSocket hay
+un long-poll que solo responde cuando el contador del usuario cambia o tras
+un timeout largo.
+
+El long-poll compara con el contador de la BD (unread_counters), no con un
+estado del proceso, así que funciona con varios workers: un cambio hecho en
+este proceso lo despierta al momento y uno de otro worker se ve en la
+siguiente lectura, cada UNREAD_LONG_POLL_CHECK segundos. Cada espera ocupa un
+hilo (o greenlet con eventlet/gevent) del worker, por eso hay un máximo de
+esperas por proceso (UNREAD_LONG_POLL_MAX_WAITERS); por encima se responde
+enseguida y el cliente reintenta pasados UNREAD_LONG_POLL_RETRY segundos.
+"""
+
+import os
+import threading
+import time
+from flask_socketio import SocketIO, emit, join_room
+from flask_login import current_user
+
+# Con SOCKETIO_MESSAGE_QUEUE (p.ej. redis://) los eventos llegan a todos los workers
+socketio = SocketIO(message_queue=os.environ.get('SOCKETIO_MESSAGE_QUEUE') or None)
+
+LONG_POLL_TIMEOUT = int(os.environ.get('UNREAD_LONG_POLL_TIMEOUT', '25'))
+LONG_POLL_CHECK = int(os.environ.get('UNREAD_LONG_POLL_CHECK', '3'))
+LONG_POLL_MAX_WAITERS = int(os.environ.get('UNREAD_LONG_POLL_MAX_WAITERS', '100'))
+LONG_POLL_RETRY = int(os.environ.get('UNREAD_LONG_POLL_RETRY', '30'))
+
+
+def user_room(user_id):
+    """Sala de Socket.IO privada de un usuario"""
+    return f'user:{user_id}'
+
+
+class UnreadNotifier:
+    """Versiones por usuario del contador de no leídos, con espera bloqueante"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}
+        # user_id -> [Condition, número de peticiones esperando]
+        self._waiters = {}
+        self._waiting = 0
+    
+    def version(self, user_id):
+        """Versión actual del contador de un usuario"""
+        with self._lock:
+            return self._versions.get(user_id, 0)
+    
+    def publish(self, user_id, delta):
+        """Notificar un cambio en el contador de no leídos de un usuario"""
+        if not delta:
+            return
+        with self._lock:
+            version = self._versions.get(user_id, 0) + 1
+            self._versions[user_id] = version
+            waiting = self._waiters.get(user_id)
+            if waiting:
+                waiting[0].notify_all()
+        
+        if socketio.server is not None:
+            socketio.emit('unread_delta', {'delta': delta, 'version': version},
+                          to=user_room(user_id))
+    
+    def wait(self, user_id, since, read_count, timeout=LONG_POLL_TIMEOUT, check=LONG_POLL_CHECK):
+        """
+        Esperar a que el contador del usuario en la BD (read_count(user_id))
+        sea distinto de `since`.
+        Retorna el contador actual (igual a `since` si venció el timeout), o
+        None sin esperar si ya hay LONG_POLL_MAX_WAITERS esperas en el proceso
+        """
+        with self._lock:
+            if self._waiting >= LONG_POLL_MAX_WAITERS:
+                return None
+            self._waiting += 1
+        try:
+            deadline = time.monotonic() + timeout
+            while True:
+                # Versión leída antes que el contador: un cambio entre las dos
+                # lecturas despierta la espera en lugar de perderse
+                version = self.version(user_id)
+                count = read_count(user_id)
+                remaining = deadline - time.monotonic()
+                if count != since or remaining <= 0:
+                    return count
+                self._wait_local(user_id, version, min(check, remaining))
+        finally:
+            with self._lock:
+                self._waiting -= 1
+    
+    def _wait_local(self, user_id, version, timeout):
+        """Esperar un cambio publicado en este proceso (o el timeout)"""
+        with self._lock:
+            waiting = self._waiters.setdefault(user_id, [threading.Condition(self._lock), 0])
+            waiting[1] += 1
+            try:
+                waiting[0].wait_for(lambda: self._versions.get(user_id, 0) != version, timeout)
+            finally:
+                waiting[1] -= 1
+                if waiting[1] == 0:
+                    self._waiters.pop(user_id, None)
+
+
+unread_notifier = UnreadNotifier()
+
+
+@socketio.on('connect')
+def on_connect(auth=None):
+    """Unir al usuario a su sala y enviarle el contador inicial"""
+    if not current_user.is_authenticated:
+        return False
+    
+    from app.models.message import Message
+    
+    join_room(user_room(current_user.id))
+    emit('unread_count', {
+        'count': Message.count_unread(current_user.id),
+        'version': unread_notifier.version(current_user.id)
+    })
@@ -0,0 +1,243 @@
+"""
+Reglas de repetición para eventos de calendario (subconjunto de RRULE, RFC 5545)
+
+Soportado:
+    FREQ=DAILY|WEEKLY|MONTHLY|YEARLY
+    INTERVAL=n
+    COUNT=n  o  UNTIL=AAAAMMDD[THHMMSS[Z]]
+    BYDAY=MO,WE,FR          (solo WEEKLY)
+    BYMONTHDAY=1,15,-1      (solo MONTHLY; -1 es el último día del mes)
+
+Las repeticiones se generan bajo demanda y solo dentro de la ventana pedida:
+sin COUNT se salta directamente al primer periodo que puede tocar la ventana,
+así que expandir un mes de una serie diaria de hace años no recorre los años
+anteriores. Como en RFC 5545, las fechas que no existen (31 de abril, 29 de
+febrero en años no bisiestos) se omiten.
+"""
+
+import calendar
+from datetime import datetime, timedelta
+
+FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY', 'YEARLY')
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+
+# Límite de COUNT y de repeticiones devueltas para una sola ventana
+MAX_COUNT = 1000
+MAX_OCCURRENCES = 1000
+
+
+def _positive_int(value, name):
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} debe ser un número entero")
+    if number < 1:
+        raise ValueError(f"{name} debe ser mayor que 0")
+    return number
+
+
+def _parse_until(value):
+    """UNTIL en formato iCalendar (AAAAMMDD o AAAAMMDDTHHMMSS[Z]) o ISO"""
+    value = value.strip().rstrip('Z')
+    for fmt in ('%Y%m%dT%H%M%S', '%Y%m%d'):
+        try:
+            until = datetime.strptime(value, fmt)
+            # Una fecha sin hora incluye todo ese día
+            return until.replace(hour=23, minute=59, second=59) if fmt == '%Y%m%d' else until
+        except ValueError:
+            pass
+    try:
+        return datetime.fromisoformat(value).replace(tzinfo=None)
+    except ValueError:
+        raise ValueError(f"UNTIL no válido: {value}")
+
+
+class RecurrenceRule:
+    """Regla de repetición ya validada"""
+    
+    __slots__ = ('freq', 'interval', 'count', 'until', 'byday', 'bymonthday')
+    
+    def __init__(self, freq, interval=1, count=None, until=None, byday=(), bymonthday=()):
+        self.freq = freq
+        self.interval = interval
+        self.count = count
+        self.until = until
+        self.byday = tuple(byday)
+        self.bymonthday = tuple(bymonthday)
+    
+    @classmethod
+    def parse(cls, text):
+        """'FREQ=WEEKLY;BYDAY=MO,WE' -> RecurrenceRule (ValueError si no es válida)"""
+        text = (text or '').strip()
+        if text.upper().startswith('RRULE:'):
+            text = text[6:]
+        parts = {}
+        for item in text.split(';'):
+            if not item.strip():
+                continue
+            name, sep, value = item.partition('=')
+            if not sep:
+                raise ValueError(f"Parte de la regla no válida: {item}")
+            parts[name.strip().upper()] = value.strip()
+        
+        freq = parts.pop('FREQ', '').upper()
+        if freq not in FREQUENCIES:
+            raise ValueError("FREQ debe ser DAILY, WEEKLY, MONTHLY o YEARLY")
+        interval = _positive_int(parts.pop('INTERVAL', '1'), 'INTERVAL')
+        
+        count = parts.pop('COUNT', None)
+        until = parts.pop('UNTIL', None)
+        if count and until:
+            raise ValueError("COUNT y UNTIL no pueden usarse juntos")
+        if count:
+            count = _positive_int(count, 'COUNT')
+            if count > MAX_COUNT:
+                raise ValueError(f"COUNT no puede superar {MAX_COUNT}")
+        until = _parse_until(until) if until else None
+        
+        byday = ()
+        if 'BYDAY' in parts:
+            if freq != 'WEEKLY':
+                raise ValueError("BYDAY solo se admite con FREQ=WEEKLY")
+            days = [day.strip().upper() for day in parts.pop('BYDAY').split(',') if day.strip()]
+            if not days or any(day not in WEEKDAYS for day in days):
+                raise ValueError("BYDAY debe ser una lista de MO, TU, WE, TH, FR, SA, SU")
+            byday = sorted({WEEKDAYS.index(day) for day in days})
+        
+        bymonthday = ()
+        if 'BYMONTHDAY' in parts:
+            if freq != 'MONTHLY':
+                raise ValueError("BYMONTHDAY solo se admite con FREQ=MONTHLY")
+            try:
+                bymonthday = sorted({int(day) for day in parts.pop('BYMONTHDAY').split(',') if day.strip()})
+            except ValueError:
+                raise ValueError("BYMONTHDAY debe ser una lista de días del mes")
+            if not bymonthday or any(day == 0 or not -31 <= day <= 31 for day in bymonthday):
+                raise ValueError("BYMONTHDAY debe estar entre 1 y 31 (o -31 y -1)")
+        
+        if parts:
+            raise ValueError(f"Partes de la regla no soportadas: {', '.join(sorted(parts))}")
+        return cls(freq, interval, count, until, byday, bymonthday)
+    
+    def __str__(self):
+        """Forma canónica de la regla (la que se guarda en calendar_events.rrule)"""
+        parts = [f"FREQ={self.freq}"]
+        if self.interval != 1:
+            parts.append(f"INTERVAL={self.interval}")
+        if self.count:
+            parts.append(f"COUNT={self.count}")
+        if self.until:
+            parts.append(f"UNTIL={self.until.strftime('%Y%m%dT%H%M%S')}")
+        if self.byday:
+            parts.append("BYDAY=" + ','.join(WEEKDAYS[day] for day in self.byday))
+        if self.bymonthday:
+            parts.append("BYMONTHDAY=" + ','.join(str(day) for day in self.bymonthday))
+        return ';'.join(parts)
+    
+    def _first_period(self, dtstart, moment):
+        """Índice del periodo que contiene `moment` (los anteriores acaban antes)"""
+        if moment <= dtstart:
+            return 0
+        if self.freq == 'DAILY':
+            return (moment - dtstart) // timedelta(days=self.interval)
+        if self.freq == 'WEEKLY':
+            week_start = dtstart - timedelta(days=dtstart.weekday())
+            return (moment - week_start) // timedelta(weeks=self.interval)
+        if self.freq == 'MONTHLY':
+            months = (moment.year - dtstart.year) * 12 + moment.month - dtstart.month
+            return months // self.interval
+        return (moment.year - dtstart.year) // self.interval
+    
+    def _iter(self, dtstart, period, stop):
+        """Inicios en orden desde el periodo `period` hasta pasar `stop`"""
+        try:
+            yield from self._iter_periods(dtstart, period, stop)
+        except OverflowError:
+            # Más allá del año 9999
+            return
+    
+    def _iter_periods(self, dtstart, period, stop):
+        if self.freq == 'DAILY':
+            step = timedelta(days=self.interval)
+            start = dtstart + step * period
+            while start <= stop:
+                yield start
+                start += step
+        
+        elif self.freq == 'WEEKLY':
+            week_start = dtstart - timedelta(days=dtstart.weekday())
+            days = self.byday or (dtstart.weekday(),)
+            step = timedelta(weeks=self.interval)
+            week = week_start + step * period
+            while week <= stop:
+                for day in days:
+                    start = week + timedelta(days=day)
+                    if start >= dtstart:
+                        yield start
+                week += step
+        
+        elif self.freq == 'MONTHLY':
+            base = dtstart.year * 12 + dtstart.month - 1
+            while True:
+                year, month = divmod(base + period * self.interval, 12)
+                month += 1
+                if year > datetime.max.year or datetime(year, month, 1) > stop:
+                    return
+                last_day = calendar.monthrange(year, month)[1]
+                days = sorted({day if day > 0 else last_day + 1 + day
+                               for day in self.bymonthday or (dtstart.day,)})
+                for day in days:
+                    if 1 <= day <= last_day:
+                        start = dtstart.replace(year=year, month=month, day=day)
+                        if start >= dtstart:
+                            yield start
+                period += 1
+        
+        else:
+            while True:
+                year = dtstart.year + period * self.interval
+                if year > datetime.max.year or datetime(year, 1, 1) > stop:
+                    return
+                try:
+                    yield dtstart.replace(year=year)
+                except ValueError:
+                    # 29 de febrero en un año no bisiesto
+                    pass
+                period += 1
+    
+    def between(self, dtstart, window_start, window_end, duration=timedelta(0), limit=MAX_OCCURRENCES):
+        """
+        Inicios de las repeticiones que se solapan con [window_start, window_end],
+        para una serie que empieza en dtstart y cuyas repeticiones duran `duration`.
+        """
+        stop = window_end if self.until is None else min(window_end, self.until)
+        # Con COUNT hay que contar desde el principio (como mucho MAX_COUNT)
+        period = 0 if self.count else self._first_period(dtstart, window_start - duration)
+        produced = 0
+        for index, start in enumerate(self._iter(dtstart, period, stop)):
+            if self.count and index >= self.count:
+                return
+            if start > stop:
+                return
+            if start + duration >= window_start:
+                yield start
+                produced += 1
+                if produced >= limit:
+                    return
+    
+    def includes(self, dtstart, moment):
+        """True si `moment` es el inicio de una repetición de la serie"""
+        return any(start == moment for start in self.between(dtstart, moment, moment))
+    
+    def last_end(self, dtstart, duration):
+        """Fin de la última repetición, o None si la serie no termina"""
+        if self.count:
+            last = dtstart
+            for index, start in enumerate(self._iter(dtstart, 0, datetime.max)):
+                last = start
+                if index + 1 >= self.count:
+                    break
+            return last + duration
+        if self.until:
+            return max(self.until, dtstart) + duration
+        return None
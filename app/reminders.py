@@ -0,0 +1,471 @@
+"""
+Recordatorios de eventos del calendario
+
+Cada evento con reminder_minutes > 0 tiene una fila en calendar_reminders con
+la hora de aviso (fire_at) de su próxima repetición. El planificador no
+recorre la tabla: cada pocos segundos lee solo los recordatorios pendientes
+que vencen dentro del horizonte (índice por status, fire_at) y los mete en un
+heap ordenado por hora; un hilo duerme hasta el primero que vence. Los que se
+programan desde este proceso (CalendarEvent.save) entran directamente al heap.
+
+Antes de enviar un lote se reclama con un UPDATE (status = 'claimed' con un
+token propio), así que varios workers pueden ejecutar el planificador sin
+enviar dos veces el mismo aviso. Un reclamo que no se completa (el proceso
+murió) vuelve a 'pending' pasado REMINDER_CLAIM_TIMEOUT.
+
+Cada destino retorna los recordatorios que ha entregado; uno se marca como
+enviado si lo entregó al menos un destino. Los demás vuelven a 'pending' con
+el aviso aplazado REMINDER_RETRY_DELAY segundos (el doble en cada intento) y
+tras REMINDER_MAX_ATTEMPTS intentos quedan en 'failed'.
+
+Configuración (.env):
+    REMINDERS_ENABLED=1
+    REMINDER_SINKS=socketio,smtp      destinos: socketio, smtp, log
+    REMINDER_HORIZON=300              segundos por delante que se cargan en memoria
+    REMINDER_POLL_INTERVAL=15         cada cuánto se buscan recordatorios nuevos
+    REMINDER_BATCH_SIZE=500           recordatorios por lote de envío
+    REMINDER_MAX_QUEUED=100000        tope del heap en memoria
+    REMINDER_MAX_LATENESS=3600        más tarde que esto (segundos) ya no se avisa
+    REMINDER_CLAIM_TIMEOUT=300
+    REMINDER_MAX_ATTEMPTS=5           intentos de entrega antes de darlo por fallido
+    REMINDER_RETRY_DELAY=60           espera antes del primer reintento (segundos)
+    REMINDER_SMTP_HOST=localhost
+    REMINDER_SMTP_PORT=1025
+    REMINDER_SMTP_FROM=recordatorios@eid.local
+"""
+
+import heapq
+import logging
+import os
+import smtplib
+import threading
+import uuid
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from app.database import db, Error
+from app.models.reminder_notice import ReminderNotice
+from app.realtime import socketio, user_room
+
+logger = logging.getLogger(__name__)
+
+
+class SocketIOSink:
+    """
+    Aviso en la aplicación: se guarda en reminder_notices y se emite a la sala
+    Socket.IO de cada destinatario. Emitir no garantiza que haya alguien
+    conectado, así que lo que cuenta como entregado es el aviso guardado; la
+    página lo muestra al cargar si no llegó en directo.
+    """
+    
+    name = 'socketio'
+    
+    def deliver(self, reminders):
+        # Si falla no se entrega ninguno del lote (se reintentan)
+        ReminderNotice.create_many([
+            (recipient['id'], reminder['event_id'], reminder['start'],
+             reminder['title'], reminder['location'])
+            for reminder in reminders for recipient in reminder['recipients']
+        ])
+        if socketio.server is None:
+            # Sin Socket.IO (init_realtime no se ha llamado): se verán al cargar
+            return [reminder['reminder_id'] for reminder in reminders]
+        for reminder in reminders:
+            payload = {
+                'event_id': reminder['event_id'],
+                'title': reminder['title'],
+                'start': reminder['start'].isoformat(),
+                'location': reminder['location'],
+            }
+            for recipient in reminder['recipients']:
+                socketio.emit('calendar_reminder', payload, to=user_room(recipient['id']))
+        return [reminder['reminder_id'] for reminder in reminders]
+
+
+class SMTPSink:
+    """Correo por SMTP (en local, un servidor de pruebas como aiosmtpd)"""
+    
+    name = 'smtp'
+    
+    def __init__(self, host='localhost', port=1025, sender='recordatorios@eid.local', timeout=10):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.timeout = timeout
+    
+    def deliver(self, reminders):
+        # Una sola conexión para todo el lote; un destinatario rechazado solo
+        # deja sin entregar su recordatorio
+        delivered = []
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            for reminder in reminders:
+                try:
+                    for recipient in reminder['recipients']:
+                        if recipient.get('email'):
+                            smtp.send_message(self._message(reminder, recipient))
+                except smtplib.SMTPRecipientsRefused as e:
+                    logger.error("Recordatorio %s rechazado por SMTP: %s", reminder['reminder_id'], e)
+                    continue
+                delivered.append(reminder['reminder_id'])
+        return delivered
+    
+    def _message(self, reminder, recipient):
+        message = EmailMessage()
+        message['From'] = self.sender
+        message['To'] = recipient['email']
+        message['Subject'] = f"Recordatorio: {reminder['title']}"
+        lines = [
+            f"Hola {recipient['username']},",
+            '',
+            f"{reminder['title']} empieza el {reminder['start'].strftime('%d/%m/%Y a las %H:%M')}.",
+        ]
+        if reminder['location']:
+            lines.append(f"Lugar: {reminder['location']}")
+        message.set_content('\n'.join(lines))
+        return message
+
+
+class LogSink:
+    """Solo registrar el aviso (desarrollo)"""
+    
+    name = 'log'
+    
+    def deliver(self, reminders):
+        for reminder in reminders:
+            logger.info("Recordatorio del evento %s (%s) para %d usuarios",
+                        reminder['event_id'], reminder['title'], len(reminder['recipients']))
+        return [reminder['reminder_id'] for reminder in reminders]
+
+
+def make_sinks(names):
+    """Destinos configurados a partir de 'socketio,smtp'"""
+    sinks = []
+    for name in (names or '').split(','):
+        name = name.strip()
+        if name == 'socketio':
+            sinks.append(SocketIOSink())
+        elif name == 'smtp':
+            sinks.append(SMTPSink(
+                host=os.environ.get('REMINDER_SMTP_HOST', 'localhost'),
+                port=int(os.environ.get('REMINDER_SMTP_PORT', '1025')),
+                sender=os.environ.get('REMINDER_SMTP_FROM', 'recordatorios@eid.local')
+            ))
+        elif name == 'log':
+            sinks.append(LogSink())
+        elif name:
+            raise ValueError(f"Destino de recordatorios desconocido: {name}")
+    return sinks
+
+
+class ReminderScheduler:
+    """Heap de los recordatorios que vencen pronto y un hilo que los envía por lotes"""
+    
+    def __init__(self, sinks=None, horizon=300, poll_interval=15, batch_size=500,
+                 max_queued=100000, max_lateness=3600, claim_timeout=300,
+                 max_attempts=5, retry_delay=60):
+        self.sinks = sinks or []
+        self.horizon = timedelta(seconds=horizon)
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.max_queued = max_queued
+        self.max_lateness = timedelta(seconds=max_lateness)
+        self.claim_timeout = timedelta(seconds=claim_timeout)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_delay = retry_delay
+        self.token = None
+        self._heap = []
+        self._queued = set()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        # Métricas
+        self.delivered = 0
+        self.skipped = 0
+        self.retried = 0
+        self.failed = 0
+    
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self):
+        """Arrancar el hilo del planificador (una vez por proceso)"""
+        if self.running:
+            return
+        self._stopping = False
+        self.token = uuid.uuid4().hex
+        self._thread = threading.Thread(target=self._run, name='calendar-reminders', daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout=5):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+    
+    def push(self, reminder_id, fire_at):
+        """Añadir un recordatorio al heap si vence dentro del horizonte"""
+        if not self.running or fire_at > datetime.now() + self.horizon:
+            return
+        entry = (fire_at, reminder_id)
+        with self._cond:
+            if entry in self._queued or len(self._heap) >= self.max_queued:
+                return
+            heapq.heappush(self._heap, entry)
+            self._queued.add(entry)
+            # Despertar al hilo por si este vence antes que el que esperaba
+            if self._heap[0] == entry:
+                self._cond.notify_all()
+    
+    def stats(self):
+        with self._cond:
+            queued = len(self._heap)
+            next_fire = self._heap[0][0].isoformat() if self._heap else None
+        return {
+            'running': self.running,
+            'queued': queued,
+            'next_fire_at': next_fire,
+            'delivered': self.delivered,
+            'skipped': self.skipped,
+            'retried': self.retried,
+            'failed': self.failed,
+            'sinks': [sink.name for sink in self.sinks],
+        }
+    
+    # ----- Hilo del planificador -----
+    
+    def _run(self):
+        try:
+            self.backfill()
+        except Error as e:
+            logger.error("No se pudieron programar los recordatorios de series: %s", e)
+        except Exception:
+            logger.exception("Error programando recordatorios de series")
+        next_refill = datetime.min
+        while True:
+            now = datetime.now()
+            if now >= next_refill:
+                try:
+                    self._refill(now)
+                except Error as e:
+                    logger.error("No se pudieron cargar los recordatorios: %s", e)
+                except Exception:
+                    logger.exception("Error cargando recordatorios")
+                next_refill = now + timedelta(seconds=self.poll_interval)
+            
+            with self._cond:
+                if self._stopping:
+                    return
+                now = datetime.now()
+                due = []
+                while self._heap and self._heap[0][0] <= now and len(due) < self.batch_size:
+                    entry = heapq.heappop(self._heap)
+                    self._queued.discard(entry)
+                    due.append(entry[1])
+                if not due:
+                    wake_at = next_refill
+                    if self._heap:
+                        wake_at = min(wake_at, self._heap[0][0])
+                    self._cond.wait(max((wake_at - now).total_seconds(), 0.01))
+                    continue
+            
+            try:
+                self.dispatch(due)
+            except Exception:
+                logger.exception("Error enviando %d recordatorios", len(due))
+    
+    def _refill(self, now):
+        """Cargar los pendientes que vencen dentro del horizonte"""
+        # Reclamos de un proceso que murió a mitad de envío
+        db.execute_update("""
+            UPDATE calendar_reminders SET status = 'pending', claim_token = NULL
+            WHERE status = 'claimed' AND claimed_at < %s
+        """, (now - self.claim_timeout,))
+        
+        with self._cond:
+            room = self.max_queued - len(self._heap)
+        if room <= 0:
+            return
+        rows = db.fetch_all("""
+            SELECT id, fire_at FROM calendar_reminders
+            WHERE status = 'pending' AND fire_at <= %s
+            ORDER BY fire_at
+            LIMIT %s
+        """, (now + self.horizon, room))
+        with self._cond:
+            for row in rows:
+                entry = (row['fire_at'], row['id'])
+                if entry not in self._queued:
+                    heapq.heappush(self._heap, entry)
+                    self._queued.add(entry)
+            self._cond.notify_all()
+    
+    def backfill(self):
+        """Programar las series con recordatorio que aún no tienen fila (tras migrar)"""
+        from app.models.calendar_event import CalendarEvent
+        
+        last_id = 0
+        while True:
+            rows = db.fetch_all("""
+                SELECT e.* FROM calendar_events e
+                LEFT JOIN calendar_reminders r ON r.event_id = e.id
+                WHERE e.id > %s AND e.rrule IS NOT NULL AND e.reminder_minutes > 0
+                  AND r.id IS NULL
+                  AND (e.recurrence_until IS NULL OR e.recurrence_until > %s)
+                ORDER BY e.id
+                LIMIT %s
+            """, (last_id, datetime.now(), self.batch_size))
+            for row in rows:
+                CalendarEvent(**row).schedule_reminder()
+            if len(rows) < self.batch_size:
+                return
+            last_id = rows[-1]['id']
+    
+    def dispatch(self, reminder_ids):
+        """Reclamar, enviar y marcar como enviados (o reintentar) un lote de recordatorios"""
+        from app.models.calendar_event import CalendarEvent
+        
+        now = datetime.now()
+        placeholders = ', '.join(['%s'] * len(reminder_ids))
+        claimed = db.execute_update(f"""
+            UPDATE calendar_reminders
+            SET status = 'claimed', claim_token = %s, claimed_at = %s
+            WHERE id IN ({placeholders}) AND status = 'pending' AND fire_at <= %s
+        """, (self.token, now, *reminder_ids, now))
+        if not claimed:
+            # Ya enviados por otro worker, reprogramados o borrados
+            return 0
+        
+        rows = db.fetch_all("""
+            SELECT r.id AS reminder_id, r.occurrence_start, r.fire_at, r.attempts, e.*
+            FROM calendar_reminders r
+            JOIN calendar_events e ON e.id = r.event_id
+            WHERE r.claim_token = %s AND r.status = 'claimed'
+        """, (self.token,))
+        
+        reminders, late = [], []
+        for row in rows:
+            reminder = {
+                'reminder_id': row.pop('reminder_id'),
+                'start': row.pop('occurrence_start'),
+                'fire_at': row.pop('fire_at'),
+                'attempts': row.pop('attempts'),
+                'event': CalendarEvent(**row),
+            }
+            # Con la hora de aviso original: un reintento aplaza fire_at
+            due_at = reminder['start'] - timedelta(minutes=int(reminder['event'].reminder_minutes or 0))
+            (late if now - due_at > self.max_lateness else reminders).append(reminder)
+        
+        failed = []
+        if reminders:
+            self._add_recipients(reminders)
+            payload = [{
+                'reminder_id': reminder['reminder_id'],
+                'event_id': reminder['event'].id,
+                'title': reminder['event'].title,
+                'location': reminder['event'].location,
+                'start': reminder['start'],
+                'recipients': reminder['recipients'],
+            } for reminder in reminders]
+            delivered = set()
+            for sink in self.sinks:
+                try:
+                    delivered.update(sink.deliver(payload) or ())
+                except Exception:
+                    logger.exception("Error entregando recordatorios en %s", sink.name)
+            if self.sinks:
+                failed = [reminder for reminder in reminders if reminder['reminder_id'] not in delivered]
+                reminders = [reminder for reminder in reminders if reminder['reminder_id'] in delivered]
+        
+        if failed:
+            self._retry(failed, now)
+        
+        # Enviados (o demasiado tarde para avisar): no se reintentan
+        db.execute_update("""
+            UPDATE calendar_reminders SET status = 'sent', sent_at = %s
+            WHERE claim_token = %s AND status = 'claimed'
+        """, (datetime.now(), self.token))
+        self.delivered += len(reminders)
+        self.skipped += len(late)
+        if late:
+            logger.warning("%d recordatorios vencidos hace más de %s no se enviaron",
+                           len(late), self.max_lateness)
+        
+        # Series: programar la repetición siguiente (también tras el último intento)
+        exhausted = [reminder for reminder in failed if reminder['attempts'] + 1 >= self.max_attempts]
+        for reminder in reminders + late + exhausted:
+            if reminder['event'].rrule:
+                reminder['event'].schedule_reminder(after=reminder['start'])
+        return len(reminders)
+    
+    def _retry(self, reminders, now):
+        """Devolver a 'pending' con espera exponencial, o 'failed' sin más intentos"""
+        rows, retry = [], []
+        for reminder in reminders:
+            attempts = reminder['attempts'] + 1
+            if attempts >= self.max_attempts:
+                status, fire_at = 'failed', reminder['fire_at']
+            else:
+                status = 'pending'
+                fire_at = now + timedelta(seconds=self.retry_delay * 2 ** (attempts - 1))
+                retry.append((reminder['reminder_id'], fire_at))
+            rows.append((status, attempts, fire_at, reminder['reminder_id'], self.token))
+        db.execute_many("""
+            UPDATE calendar_reminders
+            SET status = %s, attempts = %s, fire_at = %s, claim_token = NULL
+            WHERE id = %s AND claim_token = %s AND status = 'claimed'
+        """, rows)
+        self.retried += len(retry)
+        self.failed += len(reminders) - len(retry)
+        logger.warning("%d recordatorios sin entregar: %d se reintentarán y %d se dan por fallidos",
+                       len(reminders), len(retry), len(reminders) - len(retry))
+        for reminder_id, fire_at in retry:
+            self.push(reminder_id, fire_at)
+    
+    @staticmethod
+    def _add_recipients(reminders):
+        """Dueño y participantes de cada evento, con dos queries por lote"""
+        event_ids = sorted({reminder['event'].id for reminder in reminders})
+        owner_ids = sorted({reminder['event'].user_id for reminder in reminders})
+        
+        placeholders = ', '.join(['%s'] * len(event_ids))
+        participants = {}
+        for row in db.fetch_all(f"""
+            SELECT ep.event_id, u.id, u.username, u.email
+            FROM event_participants ep
+            JOIN users u ON ep.contact_user_id = u.id
+            WHERE ep.event_id IN ({placeholders})
+        """, tuple(event_ids)):
+            participants.setdefault(row.pop('event_id'), []).append(row)
+        
+        placeholders = ', '.join(['%s'] * len(owner_ids))
+        owners = {row['id']: row for row in db.fetch_all(
+            f"SELECT id, username, email FROM users WHERE id IN ({placeholders})", tuple(owner_ids)
+        )}
+        
+        for reminder in reminders:
+            event = reminder['event']
+            recipients = {}
+            for user in ([owners[event.user_id]] if event.user_id in owners else []) + participants.get(event.id, []):
+                recipients.setdefault(user['id'], user)
+            reminder['recipients'] = list(recipients.values())
+
+
+# Instancia global (el hilo se arranca en create_app con REMINDERS_ENABLED=1)
+reminder_scheduler = ReminderScheduler(
+    horizon=int(os.environ.get('REMINDER_HORIZON', '300')),
+    poll_interval=int(os.environ.get('REMINDER_POLL_INTERVAL', '15')),
+    batch_size=int(os.environ.get('REMINDER_BATCH_SIZE', '500')),
+    max_queued=int(os.environ.get('REMINDER_MAX_QUEUED', '100000')),
+    max_lateness=int(os.environ.get('REMINDER_MAX_LATENESS', '3600')),
+    claim_timeout=int(os.environ.get('REMINDER_CLAIM_TIMEOUT', '300')),
+    max_attempts=int(os.environ.get('REMINDER_MAX_ATTEMPTS', '5')),
+    retry_delay=int(os.environ.get('REMINDER_RETRY_DELAY', '60'))
+)
+
+
+def init_reminders(app):
+    """Configurar los destinos y arrancar el planificador"""
+    reminder_scheduler.sinks = make_sinks(os.environ.get('REMINDER_SINKS', 'socketio'))
+    reminder_scheduler.start()
@@ -4,6 +4,7 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request,
 from flask_login import login_user, logout_user, login_required, current_user
 from app.models.user import User
 import requests
+from app.http_client import http
 import secrets
 import os
 from dotenv import load_dotenv
@@ -159,7 +160,7 @@ def google_callback():
             'grant_type': 'authorization_code'
         }
         
-        token_response = requests.post(token_url, data=token_data)
+        token_response = http.post(token_url, data=token_data)
         token_response.raise_for_status()
         token_info = token_response.json()
         access_token = token_info.get('access_token')
@@ -171,7 +172,7 @@ def google_callback():
         # Obtener información del usuario
         userinfo_url = 'https://www.googleapis.com/oauth2/v2/userinfo'
         headers = {'Authorization': f'Bearer {access_token}'}
-        user_response = requests.get(userinfo_url, headers=headers)
+        user_response = http.get(userinfo_url, headers=headers)
         user_response.raise_for_status()
         user_info = user_response.json()
         
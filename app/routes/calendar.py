@@ -1,14 +1,55 @@
 """
 Rutas para el calendario
 """
-from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash
+from flask import (Blueprint, Response, current_app, render_template, request, jsonify,
+                   redirect, url_for, flash, stream_with_context)
 from flask_login import login_required, current_user
-from app.models.calendar_event import CalendarEvent
+from app.models.calendar_event import CalendarEvent, EVENTS_PAGE_SIZE
 from app.models.contact import Contact
-from datetime import datetime
+from app.models.reminder_notice import ReminderNotice
+from app import freebusy as fb
+from app.database import db
+from app.etag import conditional_response
+from app.models.data_version import CALENDAR
+from datetime import datetime, timedelta
 
 bp = Blueprint('calendar', __name__, url_prefix='/calendar')
 
+def _participant_ids(data):
+    """Ids de participantes del formulario o JSON (lista o '1,2,3')"""
+    participants = data.get('participants', [])
+    if isinstance(participants, str):
+        participants = participants.split(',') if participants else []
+    return [int(participant_id) for participant_id in participants if participant_id]
+
+def _occurrence_start(data, event):
+    """Inicio original de la repetición indicada (None si no es una serie)"""
+    value = data.get('occurrenceStart')
+    if not value or not event.rrule:
+        return None
+    return datetime.fromisoformat(value.replace('Z', '')).replace(tzinfo=None)
+
+def _json_array(events):
+    """
+    Generador de un array JSON evento a evento (con el serializador de jsonify).
+    
+    El primer evento se lee ya, antes de empezar la respuesta: si la query
+    falla se responde un 500 normal. Un error a mitad corta el cuerpo sin
+    cerrar el array, así que el cliente nunca recibe un JSON válido incompleto.
+    """
+    events = iter(events)
+    first = next(events, None)
+    
+    def generate():
+        if first is None:
+            yield '[]'
+            return
+        yield '[' + current_app.json.dumps(first.to_dict())
+        for event in events:
+            yield ',' + current_app.json.dumps(event.to_dict())
+        yield ']'
+    return generate()
+
 @bp.route('/')
 @login_required
 def index():
@@ -24,17 +65,36 @@ def index():
 @login_required
 def get_events_json():
     """API: Obtener eventos en formato JSON para FullCalendar"""
-    start = request.args.get('start')
-    end = request.args.get('end')
-    
-    if start and end:
-        start_date = datetime.fromisoformat(start.replace('Z', '+00:00'))
-        end_date = datetime.fromisoformat(end.replace('Z', '+00:00'))
-        events = CalendarEvent.get_by_date_range(current_user.id, start_date, end_date)
-    else:
-        events = CalendarEvent.get_by_user(current_user.id)
+    def build():
+        start = request.args.get('start')
+        end = request.args.get('end')
+        
+        if start and end:
+            # Rango de fechas: se serializa según se leen los eventos
+            start_date = datetime.fromisoformat(start.replace('Z', '+00:00'))
+            end_date = datetime.fromisoformat(end.replace('Z', '+00:00'))
+            events = CalendarEvent.stream_by_date_range(current_user.id, start_date, end_date,
+                                                        profiles=False)
+            body = _json_array(events)
+            # El stream ya tiene su conexión: la de la petición se devuelve
+            # ahora y no al terminar de enviar el cuerpo
+            db.disconnect()
+            return Response(stream_with_context(body), mimetype='application/json')
+        
+        # Sin rango: por páginas; la siguiente va en la cabecera Link
+        after = request.args.get('after')
+        limit = request.args.get('limit', EVENTS_PAGE_SIZE, type=int)
+        events, next_cursor = CalendarEvent.get_by_user(current_user.id, after, limit)
+        CalendarEvent.load_participants(events, profiles=False)
+        response = jsonify([event.to_dict() for event in events])
+        if next_cursor:
+            next_url = url_for('calendar.get_events_json', after=next_cursor, limit=limit)
+            response.headers['Link'] = f'<{next_url}>; rel="next"'
+        return response
     
-    return jsonify([event.to_dict() for event in events])
+    # Si el navegador ya tiene esta versión no se consultan eventos ni participantes.
+    # Los participantes van solo con su id: sus perfiles no están en la versión
+    return conditional_response(current_user.id, CALENDAR, build)
 
 @bp.route('/events/create', methods=['POST'])
 @login_required
@@ -54,26 +114,22 @@ def create_event():
             color=data.get('color', '#3b82f6'),
             location=data.get('location'),
             reminder_minutes=int(data.get('reminder', 15)),
-            all_day=data.get('allDay', False)
+            all_day=data.get('allDay', False),
+            rrule=data.get('rrule') or None
         )
         
-        event_id = event.save()
-        
-        # Agregar participantes si los hay
-        participants = data.get('participants', [])
-        if isinstance(participants, str):
-            participants = participants.split(',') if participants else []
-        
-        for participant_id in participants:
-            if participant_id:
-                event.add_participant(int(participant_id))
+        # Evento y participantes en una sola transacción
+        with db.transaction():
+            event_id = event.save()
+            event.set_participants(_participant_ids(data))
         
         if request.is_json:
+            CalendarEvent.load_participants([event])
             return jsonify({'success': True, 'id': event_id, 'event': event.to_dict()})
         else:
             flash('Evento creado correctamente', 'success')
             return redirect(url_for('calendar.index'))
-            
+    
     except Exception as e:
         if request.is_json:
             return jsonify({'success': False, 'error': str(e)}), 400
@@ -96,41 +152,55 @@ def edit_event(event_id):
         
         data = request.get_json() if request.is_json else request.form
         
+        start = datetime.fromisoformat(data.get('start').replace('Z', ''))
+        end = datetime.fromisoformat(data.get('end').replace('Z', ''))
+        occurrence_start = _occurrence_start(data, event)
+        
+        if occurrence_start and data.get('scope') != 'series':
+            # Solo esta repetición: se guarda como excepción de la serie
+            override = {
+                field: data.get(field) for field in ('title', 'description', 'location')
+                if data.get(field) is not None and data.get(field) != getattr(event, field)
+            }
+            event.override_occurrence(occurrence_start, start, end, **override)
+            occurrence = event.occurrence(occurrence_start, start, end, override)
+            if request.is_json:
+                CalendarEvent.load_participants([occurrence])
+                return jsonify({'success': True, 'event': occurrence.to_dict()})
+            flash('Evento actualizado correctamente', 'success')
+            return redirect(url_for('calendar.index'))
+        
+        if occurrence_start:
+            # Toda la serie: se desplaza lo mismo que se movió esta repetición
+            length = end - start
+            start = event.start_datetime + (start - occurrence_start)
+            end = start + length
+        
         # Actualizar campos
         event.title = data.get('title', event.title)
         event.description = data.get('description', event.description)
-        event.start_datetime = datetime.fromisoformat(data.get('start').replace('Z', ''))
-        event.end_datetime = datetime.fromisoformat(data.get('end').replace('Z', ''))
+        event.start_datetime = start
+        event.end_datetime = end
+        event.rrule = data.get('rrule', event.rrule) or None
         event.event_type = data.get('type', event.event_type)
         event.color = data.get('color', event.color)
         event.location = data.get('location', event.location)
         event.reminder_minutes = int(data.get('reminder', event.reminder_minutes))
         event.all_day = data.get('allDay', event.all_day)
         
-        event.save()
-        
-        # Actualizar participantes
-        if 'participants' in data:
-            # Eliminar participantes actuales
-            current_participants = event.get_participants()
-            for p in current_participants:
-                event.remove_participant(p['id'])
-            
-            # Agregar nuevos participantes
-            participants = data.get('participants', [])
-            if isinstance(participants, str):
-                participants = participants.split(',') if participants else []
-            
-            for participant_id in participants:
-                if participant_id:
-                    event.add_participant(int(participant_id))
+        with db.transaction():
+            event.save()
+            # Solo se sincronizan los participantes que cambian
+            if 'participants' in data:
+                event.set_participants(_participant_ids(data))
         
         if request.is_json:
+            CalendarEvent.load_participants([event])
             return jsonify({'success': True, 'event': event.to_dict()})
         else:
             flash('Evento actualizado correctamente', 'success')
             return redirect(url_for('calendar.index'))
-            
+    
     except Exception as e:
         if request.is_json:
             return jsonify({'success': False, 'error': str(e)}), 400
@@ -151,14 +221,20 @@ def delete_event(event_id):
             flash('Evento no encontrado', 'error')
             return redirect(url_for('calendar.index'))
         
-        event.delete()
+        data = request.get_json(silent=True) or request.form
+        occurrence_start = _occurrence_start(data, event)
+        if occurrence_start and data.get('scope') != 'series':
+            # Solo esta repetición
+            event.cancel_occurrence(occurrence_start)
+        else:
+            event.delete()
         
         if request.is_json:
             return jsonify({'success': True})
         else:
             flash('Evento eliminado correctamente', 'success')
             return redirect(url_for('calendar.index'))
-            
+    
     except Exception as e:
         if request.is_json:
             return jsonify({'success': False, 'error': str(e)}), 400
@@ -183,4 +259,73 @@ def upcoming():
     """Obtener eventos próximos (para dashboard/widget)"""
     days = request.args.get('days', 7, type=int)
     events = CalendarEvent.get_upcoming(current_user.id, days)
+    CalendarEvent.load_participants(events)
     return jsonify([event.to_dict() for event in events])
+
+@bp.route('/reminders/unseen')
+@login_required
+def unseen_reminders():
+    """Avisos de recordatorios que no llegaron en directo (se muestran al cargar)"""
+    notices = ReminderNotice.get_unseen(current_user.id)
+    return jsonify([{
+        'event_id': notice['event_id'],
+        'title': notice['title'],
+        'start': notice['occurrence_start'].isoformat(),
+        'location': notice['location'],
+    } for notice in notices])
+
+@bp.route('/reminders/seen', methods=['POST'])
+@login_required
+def reminder_seen():
+    """Marcar como visto el aviso de una repetición"""
+    data = request.get_json(silent=True) or {}
+    try:
+        event_id = int(data['event_id'])
+        start = datetime.fromisoformat(str(data['start']).replace('Z', '')).replace(tzinfo=None)
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'Aviso no válido'}), 400
+    ReminderNotice.mark_seen(current_user.id, event_id, start)
+    return jsonify({'success': True})
+
+@bp.route('/freebusy')
+@login_required
+def freebusy():
+    """
+    API: Ocupación conjunta y huecos libres del usuario y varios contactos.
+    
+    ?users=2,5,9&start=...&end=...&duration=30&limit=10 (duración en minutos)
+    """
+    try:
+        start = datetime.fromisoformat(request.args['start'].replace('Z', '+00:00')).replace(tzinfo=None)
+        end = datetime.fromisoformat(request.args['end'].replace('Z', '+00:00')).replace(tzinfo=None)
+        users = [int(user_id) for user_id in request.args.get('users', '').split(',') if user_id.strip()]
+    except (KeyError, ValueError):
+        return jsonify({'success': False, 'error': 'Parámetros start, end o users no válidos'}), 400
+    duration = timedelta(minutes=max(1, request.args.get('duration', 30, type=int)))
+    limit = max(1, min(request.args.get('limit', 10, type=int), 100))
+    
+    if end <= start or end - start > timedelta(days=fb.MAX_DAYS):
+        return jsonify({'success': False, 'error': f'La ventana debe durar entre 0 y {fb.MAX_DAYS} días'}), 400
+    contact_ids = sorted(set(users) - {current_user.id})
+    if len(contact_ids) > fb.MAX_USERS:
+        return jsonify({'success': False, 'error': f'Máximo {fb.MAX_USERS} contactos por consulta'}), 400
+    # Solo se puede ver la ocupación de contactos aceptados
+    not_contacts = set(contact_ids) - Contact.filter_accepted(current_user.id, contact_ids)
+    if not_contacts:
+        return jsonify({'success': False, 'error': 'No son contactos tuyos',
+                        'users': sorted(not_contacts)}), 403
+    
+    busy, merged, free = fb.freebusy([current_user.id, *contact_ids], start, end, duration, limit)
+    
+    def intervals(items):
+        return [{'start': s.isoformat(), 'end': e.isoformat()} for s, e in items]
+    
+    return jsonify({
+        'success': True,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'slotMinutes': fb.SLOT_MINUTES,
+        'busy': {str(user_id): intervals(items) for user_id, items in busy.items()},
+        'merged': intervals(merged),
+        'free': intervals(free)
+    })
@@ -5,6 +5,8 @@ from flask_login import login_required, current_user
 from app.models.user import User
 from app.models.message import Message
 from app.models.contact import Contact
+from app.realtime import unread_notifier, LONG_POLL_RETRY
+from app.database import db
 
 bp = Blueprint('chat', __name__, url_prefix='/chat')
 
@@ -31,13 +33,36 @@ def conversation(user_id):
         flash('No tienes contacto con este usuario', 'error')
         return redirect(url_for('chat.index'))
     
-    # Obtener mensajes
-    messages = Message.get_conversation(current_user.id, user_id)
+    # Obtener la página más reciente de mensajes
+    messages, older_cursor = Message.get_conversation(current_user.id, user_id)
     
     # Marcar como leídos los mensajes recibidos
     Message.mark_as_read(user_id, current_user.id)
     
-    return render_template('chat/conversation.html', other_user=other_user, messages=messages)
+    return render_template('chat/conversation.html', other_user=other_user,
+                           messages=messages, older_cursor=older_cursor)
+
+@bp.route('/<int:user_id>/messages')
+@login_required
+def older_messages(user_id):
+    """API: Cargar mensajes anteriores al cursor indicado"""
+    if not Contact.are_contacts(current_user.id, user_id):
+        return jsonify({'error': 'No tienes contacto con este usuario'}), 403
+    
+    before = request.args.get('before')
+    limit = max(1, min(request.args.get('limit', 50, type=int), 100))
+    messages, older_cursor = Message.get_conversation(current_user.id, user_id, before, limit)
+    
+    return jsonify({
+        'messages': [{
+            'id': msg['id'],
+            'sender_id': msg['sender_id'],
+            'content': msg['content'],
+            'is_read': bool(msg['is_read']),
+            'created_at': msg['created_at'].strftime('%d/%m/%Y %H:%M') if msg['created_at'] else ''
+        } for msg in messages],
+        'cursor': older_cursor
+    })
 
 @bp.route('/<int:user_id>/send', methods=['POST'])
 @login_required
@@ -64,3 +89,22 @@ def unread_count():
     """Cantidad de mensajes no leídos"""
     count = Message.count_unread(current_user.id)
     return jsonify({'count': count})
+
+@bp.route('/unread-count/wait')
+@login_required
+def wait_unread_count():
+    """Long-poll: responde cuando cambia el contador de no leídos (o tras un timeout)"""
+    since = request.args.get('count', -1, type=int)
+    
+    def read_count(user_id):
+        # No retener una conexión del pool entre lecturas
+        try:
+            return Message.count_unread(user_id)
+        finally:
+            db.disconnect()
+    
+    count = unread_notifier.wait(current_user.id, since, read_count)
+    if count is None:
+        # Demasiadas esperas en este worker: el cliente vuelve más tarde
+        return jsonify({'count': read_count(current_user.id), 'retry': LONG_POLL_RETRY})
+    return jsonify({'count': count})
@@ -2,10 +2,11 @@
 
 from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required, current_user
-from app.models.user import User
+from app.models.user import User, SEARCH_PAGE_SIZE
 from app.models.contact import Contact
 from app.models.contact_folder import ContactFolder
-from app.database import db
+from app.models.data_version import FOLDERS
+from app.etag import conditional_response
 
 bp = Blueprint('contacts', __name__, url_prefix='/contacts')
 
@@ -13,16 +14,13 @@ bp = Blueprint('contacts', __name__, url_prefix='/contacts')
 @login_required
 def index():
     """Lista de contactos y código de amigo"""
-    contacts = Contact.get_accepted(current_user.id)
+    # Filtrar por carpeta si se especifica (lo resuelve el índice de contact_edges)
+    folder_id = request.args.get('folder')
+    contacts = Contact.get_accepted(current_user.id, folder_id)
     pending_sent = Contact.get_pending_sent(current_user.id)
     pending_received = Contact.get_pending_received(current_user.id)
     folders = ContactFolder.get_all_by_user(current_user.id)
     
-    # Filtrar por carpeta si se especifica
-    folder_id = request.args.get('folder')
-    if folder_id:
-        contacts = [c for c in contacts if str(c.folder_id) == folder_id]
-    
     return render_template('contacts/index.html',
                          contacts=contacts,
                          pending_sent=pending_sent,
@@ -34,15 +32,16 @@ def index():
 @bp.route('/add', methods=['POST'])
 @login_required
 def add():
-    """Agregar contacto por código de amigo"""
+    """Agregar contacto por código de amigo (o por id, desde la búsqueda)"""
     friend_code = request.form.get('friend_code', '').strip().upper()
+    user_id = request.form.get('user_id', type=int)
     
-    if not friend_code:
+    if not friend_code and not user_id:
         flash('Por favor ingresa un código de amigo', 'error')
         return redirect(url_for('contacts.index'))
     
-    # Buscar usuario por código
-    user = User.find_by_friend_code(friend_code)
+    # Buscar usuario por código o por id
+    user = User.find_by_friend_code(friend_code) if friend_code else User.find_by_id(user_id)
     
     if not user:
         flash('Código de amigo no válido', 'error')
@@ -77,6 +76,21 @@ def reject(contact_id):
     flash('Solicitud rechazada', 'success')
     return redirect(url_for('contacts.index'))
 
+@bp.route('/search')
+@login_required
+def search():
+    """API: Buscar usuarios por prefijo (username, nombre, apellido o código)"""
+    query = request.args.get('q', '')
+    after = request.args.get('after')
+    limit = max(1, min(request.args.get('limit', SEARCH_PAGE_SIZE, type=int), 50))
+    users, next_cursor = User.search(query, after, limit)
+    
+    return jsonify({
+        'query': query,
+        'users': [user for user in users if user['id'] != current_user.id],
+        'next_cursor': next_cursor
+    })
+
 # ===== RUTAS PARA CARPETAS =====
 
 @bp.route('/folders/create', methods=['POST'])
@@ -160,7 +174,7 @@ def move_to_folder():
     """Mover contacto a una carpeta"""
     data = request.get_json() if request.is_json else request.form
     
-    contact_id = data.get('contact_id')
+    contact_id = data.get('contact_id')  # id de usuario del contacto
     folder_id = data.get('folder_id')  # None para remover de carpeta
     
     if not contact_id:
@@ -169,13 +183,8 @@ def move_to_folder():
         flash('Contacto no especificado', 'error')
         return redirect(url_for('contacts.index'))
     
-    # Verificar que el contacto pertenece al usuario
-    query = """
-        UPDATE contacts 
-        SET folder_id = %s 
-        WHERE id = %s AND user_id = %s
-    """
-    db.execute_query(query, (folder_id, contact_id, current_user.id))
+    # Solo se mueve si el contacto pertenece al usuario
+    Contact.move_to_folder(contact_id, current_user.id, folder_id)
     
     if request.is_json:
         return jsonify({'message': 'Contacto movido exitosamente'})
@@ -187,6 +196,9 @@ def move_to_folder():
 @login_required
 def list_folders():
     """API: Obtener lista de carpetas del usuario"""
-    folders = ContactFolder.get_all_by_user(current_user.id)
-    return jsonify([folder.to_dict() for folder in folders])
+    def build():
+        folders = ContactFolder.get_all_by_user(current_user.id)
+        return jsonify([folder.to_dict() for folder in folders])
+    
+    return conditional_response(current_user.id, FOLDERS, build)
 
@@ -0,0 +1,37 @@
+"""Rutas de diagnóstico (solo si DEBUG_ENDPOINTS=1; desactivadas en producción)"""
+
+from flask import Blueprint, render_template, request, jsonify, Response
+from app.database import db
+from app.query_stats import query_stats
+
+bp = Blueprint('debug', __name__, url_prefix='/__debug')
+
+@bp.route('/queries')
+def queries():
+    """Panel de queries: agregados por query normalizada, por ruta y N+1"""
+    data = query_stats.snapshot()
+    if request.args.get('format') == 'json':
+        return jsonify(data)
+    
+    sort = request.args.get('sort', 'total_ms')
+    if sort not in ('total_ms', 'count', 'max_ms', 'avg_ms', 'errors', 'rows'):
+        sort = 'total_ms'
+    rows = sorted(data['queries'].items(), key=lambda item: item[1][sort], reverse=True)
+    routes = sorted(data['routes'].items(), key=lambda item: item[1]['queries'], reverse=True)
+    return render_template('debug/queries.html', data=data, rows=rows, routes=routes, sort=sort)
+
+@bp.route('/queries/metrics')
+def queries_metrics():
+    """Agregados de queries en formato de texto de Prometheus"""
+    return Response(query_stats.prometheus(), mimetype='text/plain; version=0.0.4')
+
+@bp.route('/queries/reset', methods=['POST'])
+def reset_queries():
+    """Vaciar los agregados"""
+    query_stats.reset()
+    return jsonify({'message': 'Estadísticas reiniciadas'})
+
+@bp.route('/pool')
+def pool():
+    """Estado del pool de conexiones"""
+    return jsonify(db.pool_stats())
@@ -0,0 +1,51 @@
+"""Endpoint de métricas en formato Prometheus (solo si METRICS_ENABLED=1)"""
+
+import hmac
+import os
+from flask import Blueprint, Response, abort, request
+from app.database import db
+from app.metrics import request_metrics
+from app.reminders import reminder_scheduler
+
+bp = Blueprint('metrics', __name__)
+
+# El scraper se identifica con "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+@bp.before_request
+def require_token():
+    """Sin token configurado el endpoint no responde a nadie"""
+    expected = f"Bearer {METRICS_TOKEN}"
+    provided = request.headers.get('Authorization', '')
+    if not METRICS_TOKEN or not hmac.compare_digest(provided.encode(), expected.encode()):
+        abort(404)
+
+@bp.route('/metrics')
+def metrics():
+    """Métricas de peticiones, del pool de conexiones y de recordatorios"""
+    pool = db.pool_stats()
+    lines = [
+        '# HELP eid_db_pool_connections Conexiones del pool por estado',
+        '# TYPE eid_db_pool_connections gauge',
+        f'eid_db_pool_connections{{state="idle"}} {pool["idle"]}',
+        f'eid_db_pool_connections{{state="in_use"}} {pool["in_use"]}',
+        '# HELP eid_db_stream_connections Conexiones del pool retenidas por respuestas en stream',
+        '# TYPE eid_db_stream_connections gauge',
+        f'eid_db_stream_connections {pool["streaming"]}',
+        '# HELP eid_db_pool_exhausted_total Esperas que agotaron DB_POOL_TIMEOUT',
+        '# TYPE eid_db_pool_exhausted_total counter',
+        f'eid_db_pool_exhausted_total {pool["exhausted"]}',
+    ]
+    reminders = reminder_scheduler.stats()
+    lines += [
+        '# HELP eid_reminders_queued Recordatorios en memoria esperando su hora',
+        '# TYPE eid_reminders_queued gauge',
+        f'eid_reminders_queued {reminders["queued"]}',
+        '# HELP eid_reminders_total Recordatorios procesados por resultado',
+        '# TYPE eid_reminders_total counter',
+        f'eid_reminders_total{{result="delivered"}} {reminders["delivered"]}',
+        f'eid_reminders_total{{result="skipped"}} {reminders["skipped"]}',
+        f'eid_reminders_total{{result="failed"}} {reminders["failed"]}',
+    ]
+    body = request_metrics.prometheus() + '\n'.join(lines) + '\n'
+    return Response(body, mimetype='text/plain; version=0.0.4')
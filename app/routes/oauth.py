@@ -4,11 +4,15 @@ from flask import Blueprint, redirect, url_for, request, flash, session
 from flask_login import login_required, current_user
 from app.oauth_config import get_oauth_config, OAUTH_CONFIGS
 from app.models.social_link import SocialLink
+from app.http_client import http
+import logging
 import requests
 import secrets
 
 bp = Blueprint('oauth', __name__, url_prefix='/oauth')
 
+logger = logging.getLogger(__name__)
+
 @bp.route('/connect/<platform>')
 @login_required
 def connect(platform):
@@ -99,7 +103,7 @@ def callback(platform):
     
     try:
         # Obtener access token
-        token_response = requests.post(config['token_url'], data=token_data)
+        token_response = http.post(config['token_url'], data=token_data)
         token_response.raise_for_status()
         token_info = token_response.json()
         access_token = token_info.get('access_token')
@@ -110,7 +114,7 @@ def callback(platform):
         
         # Obtener información del usuario
         headers = {'Authorization': f'Bearer {access_token}'}
-        user_response = requests.get(config['userinfo_url'], headers=headers)
+        user_response = http.get(config['userinfo_url'], headers=headers)
         user_response.raise_for_status()
         user_info = user_response.json()
         
@@ -209,7 +213,7 @@ def get_youtube_channel_info(access_token):
     """Obtener información completa del canal de YouTube"""
     try:
         headers = {'Authorization': f'Bearer {access_token}'}
-        response = requests.get(
+        response = http.get(
             'https://www.googleapis.com/youtube/v3/channels',
             headers=headers,
             params={
@@ -265,8 +269,7 @@ def get_youtube_channel_info(access_token):
                 'views': view_count
             }
     except Exception as e:
-        print(f"Error obteniendo info de YouTube: {e}")
-        pass
+        logger.warning("Error obteniendo info de YouTube: %s", e)
     
     return None
 
@@ -274,7 +277,7 @@ def get_instagram_profile_info(access_token):
     """Obtener información del perfil de Instagram"""
     try:
         headers = {'Authorization': f'Bearer {access_token}'}
-        response = requests.get(
+        response = http.get(
             'https://graph.instagram.com/me',
             headers=headers,
             params={
@@ -291,8 +294,7 @@ def get_instagram_profile_info(access_token):
             'instagram_id': data.get('id')
         }
     except Exception as e:
-        print(f"Error obteniendo info de Instagram: {e}")
-        pass
+        logger.warning("Error obteniendo info de Instagram: %s", e)
     
     return None
 
@@ -6,7 +6,7 @@ from app.models.user import User
 from app.models.social_link import SocialLink
 from app.models.contact import Contact
 from app.social_extractor import extract_social_info
-import json
+from app.extraction_jobs import extraction_queue
 
 bp = Blueprint('profile', __name__, url_prefix='/profile')
 
@@ -14,36 +14,11 @@ bp = Blueprint('profile', __name__, url_prefix='/profile')
 @login_required
 def my_profile():
     """Mi perfil"""
-    social_links = SocialLink.get_by_user(current_user.id)
+    # Enlaces con profile_data ya parseado, desde la caché de perfiles
+    social_links = SocialLink.get_profile_links(current_user.id)
     
     # Crear diccionario de links por plataforma para pre-llenar formularios
-    links_dict = {}
-    for link in social_links:
-        # DEBUG: Ver qué tipo de dato es profile_data
-        print(f"\n=== DEBUG: {link['platform']} ===")
-        print(f"Type of profile_data: {type(link.get('profile_data'))}")
-        print(f"Value: {link.get('profile_data')}")
-        
-        # Parsear profile_data si existe y es string
-        if link.get('profile_data'):
-            try:
-                if isinstance(link['profile_data'], str):
-                    print("Es string, parseando JSON...")
-                    link['profile_data_parsed'] = json.loads(link['profile_data'])
-                    print(f"Parseado exitosamente: {link['profile_data_parsed']}")
-                elif isinstance(link['profile_data'], dict):
-                    print("Ya es dict, usando directamente")
-                    link['profile_data_parsed'] = link['profile_data']
-                else:
-                    print(f"Tipo desconocido: {type(link['profile_data'])}")
-                    link['profile_data_parsed'] = None
-            except Exception as e:
-                print(f"❌ Error parseando profile_data: {e}")
-                link['profile_data_parsed'] = None
-        else:
-            link['profile_data_parsed'] = None
-            
-        links_dict[link['platform']] = link
+    links_dict = {link['platform']: link for link in social_links}
     
     return render_template('profile/view.html', user=current_user, social_links=social_links, links_dict=links_dict, is_own_profile=True)
 
@@ -62,8 +37,9 @@ def view_contact(user_id):
         return redirect(url_for('contacts.index'))
     
     # Mostrar solo redes sociales visibles
-    social_links = SocialLink.get_visible_by_user(user_id)
-    return render_template('profile/view.html', user=user, social_links=social_links, is_own_profile=False)
+    social_links = SocialLink.get_profile_links(user_id, visible_only=True)
+    links_dict = {link['platform']: link for link in social_links}
+    return render_template('profile/view.html', user=user, social_links=social_links, links_dict=links_dict, is_own_profile=False)
 
 @bp.route('/edit', methods=['GET', 'POST'])
 @login_required
@@ -84,7 +60,7 @@ def edit():
 @login_required
 def social_links():
     """Gestionar enlaces a redes sociales - Vista de ficha de contacto"""
-    links = SocialLink.get_by_user(current_user.id)
+    links = SocialLink.get_profile_links(current_user.id)
     
     # Convertir lista de links a diccionario por plataforma
     links_dict = {}
@@ -106,38 +82,37 @@ def save_social_link():
         flash(f'Por favor ingresa la URL de tu perfil de {platform}', 'error')
         return redirect(url_for('profile.my_profile'))
     
-    # Extraer información del enlace
-    try:
-        extracted_data = extract_social_info(url, platform)
-        
-        # Si no se proporcionó username, usar el extraído
-        username = extracted_data.get('username', '')
-        
-        # Si aún no hay username, usar un valor por defecto
-        if not username:
-            username = 'Mi perfil'
-        
-        # Guardar toda la info extraída como profile_data
-        profile_data = extracted_data
-        
-    except Exception as e:
-        print(f"Error extrayendo info: {str(e)}")
-        # Si falla la extracción, usar valores básicos
-        username = request.form.get('username', 'Mi perfil')
-        profile_data = None
+    # Datos que se pueden sacar de la propia URL (sin peticiones HTTP);
+    # el scraping del perfil se hace en segundo plano
+    extracted_data = extraction_queue.get_cached(url, platform) or extract_social_info(url, platform, scrape=False)
+    
+    # Si no se proporcionó username, usar el extraído
+    username = extracted_data.get('username') or request.form.get('username') or 'Mi perfil'
+    profile_data = extracted_data if 'error' not in extracted_data else None
     
     # Verificar si ya existe este enlace
     existing = SocialLink.get_by_platform(current_user.id, platform)
     
     if existing:
         # Actualizar con profile_data
-        SocialLink.update(existing['id'], current_user.id, username, url, is_visible, profile_data)
+        link_id = existing['id']
+        SocialLink.update(link_id, current_user.id, username, url, is_visible, profile_data)
         flash(f'✅ {platform} actualizado correctamente', 'success')
     else:
         # Crear nuevo con profile_data
-        SocialLink.create(current_user.id, platform, username, url, is_visible, profile_data)
+        link_id = SocialLink.create(current_user.id, platform, username, url, is_visible, profile_data)
         flash(f'✅ {platform} agregado correctamente', 'success')
     
+    # Completar profile_data cuando termine la extracción
+    if link_id:
+        user_id = current_user.id
+        
+        def save_profile_data(info):
+            if 'error' not in info:
+                SocialLink.update_profile_data(link_id, user_id, url, info)
+        
+        extraction_queue.submit(url, platform, save_profile_data)
+    
     return redirect(url_for('profile.my_profile'))
 
 @bp.route('/social-links/<int:link_id>/delete', methods=['POST'])
@@ -3,14 +3,21 @@ Extractor de información de URLs de redes sociales
 Sin usar APIs - solo parsing de URLs y scraping básico
 """
 
+import codecs
+import logging
 import re
 import requests
+from app.http_client import http
 from bs4 import BeautifulSoup
+from html.parser import HTMLParser
 from urllib.parse import urlparse, parse_qs, unquote
 
-def extract_social_info(url, platform):
+logger = logging.getLogger(__name__)
+
+def extract_social_info(url, platform, scrape=True):
     """
     Extrae información de una URL de red social
+    Con scrape=False solo se analiza la URL (sin peticiones HTTP)
     Retorna: dict con información extraída
     """
     try:
@@ -55,12 +62,13 @@ def extract_social_info(url, platform):
             info.update(_extract_whatsapp(url, path))
         
         # Intentar scraping básico para obtener más info
-        info = _scrape_basic_info(url, info)
+        if scrape:
+            info = _scrape_basic_info(url, info)
         
         return info
         
     except Exception as e:
-        print(f"Error extrayendo info de {url}: {str(e)}")
+        logger.warning("Error extrayendo info de %s: %s", url, e)
         return {'url': url, 'platform': platform, 'error': str(e)}
 
 
@@ -174,9 +182,133 @@ def _extract_whatsapp(url, path):
     return {'username': None}
 
 
+# Bytes máximos que se leen buscando el final de <head>
+HEAD_MAX_BYTES = 256 * 1024
+HEAD_CHUNK_SIZE = 16 * 1024
+
+
+class _HeadMetaParser(HTMLParser):
+    """
+    Parser en streaming que solo recoge <meta> y <title> del <head>,
+    sin construir un árbol DOM. Se detiene al cerrar </head> o abrir <body>.
+    """
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.meta = {}
+        self.title = None
+        self.head_complete = False
+        self._title_parts = None
+    
+    def handle_starttag(self, tag, attrs):
+        if self.head_complete:
+            return
+        if tag == 'meta':
+            attrs = dict(attrs)
+            content = attrs.get('content')
+            for attr in ('property', 'name'):
+                # Igual que soup.find(): gana la primera aparición
+                if attrs.get(attr) and (attr, attrs[attr]) not in self.meta:
+                    self.meta[(attr, attrs[attr])] = content
+        elif tag == 'title' and self.title is None:
+            self._title_parts = []
+        elif tag == 'body':
+            self.head_complete = True
+    
+    def handle_endtag(self, tag):
+        if tag == 'title' and self._title_parts is not None:
+            self.title = ''.join(self._title_parts)
+            self._title_parts = None
+        elif tag == 'head':
+            self.head_complete = True
+    
+    def handle_data(self, data):
+        if self._title_parts is not None:
+            self._title_parts.append(data)
+
+
+def _parse_head(chunks, encoding='utf-8', max_bytes=HEAD_MAX_BYTES):
+    """
+    Analizar trozos de HTML (bytes) hasta cerrar el <head> o llegar a max_bytes.
+    Retorna (parser, bytes leídos); parser.head_complete indica si se completó
+    """
+    parser = _HeadMetaParser()
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    consumed = []
+    total = 0
+    for chunk in chunks:
+        if not chunk:
+            continue
+        consumed.append(chunk)
+        total += len(chunk)
+        parser.feed(decoder.decode(chunk))
+        if parser.head_complete or total >= max_bytes:
+            break
+    return parser, b''.join(consumed)
+
+
+def _soup_head(html):
+    """Ruta completa con BeautifulSoup: retorna (meta, title) como _HeadMetaParser"""
+    soup = BeautifulSoup(html, 'html.parser')
+    meta = {}
+    for key in ('og:title', 'og:description', 'og:image'):
+        tag = soup.find('meta', property=key)
+        if tag:
+            meta[('property', key)] = tag.get('content')
+    for key in ('twitter:title', 'description', 'twitter:image'):
+        tag = soup.find('meta', attrs={'name': key})
+        if tag:
+            meta[('name', key)] = tag.get('content')
+    title = soup.find('title')
+    return meta, (title.string if title else None)
+
+
+def _apply_head_meta(info, meta, title):
+    """Rellenar info con Open Graph / Twitter cards / <title>"""
+    # Intentar extraer meta tags comunes (Open Graph)
+    og_title = meta.get(('property', 'og:title'))
+    if og_title:
+        info['profile_name'] = og_title.strip()
+    
+    # Twitter card title como alternativa
+    if not info.get('profile_name'):
+        twitter_title = meta.get(('name', 'twitter:title'))
+        if twitter_title:
+            info['profile_name'] = twitter_title.strip()
+    
+    og_description = meta.get(('property', 'og:description'))
+    if og_description:
+        bio_text = og_description.strip()
+        info['bio'] = bio_text[:300] if len(bio_text) > 300 else bio_text
+    
+    # Meta description como alternativa
+    if not info.get('bio'):
+        meta_desc = meta.get(('name', 'description'))
+        if meta_desc:
+            bio_text = meta_desc.strip()
+            info['bio'] = bio_text[:300] if len(bio_text) > 300 else bio_text
+    
+    og_image = meta.get(('property', 'og:image'))
+    if og_image:
+        info['avatar'] = og_image.strip()
+    
+    # Twitter image como alternativa
+    if not info.get('avatar'):
+        twitter_image = meta.get(('name', 'twitter:image'))
+        if twitter_image:
+            info['avatar'] = twitter_image.strip()
+    
+    # Título de la página como fallback
+    if not info.get('profile_name') and title:
+        info['profile_name'] = title.strip()
+    
+    return info
+
+
 def _scrape_basic_info(url, info):
     """
     Intenta hacer scraping básico de la página para obtener más información
+    Solo se descarga hasta el final del <head> (máximo HEAD_MAX_BYTES)
     NOTA: Muchas redes sociales bloquean scraping o requieren JS
     """
     try:
@@ -197,59 +329,38 @@ def _scrape_basic_info(url, info):
         }
         
         # Timeout corto para no bloquear la UI
-        response = requests.get(url, headers=headers, timeout=5, allow_redirects=True)
+        response = http.get(url, headers=headers, timeout=(3.05, 5), allow_redirects=True, stream=True)
         
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Intentar extraer meta tags comunes (Open Graph)
-            og_title = soup.find('meta', property='og:title')
-            if og_title and og_title.get('content'):
-                info['profile_name'] = og_title.get('content', '').strip()
-            
-            # Twitter card title como alternativa
-            if not info.get('profile_name'):
-                twitter_title = soup.find('meta', attrs={'name': 'twitter:title'})
-                if twitter_title and twitter_title.get('content'):
-                    info['profile_name'] = twitter_title.get('content', '').strip()
-            
-            og_description = soup.find('meta', property='og:description')
-            if og_description and og_description.get('content'):
-                bio_text = og_description.get('content', '').strip()
-                info['bio'] = bio_text[:300] if len(bio_text) > 300 else bio_text
-            
-            # Meta description como alternativa
-            if not info.get('bio'):
-                meta_desc = soup.find('meta', attrs={'name': 'description'})
-                if meta_desc and meta_desc.get('content'):
-                    bio_text = meta_desc.get('content', '').strip()
-                    info['bio'] = bio_text[:300] if len(bio_text) > 300 else bio_text
-            
-            og_image = soup.find('meta', property='og:image')
-            if og_image and og_image.get('content'):
-                info['avatar'] = og_image.get('content', '').strip()
-            
-            # Twitter image como alternativa
-            if not info.get('avatar'):
-                twitter_image = soup.find('meta', attrs={'name': 'twitter:image'})
-                if twitter_image and twitter_image.get('content'):
-                    info['avatar'] = twitter_image.get('content', '').strip()
-            
-            # Título de la página como fallback
-            if not info.get('profile_name'):
-                title = soup.find('title')
-                if title and title.string:
-                    info['profile_name'] = title.string.strip()
+        with response:
+            if response.status_code == 200:
+                # Sin charset en la cabecera asumimos UTF-8 (requests asumiría ISO-8859-1)
+                encoding = 'utf-8'
+                if 'charset' in response.headers.get('Content-Type', '').lower():
+                    encoding = response.encoding or 'utf-8'
+                try:
+                    codecs.lookup(encoding)
+                except LookupError:
+                    encoding = 'utf-8'
+                
+                chunks = response.iter_content(chunk_size=HEAD_CHUNK_SIZE)
+                parser, head = _parse_head(chunks, encoding)
+                
+                if parser.head_complete:
+                    _apply_head_meta(info, parser.meta, parser.title)
+                else:
+                    # <head> incompleto: leer el resto y usar el parser completo
+                    html = (head + b''.join(chunks)).decode(encoding, errors='replace')
+                    _apply_head_meta(info, *_soup_head(html))
         
         return info
         
     except requests.exceptions.Timeout:
         # No bloquear si el scraping tarda mucho
-        print(f"Timeout al obtener info de {url}")
+        logger.info("Timeout al obtener info de %s", url)
         return info
     except Exception as e:
         # No fallar si el scraping no funciona
-        print(f"Error en scraping de {url}: {str(e)}")
+        logger.info("Error en scraping de %s: %s", url, e)
         return info
 
 
@@ -1,57 +1,189 @@
 // eID - JavaScript principal
 
-// Actualizar contador de mensajes no leídos
-function updateUnreadCount() {
-    fetch('/chat/unread-count')
+// Contador de mensajes no leídos
+// El servidor envía los cambios por Socket.IO; si no hay WebSocket se usa
+// un long-poll que solo responde cuando el contador cambia.
+let unreadCount = 0;
+
+function renderUnreadCount(count) {
+    unreadCount = Math.max(count, 0);
+    const badge = document.getElementById('unread-badge');
+    if (badge && unreadCount > 0) {
+        badge.textContent = unreadCount;
+        badge.style.display = 'inline';
+    } else if (badge) {
+        badge.style.display = 'none';
+    }
+}
+
+function longPollUnreadCount(count) {
+    fetch(`/chat/unread-count/wait?count=${count}`)
         .then(response => response.json())
         .then(data => {
-            const badge = document.getElementById('unread-badge');
-            if (badge && data.count > 0) {
-                badge.textContent = data.count;
-                badge.style.display = 'inline';
-            } else if (badge) {
-                badge.style.display = 'none';
+            renderUnreadCount(data.count);
+            if (data.retry) {
+                // El servidor tiene demasiadas esperas abiertas
+                setTimeout(() => longPollUnreadCount(data.count), data.retry * 1000);
+            } else {
+                longPollUnreadCount(data.count);
             }
         })
+        .catch(error => {
+            console.error('Error:', error);
+            // Reintentar más tarde si el servidor no responde
+            setTimeout(() => longPollUnreadCount(-1), 30000);
+        });
+}
+
+function subscribeUnreadCount() {
+    if (typeof io === 'undefined') {
+        longPollUnreadCount(-1);
+        return;
+    }
+    const socket = io({ reconnectionAttempts: 5 });
+    socket.on('unread_count', data => renderUnreadCount(data.count));
+    socket.on('unread_delta', data => renderUnreadCount(unreadCount + data.delta));
+    socket.on('calendar_reminder', showCalendarReminder);
+    socket.io.on('reconnect_failed', () => longPollUnreadCount(-1));
+}
+
+// Aviso de un recordatorio del calendario (llega por Socket.IO o, si no había
+// conexión cuando se envió, al cargar la página). Al mostrarlo se marca como visto.
+function showCalendarReminder(reminder) {
+    fetch('/calendar/reminders/seen', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ event_id: reminder.event_id, start: reminder.start })
+    }).catch(error => console.error('Error:', error));
+
+    const start = new Date(reminder.start);
+    const notice = document.createElement('div');
+    notice.className = 'calendar-reminder';
+    notice.style.cssText = 'position: fixed; top: 20px; right: 20px; padding: 16px 24px; ' +
+        'background: #3b82f6; color: white; border-radius: 8px; z-index: 10000; cursor: pointer;';
+    notice.textContent = `⏰ ${reminder.title} · ${start.toLocaleString()}` +
+        (reminder.location ? ` · ${reminder.location}` : '');
+    notice.onclick = () => notice.remove();
+    document.body.appendChild(notice);
+    setTimeout(() => notice.remove(), 15000);
+}
+
+function loadUnseenReminders() {
+    fetch('/calendar/reminders/unseen')
+        .then(response => response.json())
+        .then(reminders => reminders.forEach(showCalendarReminder))
         .catch(error => console.error('Error:', error));
 }
 
-// Actualizar cada 5 segundos si el usuario está autenticado
 if (document.getElementById('unread-badge')) {
-    updateUnreadCount();
-    setInterval(updateUnreadCount, 5000);
+    subscribeUnreadCount();
+    loadUnseenReminders();
 }
 
 // Búsqueda de usuarios (para la página de contactos)
-function searchUsers(query) {
-    if (query.length < 2) {
-        document.getElementById('search-results').innerHTML = '';
+// Las pulsaciones se agrupan (debounce) y cada búsqueda nueva cancela la
+// anterior, así que solo se pinta la respuesta de la última consulta.
+const SEARCH_DEBOUNCE_MS = 200;
+let searchTimer = null;
+let searchController = null;
+
+function renderSearchResults(users, append) {
+    const resultsDiv = document.getElementById('search-results');
+    if (!append) {
+        resultsDiv.innerHTML = '';
+    }
+    const moreButton = resultsDiv.querySelector('.search-more');
+    if (moreButton) {
+        moreButton.remove();
+    }
+    if (!append && users.length === 0) {
+        resultsDiv.innerHTML = '<p>No se encontraron usuarios</p>';
         return;
     }
     
-    fetch(`/contacts/search?q=${encodeURIComponent(query)}`)
+    users.forEach(user => {
+        if (resultsDiv.querySelector(`[data-user-id="${user.id}"]`)) {
+            return;
+        }
+        const item = document.createElement('div');
+        item.className = 'user-result';
+        item.dataset.userId = user.id;
+        
+        const avatar = document.createElement('img');
+        avatar.src = `/static/img/${user.avatar || 'default.png'}`;
+        avatar.alt = user.username;
+        
+        const info = document.createElement('div');
+        const name = document.createElement('strong');
+        name.textContent = user.username;
+        info.appendChild(name);
+        if (user.full_name) {
+            const fullName = document.createElement('small');
+            fullName.textContent = user.full_name;
+            info.appendChild(document.createElement('br'));
+            info.appendChild(fullName);
+        }
+        
+        const form = document.createElement('form');
+        form.method = 'POST';
+        form.action = '/contacts/add';
+        form.style.display = 'inline';
+        const code = document.createElement('input');
+        code.type = 'hidden';
+        code.name = 'user_id';
+        code.value = user.id;
+        const button = document.createElement('button');
+        button.type = 'submit';
+        button.className = 'btn btn-primary';
+        button.textContent = 'Agregar';
+        form.append(code, button);
+        
+        item.append(avatar, info, form);
+        resultsDiv.appendChild(item);
+    });
+}
+
+function fetchSearchPage(query, after) {
+    if (searchController) {
+        searchController.abort();
+    }
+    searchController = new AbortController();
+    
+    let url = `/contacts/search?q=${encodeURIComponent(query)}`;
+    if (after) {
+        url += `&after=${encodeURIComponent(after)}`;
+    }
+    fetch(url, { signal: searchController.signal })
         .then(response => response.json())
-        .then(users => {
-            const resultsDiv = document.getElementById('search-results');
-            if (users.length === 0) {
-                resultsDiv.innerHTML = '<p>No se encontraron usuarios</p>';
-                return;
+        .then(data => {
+            renderSearchResults(data.users, Boolean(after));
+            if (data.next_cursor) {
+                const more = document.createElement('button');
+                more.type = 'button';
+                more.className = 'btn search-more';
+                more.textContent = 'Ver más';
+                more.addEventListener('click', () => fetchSearchPage(query, data.next_cursor));
+                document.getElementById('search-results').appendChild(more);
             }
-            
-            resultsDiv.innerHTML = users.map(user => `
-                <div class="user-result">
-                    <img src="/static/img/${user.avatar}" alt="${user.username}">
-                    <div>
-                        <strong>${user.username}</strong>
-                        ${user.full_name ? `<br><small>${user.full_name}</small>` : ''}
-                    </div>
-                    <form method="POST" action="/contacts/add/${user.id}" style="display:inline">
-                        <button type="submit" class="btn btn-primary">Agregar</button>
-                    </form>
-                </div>
-            `).join('');
         })
-        .catch(error => console.error('Error:', error));
+        .catch(error => {
+            if (error.name !== 'AbortError') {
+                console.error('Error:', error);
+            }
+        });
+}
+
+function searchUsers(query) {
+    clearTimeout(searchTimer);
+    query = query.trim();
+    if (query.length < 2) {
+        if (searchController) {
+            searchController.abort();
+        }
+        document.getElementById('search-results').innerHTML = '';
+        return;
+    }
+    searchTimer = setTimeout(() => fetchSearchPage(query, null), SEARCH_DEBOUNCE_MS);
 }
 
 // Auto-cerrar alertas después de 5 segundos
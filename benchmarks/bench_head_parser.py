@@ -0,0 +1,92 @@
+"""
+Benchmark: parser de <head> en streaming vs BeautifulSoup sobre la página completa
+
+Usa las páginas guardadas en benchmarks/fixtures y les añade un <body> de
+relleno (scripts y HTML, como en las páginas reales de redes sociales) hasta
+el tamaño indicado. No hace peticiones HTTP: mide solo el coste de parsing.
+
+Uso: python benchmarks/bench_head_parser.py [tamaño_kb] [repeticiones]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app.social_extractor import (
+    HEAD_CHUNK_SIZE, _apply_head_meta, _parse_head, _soup_head
+)
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def load_page(name, size_kb):
+    """Cargar una fixture y rellenar el <body> hasta size_kb"""
+    with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as f:
+        page = f.read()
+    filler = (
+        '<div class="post"><a href="/p/abc123/"><img src="https://cdn.example.com/img.jpg" alt="Foto"></a></div>\n'
+        '<script>window.__data = {"items": [1, 2, 3, 4, 5], "cursor": "QVFBZ0V4YW1wbGU="};</script>\n'
+    )
+    body = []
+    size = len(page)
+    while size < size_kb * 1024:
+        body.append(filler)
+        size += len(filler)
+    return (page + ''.join(body) + '</body></html>').encode('utf-8')
+
+
+def chunked(data, size=HEAD_CHUNK_SIZE):
+    """Simular response.iter_content()"""
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def run_head(data):
+    parser, _ = _parse_head(chunked(data))
+    return _apply_head_meta({}, parser.meta, parser.title)
+
+
+def run_soup(data):
+    return _apply_head_meta({}, *_soup_head(data.decode('utf-8')))
+
+
+def measure(func, data, repeat):
+    """Retorna (ms por ejecución, pico de memoria en KB, resultado)"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func(data)
+    elapsed = (time.perf_counter() - started) / repeat * 1000
+    
+    tracemalloc.start()
+    func(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024, result
+
+
+def main():
+    size_kb = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    
+    print(f"Páginas de ~{size_kb} KB, {repeat} repeticiones\n")
+    print(f"{'fixture':<24}{'parser':<16}{'ms':>10}{'pico KB':>12}")
+    print("-" * 62)
+    for name in sorted(os.listdir(FIXTURES_DIR)):
+        if not name.endswith('.html'):
+            continue
+        data = load_page(name, size_kb)
+        head_ms, head_kb, head_info = measure(run_head, data, repeat)
+        soup_ms, soup_kb, soup_info = measure(run_soup, data, repeat)
+        
+        print(f"{name:<24}{'head (stream)':<16}{head_ms:>10.2f}{head_kb:>12.0f}")
+        print(f"{'':<24}{'BeautifulSoup':<16}{soup_ms:>10.2f}{soup_kb:>12.0f}")
+        print(f"{'':<24}{'speedup':<16}{soup_ms / head_ms:>9.0f}x{soup_kb / head_kb:>11.0f}x")
+        if head_info != soup_info:
+            print(f"  ⚠ Resultados distintos: {head_info} != {soup_info}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark: filas como diccionarios + modelos con __dict__ vs tuplas + __slots__
+
+Compara cómo se construían los modelos (cursor dictionary=True y
+Modelo(**fila), con los atributos en el __dict__ de cada instancia) con
+db.fetch_all_as (tuplas del cursor y modelos con __slots__). Las tuplas
+que devolvería el driver se generan antes de medir; no hace falta MySQL.
+
+Uso: python benchmarks/bench_row_hydration.py [filas] [repeticiones]
+"""
+
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app.database import _hydrate
+from app.models.calendar_event import CalendarEvent
+from app.models.contact_folder import ContactFolder
+
+EVENT_COLUMNS = ('id', 'user_id', 'title', 'description', 'start_datetime', 'end_datetime',
+                 'event_type', 'color', 'location', 'reminder_minutes', 'all_day',
+                 'created_at', 'updated_at', 'rrule', 'recurrence_until')
+FOLDER_COLUMNS = ('id', 'user_id', 'name', 'color', 'icon', 'position', 'contacts_count',
+                  'created_at', 'updated_at')
+
+
+def event_rows(count):
+    base = datetime(2025, 11, 1, 9, 0)
+    return [
+        (i, 1, f"Evento {i}", "Descripción del evento", base + timedelta(hours=i),
+         base + timedelta(hours=i, minutes=45), 'meeting', '#3b82f6', 'Sala 2', 15, 0,
+         base, base, None, None)
+        for i in range(1, count + 1)
+    ]
+
+
+def folder_rows(count):
+    base = datetime(2025, 11, 1, 9, 0)
+    return [(i, 1, f"Carpeta {i}", '#6366f1', 'folder', i, i % 50, base, base)
+            for i in range(1, count + 1)]
+
+
+def legacy(model):
+    """Misma clase sin __slots__ (atributos en __dict__), como antes"""
+    return type(f'Legacy{model.__name__}', (), {'__init__': model.__init__})
+
+
+def run_dicts(model, columns, rows):
+    # Lo que hace el cursor dictionary=True: un diccionario por fila
+    data = [dict(zip(columns, row)) for row in rows]
+    return data, [model(**item) for item in data]
+
+
+def run_slots(model, columns, rows):
+    return _hydrate(model, columns, rows)
+
+
+def measure(func, model, columns, rows, repeat):
+    """Retorna (ms por ejecución, pico KB, KB retenidos, bloques asignados)"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func(model, columns, rows)
+    elapsed = (time.perf_counter() - started) / repeat * 1000
+    
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = func(model, columns, rows)
+    current, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename'))
+    del result
+    return elapsed, peak / 1024, current / 1024, blocks
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    
+    print(f"{count} filas, {repeat} repeticiones\n")
+    print(f"{'modelo':<16}{'filas':<22}{'ms':>10}{'pico KB':>12}{'retenido KB':>14}{'bloques':>10}")
+    print("-" * 84)
+    for model, columns, rows in ((CalendarEvent, EVENT_COLUMNS, event_rows(count)),
+                                 (ContactFolder, FOLDER_COLUMNS, folder_rows(count))):
+        dict_ms, dict_peak, dict_kb, dict_blocks = measure(run_dicts, legacy(model), columns, rows, repeat)
+        slot_ms, slot_peak, slot_kb, slot_blocks = measure(run_slots, model, columns, rows, repeat)
+        
+        print(f"{model.__name__:<16}{'dict + __dict__':<22}{dict_ms:>10.2f}{dict_peak:>12.0f}"
+              f"{dict_kb:>14.0f}{dict_blocks:>10}")
+        print(f"{'':<16}{'tupla + __slots__':<22}{slot_ms:>10.2f}{slot_peak:>12.0f}"
+              f"{slot_kb:>14.0f}{slot_blocks:>10}")
+        print(f"{'':<16}{'mejora':<22}{dict_ms / slot_ms:>9.1f}x{dict_peak / slot_peak:>11.1f}x"
+              f"{dict_kb / slot_kb:>13.1f}x{dict_blocks / max(slot_blocks, 1):>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Script para comprobar con EXPLAIN que las queries frecuentes usan índices
+Uso: python check_query_plans.py
+
+Las queries se graban desde los métodos de app/models (ver app/query_plans.py).
+Sale con código 1 si alguna recorre una tabla entera (type=ALL) que no está
+en ALLOWED_FULL_SCANS.
+"""
+
+import sys
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from mysql.connector import Error
+from app.migrator import Migrator
+from app.query_plans import HOT_QUERIES, check
+
+def main():
+    print("="*60)
+    print(" Comprobación de planes de ejecución")
+    print("="*60)
+    
+    try:
+        connection = Migrator.connect()
+    except Error as e:
+        print(f"\n❌ Error conectando a la base de datos: {e}")
+        return False
+    
+    try:
+        problems = check(connection)
+    except Error as e:
+        print(f"\n❌ Error: {e}")
+        return False
+    finally:
+        connection.close()
+    
+    print(f"\n→ {len(HOT_QUERIES)} queries comprobadas")
+    for name, tables, plan in problems:
+        print(f"\n❌ {name}: full scan en {', '.join(tables)}")
+        for row in plan:
+            print(f"   {row['table']}: type={row['type']} key={row['key']} rows={row['rows']}")
+    
+    print("\n" + "="*60)
+    if problems:
+        print(f"❌ {len(problems)} queries con full scan")
+    else:
+        print("✅ Ninguna query recorre tablas enteras")
+    print("="*60)
+    return not problems
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
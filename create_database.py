@@ -4,6 +4,7 @@ import mysql.connector
 from mysql.connector import Error
 import os
 from dotenv import load_dotenv
+from app.migrator import Migrator, MigrationError
 
 # Cargar variables de entorno
 load_dotenv()
@@ -35,7 +36,10 @@ def create_database():
                     id INT AUTO_INCREMENT PRIMARY KEY,
                     username VARCHAR(80) NOT NULL UNIQUE,
                     email VARCHAR(120) NOT NULL UNIQUE,
-                    password_hash VARCHAR(200) NOT NULL,
+                    password_hash VARCHAR(200) NULL,
+                    friend_code VARCHAR(12) NOT NULL UNIQUE,
+                    google_id VARCHAR(255) NULL UNIQUE,
+                    oauth_provider VARCHAR(20) NULL,
                     full_name VARCHAR(100),
                     bio TEXT,
                     avatar VARCHAR(200) DEFAULT 'default.png',
@@ -44,7 +48,8 @@ def create_database():
                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
                     is_active BOOLEAN DEFAULT TRUE,
                     INDEX idx_username (username),
-                    INDEX idx_email (email)
+                    INDEX idx_email (email),
+                    INDEX idx_friend_code (friend_code)
                 ) ENGINE=InnoDB
             """)
             print("✓ Tabla 'users' creada")
@@ -58,14 +63,14 @@ def create_database():
                     platform VARCHAR(50) NOT NULL,
                     username VARCHAR(100) NOT NULL,
                     url VARCHAR(500) NOT NULL,
-                    icon VARCHAR(50),
                     is_visible BOOLEAN DEFAULT TRUE,
                     display_order INT DEFAULT 0,
                     profile_data JSON,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
                     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-                    INDEX idx_user_id (user_id)
+                    INDEX idx_user_id (user_id),
+                    INDEX idx_platform (user_id, platform)
                 ) ENGINE=InnoDB
             """)
             print("✓ Tabla 'social_links' creada")
@@ -111,6 +116,10 @@ def create_database():
             print("✓ Tabla 'messages' creada")
             
             connection.commit()
+            
+            # Aplicar las migraciones (carpetas, calendario, índices compuestos...)
+            print("\nAplicando migraciones...")
+            Migrator(connection).migrate()
             print("\n✅ Base de datos 'eid' creada exitosamente con todas las tablas!")
             
             # Mostrar estadísticas
@@ -124,7 +133,7 @@ def create_database():
             connection.close()
             print("\n🚀 ¡Ya puedes ejecutar la aplicación con 'python run.py'!")
             
-    except Error as e:
+    except (Error, MigrationError) as e:
         print(f"❌ Error: {e}")
         return False
     
@@ -9,8 +9,10 @@ CREATE TABLE IF NOT EXISTS users (
     id INT AUTO_INCREMENT PRIMARY KEY,
     username VARCHAR(80) NOT NULL UNIQUE,
     email VARCHAR(120) NOT NULL UNIQUE,
-    password_hash VARCHAR(200) NOT NULL,
+    password_hash VARCHAR(200) NULL,
     friend_code VARCHAR(12) NOT NULL UNIQUE,
+    google_id VARCHAR(255) NULL UNIQUE,
+    oauth_provider VARCHAR(20) NULL,
     full_name VARCHAR(100),
     bio TEXT,
     avatar VARCHAR(200) DEFAULT 'default.png',
@@ -32,6 +34,7 @@ CREATE TABLE IF NOT EXISTS social_links (
     url VARCHAR(500) NOT NULL,
     is_visible BOOLEAN DEFAULT TRUE,
     display_order INT DEFAULT 0,
+    profile_data JSON,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
@@ -71,6 +74,9 @@ CREATE TABLE IF NOT EXISTS messages (
     INDEX idx_created_at (created_at)
 ) ENGINE=InnoDB;
 
+-- El resto del esquema (carpetas, calendario, contadores, índices compuestos)
+-- está en migrations/ y se aplica con: python run_migrations.py
+
 -- Datos de prueba (opcional)
 -- Usuario de prueba: dario / password123
 INSERT INTO users (username, email, password_hash, full_name, bio) VALUES
@@ -2,14 +2,14 @@
 Script de migración para añadir friend_code a usuarios
 """
 
-import mysql.connector
 from dotenv import load_dotenv
-import os
 import secrets
 import string
 
 load_dotenv()
 
+from app.database import db, Error
+
 def generate_friend_code():
     """Generar código de amigo único (8 caracteres alfanuméricos en mayúsculas)"""
     chars = string.ascii_uppercase + string.digits
@@ -20,77 +20,91 @@ def migrate():
     print(" Migración: Añadir friend_code a usuarios")
     print("="*60)
     
+    # Una sola conexión para todo el script (la tabla temporal vive en ella)
+    if db.connect() is None:
+        print("\n❌ Error: no se pudo conectar a la base de datos")
+        return False
+    
     try:
-        connection = mysql.connector.connect(
-            host=os.getenv('DB_HOST', 'localhost'),
-            user=os.getenv('DB_USER', 'root'),
-            password=os.getenv('DB_PASSWORD', ''),
-            database=os.getenv('DB_NAME', 'eid')
-        )
-        cursor = connection.cursor()
+        print(f"\n✓ Conectado a la base de datos '{db.database}'")
         
-        print("\n✓ Conectado a la base de datos 'eid'")
-        
-        # 1. Verificar si existe la columna friend_code
-        cursor.execute("""
-            SELECT COUNT(*) 
-            FROM information_schema.columns 
-            WHERE table_schema = %s 
-              AND table_name = 'users' 
-              AND column_name = 'friend_code'
-        """, (os.getenv('DB_NAME', 'eid'),))
-        
-        if cursor.fetchone()[0] == 0:
-            print("\n→ Añadiendo columna 'friend_code'...")
-            cursor.execute("""
-                ALTER TABLE users 
-                ADD COLUMN friend_code VARCHAR(12) AFTER password_hash
-            """)
-            print("✓ Columna 'friend_code' añadida")
-            
-            # Generar códigos únicos para usuarios existentes
-            cursor.execute("SELECT id FROM users")
-            users = cursor.fetchall()
+        # Dentro de una transacción los errores se lanzan; los ALTER/CREATE
+        # INDEX se confirman solos en MySQL
+        with db.transaction():
+            # 1. Verificar si existe la columna friend_code
+            column = db.fetch_one("""
+                SELECT COUNT(*) AS total
+                FROM information_schema.columns 
+                WHERE table_schema = %s 
+                  AND table_name = 'users' 
+                  AND column_name = 'friend_code'
+            """, (db.database,))
             
-            if users:
-                print(f"\n→ Generando códigos para {len(users)} usuarios existentes...")
-                for (user_id,) in users:
-                    while True:
+            if column and column['total'] == 0:
+                print("\n→ Añadiendo columna 'friend_code'...")
+                db.execute_query("""
+                    ALTER TABLE users 
+                    ADD COLUMN friend_code VARCHAR(12) AFTER password_hash
+                """)
+                print("✓ Columna 'friend_code' añadida")
+                
+                # Generar códigos únicos para usuarios existentes: se comprueban en
+                # memoria y se aplican con un UPDATE ... JOIN sobre una tabla temporal
+                users = db.fetch_all("SELECT id FROM users")
+                
+                if users:
+                    print(f"\n→ Generando códigos para {len(users)} usuarios existentes...")
+                    used = set()
+                    rows = []
+                    for user in users:
                         code = generate_friend_code()
-                        # Verificar que sea único
-                        cursor.execute("SELECT COUNT(*) FROM users WHERE friend_code = %s", (code,))
-                        if cursor.fetchone()[0] == 0:
-                            cursor.execute("UPDATE users SET friend_code = %s WHERE id = %s", (code, user_id))
-                            print(f"  ✓ Usuario {user_id}: {code}")
-                            break
+                        while code in used:
+                            code = generate_friend_code()
+                        used.add(code)
+                        rows.append((user['id'], code))
+                    
+                    db.execute_query("""
+                        CREATE TEMPORARY TABLE tmp_friend_codes (
+                            user_id INT PRIMARY KEY,
+                            friend_code VARCHAR(12) NOT NULL
+                        )
+                    """)
+                    db.execute_many(
+                        "INSERT INTO tmp_friend_codes (user_id, friend_code) VALUES (%s, %s)",
+                        rows
+                    )
+                    updated = db.execute_update("""
+                        UPDATE users u
+                        JOIN tmp_friend_codes t ON t.user_id = u.id
+                        SET u.friend_code = t.friend_code
+                    """)
+                    db.execute_query("DROP TEMPORARY TABLE tmp_friend_codes")
+                    print(f"  ✓ {updated} códigos asignados")
+                
+                # Hacer la columna NOT NULL y UNIQUE
+                db.execute_query("""
+                    ALTER TABLE users 
+                    MODIFY COLUMN friend_code VARCHAR(12) NOT NULL UNIQUE
+                """)
+                
+                # Añadir índice
+                db.execute_query("""
+                    CREATE INDEX idx_friend_code ON users(friend_code)
+                """)
+                print("✓ Índice 'idx_friend_code' creado")
             
-            # Hacer la columna NOT NULL y UNIQUE
-            cursor.execute("""
-                ALTER TABLE users 
-                MODIFY COLUMN friend_code VARCHAR(12) NOT NULL UNIQUE
-            """)
-            
-            # Añadir índice
-            cursor.execute("""
-                CREATE INDEX idx_friend_code ON users(friend_code)
-            """)
-            print("✓ Índice 'idx_friend_code' creado")
-            
-        else:
-            print("\n○ Columna 'friend_code' ya existe")
-        
-        connection.commit()
+            else:
+                print("\n○ Columna 'friend_code' ya existe")
         
         print("\n" + "="*60)
         print("✅ Migración completada exitosamente!")
         print("="*60)
-        
-        cursor.close()
-        connection.close()
-        
-    except mysql.connector.Error as err:
+    
+    except Error as err:
         print(f"\n❌ Error: {err}")
         return False
+    finally:
+        db.disconnect()
     
     return True
 
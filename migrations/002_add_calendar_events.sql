@@ -34,16 +34,18 @@ CREATE TABLE IF NOT EXISTS event_participants (
     INDEX idx_contact (contact_user_id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
--- Insertar evento de ejemplo para usuario 1
+-- Evento de ejemplo para el usuario 1, solo si existe (en una base de datos
+-- recién creada aún no hay usuarios y la clave foránea fallaría)
 INSERT INTO calendar_events (user_id, title, description, start_datetime, end_datetime, event_type, color, location, reminder_minutes)
-VALUES (
-    1,
+SELECT
+    id,
     'Reunión de ejemplo',
     'Este es un evento de prueba para demostrar el calendario',
-    DATE_ADD(NOW(), INTERVAL 1 DAY),
-    DATE_ADD(NOW(), INTERVAL 1 DAY + INTERVAL 1 HOUR),
+    NOW() + INTERVAL 1 DAY,
+    NOW() + INTERVAL 1 DAY + INTERVAL 1 HOUR,
     'meeting',
     '#3b82f6',
     'Oficina',
     30
-);
+FROM users
+WHERE id = 1;
@@ -0,0 +1,19 @@
+-- Migración: Contador de contactos desnormalizado en carpetas
+-- Fecha: 2025-11-16
+
+-- El contador se mantiene al mover, aceptar o rechazar contactos
+ALTER TABLE contact_folders
+ADD COLUMN contacts_count INT NOT NULL DEFAULT 0 AFTER position;
+
+-- Índice para el conteo agregado de reconstrucción
+CREATE INDEX idx_contacts_user_folder ON contacts (user_id, folder_id, status);
+
+-- Rellenar contadores para las carpetas existentes
+UPDATE contact_folders f
+LEFT JOIN (
+    SELECT user_id, folder_id, COUNT(*) AS total
+    FROM contacts
+    WHERE status = 'accepted' AND folder_id IS NOT NULL
+    GROUP BY user_id, folder_id
+) c ON c.folder_id = f.id AND c.user_id = f.user_id
+SET f.contacts_count = COALESCE(c.total, 0);
@@ -0,0 +1,28 @@
+-- Migración: Contadores de mensajes no leídos desnormalizados
+-- Fecha: 2025-11-16
+
+-- Un contador por conversación (peer_id = remitente) y uno total por
+-- usuario (peer_id = 0). Se actualizan al crear y leer mensajes.
+CREATE TABLE IF NOT EXISTS unread_counters (
+    user_id INT NOT NULL,
+    peer_id INT NOT NULL,
+    unread_count INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, peer_id),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Rellenar a partir de los mensajes existentes
+INSERT INTO unread_counters (user_id, peer_id, unread_count)
+SELECT receiver_id, sender_id, COUNT(*)
+FROM messages
+WHERE is_read = FALSE
+GROUP BY receiver_id, sender_id
+ON DUPLICATE KEY UPDATE unread_count = VALUES(unread_count);
+
+INSERT INTO unread_counters (user_id, peer_id, unread_count)
+SELECT receiver_id, 0, COUNT(*)
+FROM messages
+WHERE is_read = FALSE
+GROUP BY receiver_id
+ON DUPLICATE KEY UPDATE unread_count = VALUES(unread_count);
@@ -0,0 +1,18 @@
+-- Migración: Clave canónica de conversación en mensajes
+-- Fecha: 2025-11-16
+
+-- (user_low_id, user_high_id) identifica la conversación sin importar quién
+-- envía, así el historial es un único rango del índice en vez de un OR
+ALTER TABLE messages
+ADD COLUMN user_low_id INT NULL AFTER receiver_id,
+ADD COLUMN user_high_id INT NULL AFTER user_low_id;
+
+UPDATE messages
+SET user_low_id = LEAST(sender_id, receiver_id),
+    user_high_id = GREATEST(sender_id, receiver_id);
+
+ALTER TABLE messages
+MODIFY COLUMN user_low_id INT NOT NULL,
+MODIFY COLUMN user_high_id INT NOT NULL;
+
+CREATE INDEX idx_conversation ON messages (user_low_id, user_high_id, created_at, id);
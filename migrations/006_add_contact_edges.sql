@@ -0,0 +1,32 @@
+-- Migración: Relaciones de contacto simétricas (dos filas por pareja aceptada)
+-- Fecha: 2025-11-16
+
+-- Cada contacto aceptado se materializa como dos aristas dirigidas
+-- (owner_id -> peer_id). Cada usuario tiene su propia carpeta para el
+-- contacto y la lista de contactos es un único rango del índice.
+CREATE TABLE IF NOT EXISTS contact_edges (
+    owner_id INT NOT NULL,
+    peer_id INT NOT NULL,
+    contact_id INT NOT NULL,
+    status ENUM('pending', 'accepted', 'blocked') DEFAULT 'accepted',
+    folder_id INT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (owner_id, peer_id),
+    FOREIGN KEY (owner_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (peer_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (contact_id) REFERENCES contacts(id) ON DELETE CASCADE,
+    FOREIGN KEY (folder_id) REFERENCES contact_folders(id) ON DELETE SET NULL,
+    INDEX idx_owner_status_folder (owner_id, status, folder_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Aristas del solicitante (conservan la carpeta que ya tenían)
+INSERT IGNORE INTO contact_edges (owner_id, peer_id, contact_id, status, folder_id, created_at)
+SELECT user_id, contact_id, id, status, folder_id, COALESCE(accepted_at, created_at)
+FROM contacts
+WHERE status = 'accepted';
+
+-- Aristas del que aceptó
+INSERT IGNORE INTO contact_edges (owner_id, peer_id, contact_id, status, folder_id, created_at)
+SELECT contact_id, user_id, id, status, NULL, COALESCE(accepted_at, created_at)
+FROM contacts
+WHERE status = 'accepted';
@@ -0,0 +1,26 @@
+-- Migración: Índices compuestos para las queries más frecuentes
+-- Fecha: 2025-11-16
+
+-- Se crean en línea (sin bloquear escrituras) con ALGORITHM=INPLACE, LOCK=NONE
+
+-- Message.mark_as_read y reconstrucción de contadores de no leídos
+ALTER TABLE messages
+ADD INDEX idx_receiver_read (receiver_id, is_read, sender_id),
+ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Contact.get_pending_received / get_pending_sent
+ALTER TABLE contacts
+ADD INDEX idx_contact_status (contact_id, status),
+ADD INDEX idx_user_status (user_id, status),
+ALGORITHM=INPLACE, LOCK=NONE;
+
+-- SocialLink.get_visible_by_user / get_by_user (ordenados por display_order)
+ALTER TABLE social_links
+ADD INDEX idx_user_visible_order (user_id, is_visible, display_order),
+ADD INDEX idx_user_order (user_id, display_order),
+ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Eventos en los que participa un usuario
+ALTER TABLE event_participants
+ADD INDEX idx_contact_event (contact_user_id, event_id),
+ALGORITHM=INPLACE, LOCK=NONE;
@@ -0,0 +1,35 @@
+-- Migración: Índice de prefijos para la búsqueda de usuarios
+-- Fecha: 2025-11-16
+
+-- Una fila por término buscable de cada usuario: username, friend_code,
+-- full_name completo y cada palabra del nombre a partir de la segunda.
+-- La búsqueda por prefijo es un único rango de la clave primaria
+-- (term LIKE 'q%'), sin LIKE '%q%' sobre users. La collation _ci hace
+-- que la comparación ignore mayúsculas y acentos.
+CREATE TABLE IF NOT EXISTS user_search_terms (
+    term VARCHAR(100) NOT NULL,
+    user_id INT NOT NULL,
+    PRIMARY KEY (term, user_id),
+    INDEX idx_user (user_id),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Rellenar con los usuarios existentes
+INSERT IGNORE INTO user_search_terms (term, user_id)
+SELECT LEFT(username, 100), id FROM users;
+
+INSERT IGNORE INTO user_search_terms (term, user_id)
+SELECT friend_code, id FROM users WHERE friend_code IS NOT NULL;
+
+INSERT IGNORE INTO user_search_terms (term, user_id)
+SELECT LEFT(TRIM(full_name), 100), id FROM users
+WHERE full_name IS NOT NULL AND TRIM(full_name) <> '';
+
+-- Palabras 2 a 4 del nombre (apellidos)
+INSERT IGNORE INTO user_search_terms (term, user_id)
+SELECT LEFT(SUBSTRING_INDEX(SUBSTRING_INDEX(TRIM(u.full_name), ' ', n.n), ' ', -1), 100), u.id
+FROM users u
+JOIN (SELECT 2 AS n UNION ALL SELECT 3 UNION ALL SELECT 4) n
+  ON n.n <= 1 + LENGTH(TRIM(u.full_name)) - LENGTH(REPLACE(TRIM(u.full_name), ' ', ''))
+WHERE u.full_name IS NOT NULL
+  AND SUBSTRING_INDEX(SUBSTRING_INDEX(TRIM(u.full_name), ' ', n.n), ' ', -1) <> '';
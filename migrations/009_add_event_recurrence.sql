@@ -0,0 +1,25 @@
+-- Migración: Eventos que se repiten (regla RRULE) y excepciones por repetición
+-- Fecha: 2025-11-16
+
+-- rrule: regla de repetición (subconjunto de RRULE, ver app/recurrence.py)
+-- recurrence_until: fin de la última repetición (NULL si la serie no termina)
+ALTER TABLE calendar_events
+ADD COLUMN rrule VARCHAR(255) NULL AFTER all_day,
+ADD COLUMN recurrence_until DATETIME NULL AFTER rrule;
+
+-- Repeticiones canceladas o modificadas de una serie, por su inicio original
+CREATE TABLE IF NOT EXISTS calendar_event_exceptions (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    event_id INT NOT NULL,
+    original_start DATETIME NOT NULL,
+    is_cancelled BOOLEAN DEFAULT FALSE,
+    title VARCHAR(255) NULL,
+    description TEXT NULL,
+    start_datetime DATETIME NULL,
+    end_datetime DATETIME NULL,
+    location VARCHAR(255) NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (event_id) REFERENCES calendar_events(id) ON DELETE CASCADE,
+    UNIQUE KEY unique_occurrence (event_id, original_start)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
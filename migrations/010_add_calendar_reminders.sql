@@ -0,0 +1,32 @@
+-- Migración: Recordatorios programados de eventos del calendario
+-- Fecha: 2025-11-16
+
+-- Un recordatorio pendiente por evento: el de su próxima repetición.
+-- El planificador (app/reminders.py) solo lee los que vencen pronto por
+-- idx_status_fire y reclama cada lote con un UPDATE antes de enviarlo.
+CREATE TABLE IF NOT EXISTS calendar_reminders (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    event_id INT NOT NULL,
+    user_id INT NOT NULL,
+    occurrence_start DATETIME NOT NULL,
+    fire_at DATETIME NOT NULL,
+    status ENUM('pending', 'claimed', 'sent') NOT NULL DEFAULT 'pending',
+    claim_token VARCHAR(32) NULL,
+    claimed_at DATETIME NULL,
+    sent_at DATETIME NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (event_id) REFERENCES calendar_events(id) ON DELETE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    UNIQUE KEY unique_event (event_id),
+    INDEX idx_status_fire (status, fire_at),
+    INDEX idx_claim (claim_token)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Recordatorios de los eventos futuros que ya existen (las series los
+-- programa el planificador al arrancar)
+INSERT IGNORE INTO calendar_reminders (event_id, user_id, occurrence_start, fire_at)
+SELECT id, user_id, start_datetime, start_datetime - INTERVAL reminder_minutes MINUTE
+FROM calendar_events
+WHERE reminder_minutes > 0
+  AND rrule IS NULL
+  AND start_datetime > NOW();
@@ -0,0 +1,14 @@
+-- Migración: Versión por usuario de los datos que sirven las APIs JSON
+-- Fecha: 2025-11-16
+
+-- Se incrementa en cada escritura (eventos del calendario, carpetas de
+-- contactos) y se usa para los ETag de /calendar/events/json y
+-- /contacts/folders/list
+CREATE TABLE IF NOT EXISTS user_data_versions (
+    user_id INT NOT NULL,
+    scope VARCHAR(20) NOT NULL,
+    version BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, scope),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,10 @@
+-- Migración: Quitar el friend_code de los términos de búsqueda
+-- Fecha: 2025-11-16
+
+-- Buscar por prefijo del código permitía enumerar los códigos de todos los
+-- usuarios; ahora solo se acepta el código completo (consulta sobre users).
+-- Se conserva el término si además es el username del usuario.
+DELETE t FROM user_search_terms t
+JOIN users u ON u.id = t.user_id
+WHERE t.term = u.friend_code
+  AND t.term <> LEFT(u.username, 100);
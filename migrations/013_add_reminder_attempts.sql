@@ -0,0 +1,9 @@
+-- Migración: Reintentos de recordatorios no entregados
+-- Fecha: 2025-11-16
+
+-- Un recordatorio que ningún destino entrega vuelve a 'pending' con el aviso
+-- aplazado (espera exponencial); tras REMINDER_MAX_ATTEMPTS intentos queda en
+-- 'failed' y no se vuelve a enviar.
+ALTER TABLE calendar_reminders
+MODIFY COLUMN status ENUM('pending', 'claimed', 'sent', 'failed') NOT NULL DEFAULT 'pending',
+ADD COLUMN attempts INT NOT NULL DEFAULT 0 AFTER status;
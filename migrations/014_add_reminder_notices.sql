@@ -0,0 +1,20 @@
+-- Migración: Avisos de recordatorios guardados para la aplicación
+-- Fecha: 2025-11-16
+
+-- El destino 'socketio' guarda aquí cada aviso antes de emitirlo: si el
+-- usuario no tiene la aplicación abierta lo ve al cargar la siguiente página.
+-- Uno por (usuario, evento, repetición): reintentar un envío no lo duplica.
+CREATE TABLE IF NOT EXISTS reminder_notices (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    event_id INT NOT NULL,
+    occurrence_start DATETIME NOT NULL,
+    title VARCHAR(255) NOT NULL,
+    location VARCHAR(255) NULL,
+    seen_at DATETIME NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (event_id) REFERENCES calendar_events(id) ON DELETE CASCADE,
+    UNIQUE KEY unique_notice (user_id, event_id, occurrence_start),
+    INDEX idx_user_seen_start (user_id, seen_at, occurrence_start)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
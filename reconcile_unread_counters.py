@@ -0,0 +1,31 @@
+"""
+Script para reconstruir los contadores de mensajes no leídos
+Uso: python reconcile_unread_counters.py [user_id]
+"""
+
+import sys
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.models.message import Message
+
+def reconcile(user_id=None):
+    print("="*60)
+    print(" Reconciliación de contadores de mensajes no leídos")
+    print("="*60)
+    
+    if user_id:
+        print(f"\n→ Reconstruyendo contadores del usuario {user_id}...")
+    else:
+        print("\n→ Reconstruyendo contadores de todos los usuarios...")
+    
+    Message.rebuild_unread_counters(user_id)
+    
+    print("\n" + "="*60)
+    print("✅ Contadores reconstruidos desde la tabla messages")
+    print("="*60)
+    return True
+
+if __name__ == '__main__':
+    reconcile(int(sys.argv[1]) if len(sys.argv) > 1 else None)
@@ -4,8 +4,9 @@ Punto de entrada de la aplicación
 """
 
 from app import create_app
+from app.realtime import socketio
 
 app = create_app()
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    socketio.run(app, host='0.0.0.0', port=5000, debug=True)
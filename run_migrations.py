@@ -0,0 +1,75 @@
+"""
+Script para aplicar las migraciones de migrations/ en orden
+Uso: python run_migrations.py [--status] [--dry-run] [--baseline VERSION] [--target VERSION]
+
+En una base de datos creada antes del gestor de migraciones, marcar primero
+como aplicadas las que ya se ejecutaron a mano: python run_migrations.py --baseline 006
+"""
+
+import argparse
+import sys
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from mysql.connector import Error
+from app.migrator import Migrator, MigrationError
+
+def main():
+    parser = argparse.ArgumentParser(description='Migraciones de esquema de eID')
+    parser.add_argument('--status', action='store_true', help='mostrar el estado de cada migración')
+    parser.add_argument('--dry-run', action='store_true', help='listar las pendientes sin aplicarlas')
+    parser.add_argument('--baseline', metavar='VERSION', help='marcar como aplicadas hasta VERSION sin ejecutarlas')
+    parser.add_argument('--target', metavar='VERSION', help='aplicar solo hasta VERSION')
+    parser.add_argument('--lock-wait-timeout', type=int, default=5,
+                        help='segundos máximos esperando el bloqueo de metadatos en cada ALTER')
+    args = parser.parse_args()
+    
+    print("="*60)
+    print(" Migraciones de esquema")
+    print("="*60)
+    
+    try:
+        connection = Migrator.connect()
+    except Error as e:
+        print(f"\n❌ Error conectando a la base de datos: {e}")
+        return False
+    
+    migrator = Migrator(connection, lock_wait_timeout=args.lock_wait_timeout)
+    try:
+        if args.status:
+            print()
+            for version, name, state in migrator.status():
+                mark = {'aplicada': '✓', 'pendiente': '○', 'modificada': '⚠'}[state]
+                print(f"{mark} {version}_{name:<45} {state}")
+            return True
+        
+        if args.baseline:
+            marked = migrator.baseline(args.baseline)
+            print(f"\n✓ {len(marked)} migraciones marcadas como aplicadas")
+            return True
+        
+        for version, name, state in migrator.status():
+            if state == 'modificada':
+                print(f"⚠ {version}_{name} ha cambiado desde que se aplicó")
+        
+        print()
+        done = migrator.migrate(target=args.target, dry_run=args.dry_run)
+        
+        print("\n" + "="*60)
+        if not done:
+            print("✅ El esquema ya está al día")
+        elif args.dry_run:
+            print(f"○ {len(done)} migraciones pendientes (no se ha aplicado nada)")
+        else:
+            print(f"✅ {len(done)} migraciones aplicadas")
+        print("="*60)
+        return True
+    except (Error, MigrationError) as e:
+        print(f"\n❌ Error: {e}")
+        return False
+    finally:
+        connection.close()
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -1,6 +1,11 @@
 """Script para probar si el servidor responde"""
+import os
 import requests
 import sys
+from dotenv import load_dotenv
+
+# Misma configuración que el servidor (METRICS_ENABLED / METRICS_TOKEN)
+load_dotenv()
 
 try:
     print("🔍 Probando conexión a http://127.0.0.1:5000...")
@@ -12,10 +17,30 @@ try:
     print("=" * 80)
     print(response.text[:500])
     print("=" * 80)
+    
+    # Las métricas deben reflejar la petición anterior
+    metrics_token = os.environ.get('METRICS_TOKEN', '')
+    if os.environ.get('METRICS_ENABLED', '0') != '1' or not metrics_token:
+        print("\n⏭️  /metrics desactivado (requiere METRICS_ENABLED=1 y METRICS_TOKEN): no se comprueba")
+    else:
+        print("\n🔍 Comprobando métricas en http://127.0.0.1:5000/metrics...")
+        metrics = requests.get('http://127.0.0.1:5000/metrics', timeout=5,
+                               headers={'Authorization': f'Bearer {metrics_token}'})
+        assert metrics.status_code == 200, f"/metrics respondió {metrics.status_code}"
+        index_requests = [
+            line for line in metrics.text.splitlines()
+            if line.startswith('eid_http_requests_total{') and 'endpoint="main.index"' in line
+        ]
+        assert index_requests, "No hay métricas de la página principal"
+        assert 'eid_http_request_duration_seconds_bucket' in metrics.text, "Falta el histograma de latencia"
+        print(f"✅ Métricas: {index_requests[0]}")
 except requests.exceptions.ConnectionError:
     print("❌ ERROR: No se pudo conectar al servidor")
     print("💡 Asegúrate de que el servidor Flask esté corriendo")
     sys.exit(1)
+except AssertionError as e:
+    print(f"❌ ERROR en métricas: {e}")
+    sys.exit(1)
 except requests.exceptions.Timeout:
     print("❌ ERROR: Timeout al conectar")
     sys.exit(1)